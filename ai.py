@@ -1,63 +1,289 @@
+import hashlib
+import heapq
 import random
+import time
 from piece import PieceType
-from board import BOARD_SIZE
+from board import BOARD_SIZE, ARMY_STEPS, NEIGHBORS
+from build_scoring import build_scores, top_sites
+from danger import plan_recovery
+import tactics
+from evaluation import DEFAULT_WEIGHTS, evaluate_board, features_for, load_weights
+from opening_book import load_book
+from threats import threats_for
+
+# 走一步后需要重新评分的军队范围：目标格的威胁图在攻击半径上限（3步 + 吃子1步）内变化，
+# 候选目标离军队1格
+RESCORE_RADIUS = 5
+
+# 训练得到的评估权重，进程内只读取一次
+_trained_weights = None
+_weights_loaded = False
+
+
+def trained_weights():
+    """读取train_eval.py生成的权重文件，没有时返回手工权重"""
+    global _trained_weights, _weights_loaded
+    if not _weights_loaded:
+        _trained_weights = load_weights()
+        _weights_loaded = True
+    return _trained_weights or DEFAULT_WEIGHTS
+
+
+# opening_book.py生成的开局库，进程内只打开一次
+_opening_book = None
+_book_loaded = False
+
+
+def opening_book():
+    """打开默认开局库，没有时返回None"""
+    global _opening_book, _book_loaded
+    if not _book_loaded:
+        _opening_book = load_book()
+        _book_loaded = True
+    return _opening_book
+
+
+# 难度即每回合的计算预算：
+#   search     搜索引擎（'beam'=整回合束搜索, 'greedy'=逐阶段贪心）
+#   time_ms    思考时间上限（毫秒）
+#   max_nodes  搜索节点上限（与机器快慢无关，保证每局的计算量可预期）
+#   beam_width 束宽
+#   noise      评估分上叠加的高斯噪声标准差，用来刻意降低水平
+#   tactics    攻破王塔求解深度（0=不用, 1=本回合, 2=两回合）
+#   book       是否使用开局库（低难度不用，保留开局的变化）
+#   elo        自对弈锦标赛标定的等级分（以简单=1000为基准），供开始菜单显示；
+#              标定：python tournament.py --ai easy --ai normal --ai hard --games 40 --seed 7
+#              结果（120局，Elo 95%区间 胜/负/和）：困难 126 [86, 175] 45/5/30，普通 -32 [-66, 4] 14/24/42，
+#              简单 -95 [-129, -69] 3/33/44；重跑时只有少数受思考时间上限影响的对局结果不同
+# 困难之上不再设更大预算的难度：束宽、节点数再加大，自对弈中与困难的胜率仍在误差范围内
+DIFFICULTY_LEVELS = {
+    'easy':   {'search': 'beam', 'time_ms': 30,   'max_nodes': 40,   'beam_width': 2,  'noise': 40, 'tactics': 0, 'book': 0, 'elo': 1000},
+    'normal': {'search': 'beam', 'time_ms': 100,  'max_nodes': 150,  'beam_width': 4,  'noise': 10, 'tactics': 1, 'book': 0, 'elo': 1063},
+    'hard':   {'search': 'beam', 'time_ms': 300,  'max_nodes': 600,  'beam_width': 8,  'noise': 0,  'tactics': 2, 'book': 1, 'elo': 1221},
+}
+DIFFICULTY_ORDER = ['easy', 'normal', 'hard']
+
 
 class AIPlayer:
-    def __init__(self, difficulty='easy'):
+    def __init__(self, difficulty='easy', search=None, time_limit=None, beam_width=None, max_nodes=None,
+                 noise=None, weights=None, seed=None, book=None):
+        if difficulty not in DIFFICULTY_LEVELS:
+            raise ValueError(f"未知的AI难度: {difficulty}")
+        level = DIFFICULTY_LEVELS[difficulty]
         self.difficulty = difficulty
+        # 未显式指定的参数取难度对应的预算
+        self.search = search or level['search']  # 'greedy'=逐阶段贪心, 'beam'=整回合束搜索
+        self.time_limit = time_limit if time_limit is not None else level['time_ms'] / 1000
+        self.beam_width = beam_width or level['beam_width']
+        self.max_nodes = max_nodes if max_nodes is not None else level['max_nodes']  # 0表示不限
+        self.noise = noise if noise is not None else level['noise']
+        self.tactics = level['tactics']
+        self.seed = seed or 0
+        self.nodes = 0  # 上一次行军阶段搜索的节点数
+        # 整盘评估权重：None=训练权重（没有则手工权重），'default'=手工权重，字符串=权重文件路径
+        if weights is None:
+            weights = trained_weights()
+        elif weights == 'default':
+            weights = DEFAULT_WEIGHTS
+        elif isinstance(weights, str):
+            weights = load_weights(weights) or DEFAULT_WEIGHTS
+        self.weights = list(weights)
+        # 开局库：None=按难度决定是否使用默认开局库，False=不用，字符串=开局库路径
+        if book is None:
+            book = opening_book() if level['book'] else None
+        elif isinstance(book, str):
+            book = load_book(book)
+        self.book = book or None
+        self.plan = None  # 束搜索得到的整回合计划
+        self._build_scores = None  # (局面键, 三种建造的评分)，见find_build_positions
+        self.cancel = None  # 后台计算时的取消标志（threading.Event）
+
+    def plan_turn(self, board, player, move_limit):
+        """用束搜索规划整回合（行军+建造+拆除）"""
+        from planner import TurnPlanner
+        planner = TurnPlanner(self, beam_width=self.beam_width, time_limit=self.time_limit,
+                              max_nodes=self.max_nodes, evaluate=self.evaluate_board, cancel=self.cancel)
+        plan = planner.plan(board, player, move_limit)
+        self.nodes = planner.nodes
+        return plan
+
+    def evaluate_board(self, board, player):
+        """整盘评估：特征向量与本AI权重的点积，低难度叠加噪声"""
+        score = evaluate_board(board, player, self.weights)
+        if self.noise and not board.winner:
+            score += self.noise_for(board.state_key())
+        return score
+
+    def noise_for(self, key):
+        """评估噪声：由种子和局面（或动作）决定，同一局面总是得到同样的噪声，结果可复现
+
+        种子取稳定的摘要而不是hash()：None等对象的hash随进程变化，工作进程之间会得到不同的噪声
+        """
+        digest = hashlib.blake2b(repr((self.seed, key)).encode(), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, 'little')).gauss(0, self.noise)
+
+    def _plan_step(self, board, step):
+        """取出计划中对应阶段的动作，局面与计划不符时返回None"""
+        if self.plan is None or self.plan.keys.get(step) != board.state_key():
+            return None
+        return self.plan.builds if step == 1 else self.plan.removes
+
+    def play_phase(self, board, player, step):
+        """执行AI的一个阶段（0=行军, 1=建造, 2=拆除），返回实际执行的动作"""
+        actions = []
+        if step == 0:
+            move_limit = board.get_move_limit(player)
+            board.reset_move_count(player)
+            for sx, sy, tx, ty in self.choose_move(board, player, move_limit):
+                board.move_piece(sx, sy, tx, ty)
+                actions.append(('move', (sx, sy, tx, ty)))
+        elif step == 1:
+            for x, y, build_type in self.choose_build(board, player):
+                if board.can_build(x, y, player, build_type):
+                    board.build_piece(x, y, player, build_type)
+                    actions.append(('build', (x, y, build_type)))
+        elif step == 2:
+            for x, y in self.choose_remove(board, player):
+                if board.can_remove(x, y, player):
+                    board.remove_piece(x, y)
+                    actions.append(('remove', (x, y)))
+        return actions
+
+    def play_turn(self, board, player):
+        """在board上执行完整回合的三个阶段，返回全部动作"""
+        actions = []
+        for step in range(3):
+            actions.extend(self.play_phase(board, player, step))
+            if board.winner:
+                break
+        return actions
+
+    def find_tactic(self, board, player, move_limit):
+        """攻破王塔的捷径，求解深度由难度决定"""
+        if not self.tactics:
+            return None
+        return tactics.solve(board, player, move_limit, depth=self.tactics,
+                             time_limit=min(0.05, self.time_limit / 4))
+
+    def book_plan(self, board, player, move_limit):
+        """查开局库，命中且动作在当前局面全部合法时返回整回合计划"""
+        if self.book is None:
+            return None
+        entry = self.book.lookup(board, player)
+        if entry is None:
+            return None
+        from planner import TurnPlan
+        moves, builds, removes = entry
+        trial = board.clone()
+        trial.observers = []
+        for used, (sx, sy, tx, ty) in enumerate(moves):
+            if not trial.can_move_army(sx, sy, tx, ty, player, used, move_limit):
+                return None
+            trial.move_piece(sx, sy, tx, ty)
+        plan = TurnPlan(moves, builds, removes)
+        plan.keys[1] = trial.state_key()
+        for x, y, build_type in builds:
+            if not trial.can_build(x, y, player, build_type):
+                return None
+            trial.build_piece(x, y, player, build_type)
+        plan.keys[2] = trial.state_key()
+        return plan
 
     def choose_move(self, board, player, move_limit):
         """选择军队移动"""
+        plan = self.book_plan(board, player, move_limit)
+        if plan is not None:
+            self.plan = plan
+            return list(plan.moves)
+        tactic = self.find_tactic(board, player, move_limit)
+        if tactic is not None:
+            self.plan = None
+            return list(tactic.moves)
+        if self.search == 'beam':
+            self.plan = self.plan_turn(board, player, move_limit)
+            return list(self.plan.moves)
+        return self.greedy_moves(board, player, move_limit)
+
+    def greedy_moves(self, board, player, move_limit):
+        """逐步贪心选择军队移动
+
+        候选走法放在按评分排序的堆里。选中的一步用make_move在棋盘上真实执行，
+        之后只重新生成离这一步起点或终点RESCORE_RADIUS格以内军队的候选（评分只依赖这个范围内的局面）；
+        棋子数量发生变化（吃子、势力冲突）时双方攻击半径可能改变，全部重新生成。
+        选完后全部撤销，由调用方按返回的序列正式执行。
+        """
         moves = []
-        armies = [p for p in board.get_player_pieces(player, PieceType.ARMY)]
-        used = 0
-        
+        self.nodes = 0
         # 如果濒危状态，不能移动
         if board.danger[player]:
             return moves
-        
-        for _ in range(move_limit):
-            best = None
-            best_score = -9999
-            
-            for army in armies:
-                # 检查单个军队移动步数限制
-                if army.move_count >= 3:
+        deadline = time.perf_counter() + self.time_limit
+        # 噪声按回合开始时的局面与走法决定，同一回合内评分不随重新生成而变化
+        key = board.state_key() if self.noise else None
+        armies = board.get_player_pieces(player, PieceType.ARMY)
+        heap = []
+        # 军队id -> [候选版本号, 在军队列表中的序号]；同分时按序号与方向取第一个，与逐个扫描一致
+        version = {id(a): [0, i] for i, a in enumerate(armies)}
+        undo = []
+        used = 0
+        self._push_candidates(board, player, armies, heap, version, key, used, move_limit, deadline)
+        try:
+            while used < move_limit and heap:
+                _, _, army_id, ver, move = heapq.heappop(heap)
+                # 过期的候选（所属军队已重新生成）或已不合法（步数用完、目标被占）直接丢弃
+                if ver != version[army_id][0] or not self._can_move(board, player, move, used, move_limit):
                     continue
-                    
-                for dx in [-1, 0, 1]:
-                    for dy in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        tx, ty = army.x + dx, army.y + dy
-                        if 0 <= tx < BOARD_SIZE and 0 <= ty < BOARD_SIZE:
-                            if board.can_move_army(army.x, army.y, tx, ty, player, used, move_limit):
-                                score = self.evaluate_move(board, player, army.x, army.y, tx, ty)
-                                
-                                if self.difficulty == 'easy':
-                                    score = random.randint(0, 10)
-                                elif self.difficulty == 'hard':
-                                    # 高级策略：考虑位置价值
-                                    score += self.evaluate_position_value(board, player, tx, ty)
-                                
-                                if score > best_score:
-                                    best_score = score
-                                    best = (army.x, army.y, tx, ty)
-            
-            if best:
-                moves.append(best)
+                mark = len(board.journal) if board.journal else 0
+                undo.append(board.make_move(*move))
+                moves.append(move)
                 used += 1
-                # 临时移动棋子，防止重复
-                for a in armies:
-                    if a.x == best[0] and a.y == best[1]:
-                        a.x, a.y = best[2], best[3]
-                        a.move_count += 1
-                        break
-            else:
-                break
-        
+                if board.winner or board.danger[player]:
+                    break
+                if any(event != 'move' for event, _, _ in board.journal[mark:]):
+                    dirty = armies
+                else:
+                    sx, sy, tx, ty = move
+                    dirty = [a for a in armies
+                             if max(abs(a.x - sx), abs(a.y - sy)) <= RESCORE_RADIUS
+                             or max(abs(a.x - tx), abs(a.y - ty)) <= RESCORE_RADIUS]
+                self._push_candidates(board, player, dirty, heap, version, key, used, move_limit, deadline)
+        finally:
+            for u in reversed(undo):
+                board.unmake_move(u)
         return moves
 
+    def _can_move(self, board, player, move, used, move_limit):
+        """can_move_army，但不让检查吃王塔的副作用改写胜负"""
+        winner = board.winner
+        ok = board.can_move_army(move[0], move[1], move[2], move[3], player, used, move_limit)
+        board.winner = winner
+        return ok
+
+    def _push_candidates(self, board, player, armies, heap, version, key, used, move_limit, deadline):
+        """为armies重新生成候选走法压入堆，旧候选按版本号作废；计算预算用完时保留旧候选"""
+        for army in armies:
+            # 计算预算用完时按已评估的候选决定
+            if (self.max_nodes and self.nodes >= self.max_nodes) or time.perf_counter() > deadline:
+                return
+            entry = version[id(army)]
+            entry[0] += 1
+            # 检查单个军队移动步数限制
+            if army.move_count >= ARMY_STEPS:
+                continue
+            for d, (dx, dy) in enumerate(NEIGHBORS):
+                tx, ty = army.x + dx, army.y + dy
+                if not (0 <= tx < BOARD_SIZE and 0 <= ty < BOARD_SIZE):
+                    continue
+                move = (army.x, army.y, tx, ty)
+                if not self._can_move(board, player, move, used, move_limit):
+                    continue
+                self.nodes += 1
+                score = self.evaluate_move(board, player, army.x, army.y, tx, ty)
+                score += self.evaluate_position_value(board, player, tx, ty)
+                if self.noise:
+                    score += self.noise_for((key,) + move)
+                heapq.heappush(heap, (-score, entry[1] * 8 + d, id(army), entry[0], move))
+
     def evaluate_move(self, board, player, sx, sy, tx, ty):
         """评估移动的价值"""
         score = 0
@@ -75,36 +301,21 @@ class AIPlayer:
             if (tx, ty) in board.influence[player]:
                 score += 10
         
+        # 走到敌军下回合能吃到、又没有己方军队保护的格子，等于白送
+        if not threats_for(board).safe_square(player, tx, ty, mover=(sx, sy)):
+            score -= 15
+        
         return score
 
     def evaluate_position_value(self, board, player, x, y):
-        """评估位置价值"""
-        score = 0
-        
-        # 靠近敌方王塔
-        enemy_tower = [p for p in board.pieces if p.type == PieceType.TOWER and p.player.value != player]
-        if enemy_tower:
-            dist = abs(x - enemy_tower[0].x) + abs(y - enemy_tower[0].y)
-            score -= dist * 2  # 距离越近分数越高
-        
-        # 保护己方建筑
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
-                    piece = board.get_piece(nx, ny)
-                    if piece and piece.player.value == player:
-                        if piece.type == PieceType.FARM:
-                            score += 5
-                        elif piece.type == PieceType.INDUSTRY:
-                            score += 8
-                        elif piece.type == PieceType.TOWER:
-                            score += 20
-        
-        return score
+        """评估位置价值：靠近敌方王塔、保护己方建筑"""
+        return features_for(board).position_value(player, x, y)
 
     def choose_build(self, board, player):
         """选择建造位置和类型"""
+        planned = self._plan_step(board, 1)
+        if planned is not None:
+            return list(planned)
         builds = []
         
         # 检查濒危状态，优先补充建筑
@@ -116,21 +327,9 @@ class AIPlayer:
         return builds[:3]  # 最多建造3个
 
     def emergency_build(self, board, player):
-        """濒危状态下的紧急建造"""
-        builds = []
-        farm = board.count_type(player, PieceType.FARM)
-        ind = board.count_type(player, PieceType.INDUSTRY)
-        army = board.count_type(player, PieceType.ARMY)
-        
-        # 优先建造农田
-        if ind > (farm // 2):
-            builds.extend(self.find_build_positions(board, player, 0, 2))
-        
-        # 然后建造工业
-        if army > ind:
-            builds.extend(self.find_build_positions(board, player, 1, 1))
-        
-        return builds
+        """濒危状态下的紧急建造：按脱险规划建造农田、工业，剩下的缺口在拆除阶段补上"""
+        plan = plan_recovery(board, player)
+        return plan.builds if plan else []
 
     def strategic_build(self, board, player):
         """战略建造"""
@@ -148,86 +347,28 @@ class AIPlayer:
         return builds
 
     def find_build_positions(self, board, player, build_type, count):
-        """寻找建造位置"""
-        positions = []
-        
-        for y in range(BOARD_SIZE):
-            for x in range(BOARD_SIZE):
-                if board.can_build(x, y, player, build_type):
-                    score = self.evaluate_build_position(board, player, x, y, build_type)
-                    positions.append((x, y, build_type, score))
-        
-        # 按分数排序
-        positions.sort(key=lambda p: p[3], reverse=True)
-        
-        return [(x, y, build_type) for x, y, build_type, _ in positions[:count]]
+        """寻找建造位置：三种建造的评分一次批量算出，同一局面的后续查询直接取用"""
+        key = (id(board.grid), player, board.state_key())
+        if self._build_scores is None or self._build_scores[0] != key:
+            self._build_scores = (key, build_scores(board, player))
+        return top_sites(self._build_scores[1], build_type, count)
 
     def evaluate_build_position(self, board, player, x, y, build_type):
-        """评估建造位置的价值"""
-        score = 0
-        
-        # 靠近己方王塔
-        own_tower = [p for p in board.pieces if p.type == PieceType.TOWER and p.player.value == player]
-        if own_tower:
-            dist = abs(x - own_tower[0].x) + abs(y - own_tower[0].y)
-            score += (10 - dist) * 2
-        
-        # 远离敌方王塔
-        enemy_tower = [p for p in board.pieces if p.type == PieceType.TOWER and p.player.value != player]
-        if enemy_tower:
-            dist = abs(x - enemy_tower[0].x) + abs(y - enemy_tower[0].y)
-            score += dist
-        
-        # 根据建筑类型调整分数
-        if build_type == 0:  # 农田
-            # 农田最好建在远离工业的地方
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
-                        piece = board.get_piece(nx, ny)
-                        if piece and piece.type == PieceType.INDUSTRY:
-                            score -= 20
-        elif build_type == 1:  # 工业
-            # 工业可以建在海洋上，靠近农田
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
-                        piece = board.get_piece(nx, ny)
-                        if piece and piece.type == PieceType.FARM:
-                            score += 10
-        elif build_type == 2:  # 军队
-            # 军队最好建在靠近敌方的地方
-            enemy_tower = [p for p in board.pieces if p.type == PieceType.TOWER and p.player.value != player]
-            if enemy_tower:
-                dist = abs(x - enemy_tower[0].x) + abs(y - enemy_tower[0].y)
-                score += (20 - dist) * 3
-        
-        return score
+        """评估建造位置的价值（查特征累加器，O(1)）"""
+        return features_for(board).build_score(player, x, y, build_type)
 
     def choose_remove(self, board, player):
         """选择拆除的棋子"""
+        planned = self._plan_step(board, 2)
+        if planned is not None:
+            return list(planned)
         removes = []
         
-        # 检查是否需要拆除以维持平衡
-        farm = board.count_type(player, PieceType.FARM)
-        ind = board.count_type(player, PieceType.INDUSTRY)
-        army = board.count_type(player, PieceType.ARMY)
-        
-        # 如果工业过多，拆除工业
-        if ind > (farm // 2):
-            for p in board.get_player_pieces(player, PieceType.INDUSTRY):
-                if board.can_remove(p.x, p.y, player):
-                    removes.append((p.x, p.y))
-                    break
-        
-        # 如果军队过多，拆除军队
-        if army > (farm // 2) or army > ind:
-            for p in board.get_player_pieces(player, PieceType.ARMY):
-                if board.can_remove(p.x, p.y, player):
-                    removes.append((p.x, p.y))
-                    break
+        # 濒危时拆除代价最小的一组工业、军队以脱险
+        if board.danger[player]:
+            plan = plan_recovery(board, player, builds=False)
+            if plan:
+                removes = list(plan.removes)
         
         # 如果没有紧急需要，拆除价值最低的棋子
         if not removes:
@@ -245,18 +386,4 @@ class AIPlayer:
 
     def evaluate_piece_value(self, board, player, piece):
         """评估棋子的价值"""
-        value = 0
-        
-        if piece.type == PieceType.FARM:
-            value = 10
-        elif piece.type == PieceType.INDUSTRY:
-            value = 15
-        elif piece.type == PieceType.ARMY:
-            value = 20
-            # 军队位置越靠近敌方王塔价值越高
-            enemy_tower = [p for p in board.pieces if p.type == PieceType.TOWER and p.player.value != player]
-            if enemy_tower:
-                dist = abs(piece.x - enemy_tower[0].x) + abs(piece.y - enemy_tower[0].y)
-                value += (20 - dist)
-        
-        return value 
\ No newline at end of file
+        return features_for(board).piece_value(player, piece)
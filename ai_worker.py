@@ -0,0 +1,66 @@
+import queue
+import threading
+import traceback
+
+# 动作所属阶段：0=行军, 1=建造, 2=拆除
+ACTION_STEPS = {'move': 0, 'build': 1, 'remove': 2}
+
+
+class AIWorker:
+    """后台AI计算线程
+
+    主线程提交局面副本，工作线程计算整回合动作并通过结果队列返回，渲染循环不再被AI阻塞。
+    每次提交或取消都会递增代号，过期代号的结果直接丢弃。
+    """
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.generation = 0
+        self.pending = False  # 是否有未取回的计算任务
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def submit(self, ai, board, player):
+        """提交一次整回合计算（棋盘在主线程复制，工作线程只接触副本）"""
+        self.cancel()
+        self.cancel_event = threading.Event()
+        self.pending = True
+        self.jobs.put((self.generation, ai, board.clone(), player, self.cancel_event))
+        self._ensure_thread()
+
+    def cancel(self):
+        """放弃正在进行的计算，之后到达的结果会被丢弃"""
+        self.generation += 1
+        self.pending = False
+        self.cancel_event.set()
+
+    def poll(self):
+        """非阻塞取回当前代号的结果，没有结果时返回None"""
+        while True:
+            try:
+                generation, actions = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if generation == self.generation:
+                self.pending = False
+                return actions
+
+    def _run(self):
+        while True:
+            generation, ai, board, player, cancel_event = self.jobs.get()
+            if cancel_event.is_set():
+                continue
+            ai.cancel = cancel_event
+            try:
+                actions = ai.play_turn(board, player)
+            except Exception:
+                traceback.print_exc()
+                actions = []
+            finally:
+                ai.cancel = None
+            self.results.put((generation, actions))
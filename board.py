@@ -1,4 +1,3 @@
-import pygame
 import random
 import math
 from piece import Piece, PieceType, Player
@@ -7,9 +6,32 @@ BOARD_SIZE = 14
 LAND = 0
 WATER = 1
 MOUNTAIN = 2
+# 每支军队每回合最多行军的步数
+ARMY_STEPS = 3
+# 军队的八个移动方向（按国际象棋王的规则），逐个扫描的顺序：先dx后dy
+NEIGHBORS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+def is_endangered(farm, ind, army):
+    """濒危规则：工业超过农田的一半、军队超过农田的一半或超过工业、行动点（工业-军队+1）为负"""
+    return ind > farm // 2 or army > farm // 2 or army > ind or ind - army + 1 < 0
+
+def can_build_type(build_counts, build_type):
+    """建造规则：最多建两个相同的建筑，若要建三个则必须不同"""
+    if build_counts[build_type] >= 2:
+        return False
+    total_builds = sum(build_counts.values())
+    if total_builds >= 3:
+        return False
+    if total_builds == 2 and build_counts[build_type] > 0:
+        return False
+    return True
 
 class Board:
-    def __init__(self):
+    def __init__(self, seed=None):
+        self.observers = []  # 棋子变化监听者，见notify
+        self.journal = None  # make_move期间记录的棋子变化，供unmake_move撤销
+        # 指定seed时地图可复现（自对弈/测试用），否则使用全局随机数
+        self.rng = random.Random(seed) if seed is not None else random
         self.grid = self.generate_map()
         self.pieces = []
         self.init_pieces()
@@ -28,17 +50,69 @@ class Board:
         
         self.update_all_status()
 
+    def clone(self):
+        """复制棋盘用于推演（地图共享，棋子与状态独立）"""
+        board = Board.__new__(Board)
+        board.grid = self.grid
+        board.observers = []
+        board.journal = None
+        board.pieces = []
+        for p in self.pieces:
+            q = Piece(p.type, p.player, p.x, p.y)
+            q.move_count = p.move_count
+            board.pieces.append(q)
+        board.winner = self.winner
+        board.danger = dict(self.danger)
+        # 区域集合在更新时整体替换，可直接共享
+        board.national_scope = dict(self.national_scope)
+        board.influence = dict(self.influence)
+        board.built_areas = self.built_areas
+        board.forbidden_areas = self.forbidden_areas
+        board.pollution_areas = self.pollution_areas
+        board.farmland_areas = dict(self.farmland_areas)
+        board.development_areas = dict(self.development_areas)
+        board.preparation_areas = dict(self.preparation_areas)
+        # 维护派生状态的监听者（如特征累加器）随棋盘一起复制
+        for obs in self.observers:
+            clone_for = getattr(obs, 'clone_for', None)
+            if clone_for:
+                clone_for(board)
+        return board
+
+    def add_observer(self, observer):
+        """注册监听者，observer.on_board_change(event, piece, old)在棋子变化时被调用"""
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+    def notify(self, event, piece=None, old=None):
+        """通知棋子变化
+        event: 'add'新增 / 'remove'移除 / 'move'移动(old为原坐标) /
+               'owner'易主(old为原玩家值) / 'reset'整体替换(piece为None)
+        """
+        if self.journal is not None:
+            self.journal.append((event, piece, old))
+        for obs in self.observers:
+            obs.on_board_change(event, piece, old)
+
+    def state_key(self):
+        """局面键：棋子布局、移动计数与胜负，用于置换表/缓存"""
+        pieces = tuple(sorted((p.x, p.y, p.type.value, p.player.value, p.move_count) for p in self.pieces))
+        return (pieces, self.winner)
+
     def generate_map(self):
         """生成14x14地图：112块海洋，56格陆地，28格山脉"""
         # 初始化所有为海洋
         grid = [[WATER for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
         all_positions = [(x, y) for x in range(BOARD_SIZE) for y in range(BOARD_SIZE)]
         # 先选56块陆地
-        land_candidates = random.sample(all_positions, 56)
+        land_candidates = self.rng.sample(all_positions, 56)
         for x, y in land_candidates:
             grid[y][x] = LAND
         # 再从这56块陆地中选28块变为山脉
-        mountain_positions = random.sample(land_candidates, 28)
+        mountain_positions = self.rng.sample(land_candidates, 28)
         for x, y in mountain_positions:
             grid[y][x] = MOUNTAIN
         return grid
@@ -139,7 +213,7 @@ class Board:
             return False
         
         # 规则4：检查单个军队移动步数限制
-        if piece.move_count >= 3:
+        if piece.move_count >= ARMY_STEPS:
             return False
         
         # 规则4：检查总移动步数限制
@@ -148,20 +222,76 @@ class Board:
         
         return True
 
-    def move_piece(self, sx, sy, tx, ty):
-        """移动棋子"""
+    def move_piece(self, sx, sy, tx, ty, areas=True):
+        """移动棋子；areas为False时只更新濒危状态与势力范围，不重算建造用的各区域（推演用）"""
         piece = self.get_piece(sx, sy)
         if piece:
             target = self.get_piece(tx, ty)
             if target and target.type in (PieceType.ARMY, PieceType.TOWER) and target.player != piece.player:
                 self.pieces.remove(target)
+                self.notify('remove', target)
+                if target.type == PieceType.TOWER:
+                    self.winner = piece.player.value
+            old = (piece.x, piece.y)
             piece.x = tx
             piece.y = ty
             piece.move_count += 1
+            self.notify('move', piece, old)
             
             # 规则2：移动军队后处理势力范围冲突
             self.resolve_influence_conflict()
-        self.update_all_status()
+        if areas:
+            self.update_all_status()
+        else:
+            self.update_danger()
+
+    def make_move(self, sx, sy, tx, ty):
+        """按move_piece执行行军并返回撤销记录，推演时配合unmake_move使用，不必复制棋盘
+
+        只更新行军需要的状态（棋子、濒危、势力范围、胜负），建造用的各区域保持行军前的值，撤销后恢复。
+        """
+        if self.journal is None:
+            self.journal = []
+        piece = self.get_piece(sx, sy)
+        undo = (len(self.journal), list(self.pieces), piece, piece.move_count if piece else 0,
+                self.winner, dict(self.danger), self._areas())
+        self.move_piece(sx, sy, tx, ty, areas=False)
+        return undo
+
+    def unmake_move(self, undo):
+        """撤销make_move：按相反顺序回放期间的棋子变化（监听者随之增量恢复），再恢复区域状态"""
+        mark, pieces, piece, move_count, winner, danger, areas = undo
+        journal = self.journal if self.journal is not None else []
+        events = journal[mark:]
+        del journal[mark:]
+        self.journal = None
+        for event, p, old in reversed(events):
+            if event == 'add':
+                self.notify('remove', p)
+            elif event == 'remove':
+                self.notify('add', p)
+            elif event == 'move':
+                current = (p.x, p.y)
+                p.x, p.y = old
+                self.notify('move', p, current)
+            elif event == 'owner':
+                current = p.player.value
+                p.player = Player(old)
+                self.notify('owner', p, current)
+        # 最外层撤销后停止记录
+        self.journal = journal if mark else None
+        self.pieces = pieces
+        if piece:
+            piece.move_count = move_count
+        self.winner = winner
+        self.danger = danger
+        (self.national_scope, self.influence, self.built_areas, self.forbidden_areas, self.pollution_areas,
+         self.farmland_areas, self.development_areas, self.preparation_areas) = areas
+
+    def _areas(self):
+        """区域状态的引用（更新时各集合整体替换，保存引用即可）"""
+        return (self.national_scope, self.influence, self.built_areas, self.forbidden_areas,
+                self.pollution_areas, self.farmland_areas, self.development_areas, self.preparation_areas)
 
     def can_build(self, x, y, player, build_type):
         """检查是否可以建造"""
@@ -202,10 +332,11 @@ class Board:
 
     def build_piece(self, x, y, player, build_type):
         """建造棋子"""
+        piece = None
         if build_type == 0:
-            self.pieces.append(Piece(PieceType.FARM, Player(player), x, y))
+            piece = Piece(PieceType.FARM, Player(player), x, y)
         elif build_type == 1:
-            self.pieces.append(Piece(PieceType.INDUSTRY, Player(player), x, y))
+            piece = Piece(PieceType.INDUSTRY, Player(player), x, y)
             # 规则1：工业建造后摧毁上下左右四个格子的农田
             for dx, dy in [(-1,0), (1,0), (0,-1), (0,1)]:
                 nx, ny = x + dx, y + dy
@@ -213,8 +344,12 @@ class Board:
                     p = self.get_piece(nx, ny)
                     if p and p.type == PieceType.FARM:
                         self.pieces.remove(p)
+                        self.notify('remove', p)
         elif build_type == 2:
-            self.pieces.append(Piece(PieceType.ARMY, Player(player), x, y))
+            piece = Piece(PieceType.ARMY, Player(player), x, y)
+        if piece:
+            self.pieces.append(piece)
+            self.notify('add', piece)
         
         self.update_all_status()
 
@@ -227,7 +362,10 @@ class Board:
 
     def remove_piece(self, x, y):
         """拆除棋子"""
+        removed = [p for p in self.pieces if p.x == x and p.y == y]
         self.pieces = [p for p in self.pieces if not (p.x == x and p.y == y)]
+        for p in removed:
+            self.notify('remove', p)
         self.update_all_status()
 
     def get_move_limit(self, player):
@@ -243,19 +381,7 @@ class Board:
 
     def update_all_status(self):
         """更新所有状态"""
-        # 检查濒危状态
-        for player in [1, 2]:
-            farm = self.count_type(player, PieceType.FARM)
-            ind = self.count_type(player, PieceType.INDUSTRY)
-            army = self.count_type(player, PieceType.ARMY)
-            danger = False
-            # 规则3：工业数量小于等于二分之一农田数，军队数小于等于工业数
-            if ind > (farm // 2) or army > (farm // 2) or army > ind:
-                danger = True
-            # 规则4：当行动点为负数时也处于濒危状态
-            if ind - army + 1 < 0:
-                danger = True
-            self.danger[player] = danger
+        self.update_danger()
         
         # 计算各种区域
         self.calc_all_areas()
@@ -263,6 +389,15 @@ class Board:
         # 解决势力范围冲突
         self.resolve_influence_conflict()
 
+    def update_danger(self):
+        """检查濒危状态"""
+        for player in [1, 2]:
+            farm = self.count_type(player, PieceType.FARM)
+            ind = self.count_type(player, PieceType.INDUSTRY)
+            army = self.count_type(player, PieceType.ARMY)
+            # 规则3：工业数量小于等于二分之一农田数，军队数小于等于工业数；规则4：行动点为负数时也处于濒危状态
+            self.danger[player] = is_endangered(farm, ind, army)
+
     def calc_all_areas(self):
         """计算所有区域"""
         # 计算已建区（所有建筑位置）
@@ -386,56 +521,31 @@ class Board:
         # 执行变更
         for p in to_remove:
             self.pieces.remove(p)
+            self.notify('remove', p)
         
         for p, new_player in to_change_owner:
+            old_player = p.player.value
             p.player = Player(new_player)
+            self.notify('owner', p, old_player)
 
     def draw(self, screen, width, height, selected=None, mode=0, current_player=1, offset_x=40, offset_y=40, board_pixel=None):
-        """绘制游戏板，支持自定义偏移和区域大小"""
+        """绘制游戏板，支持自定义偏移和区域大小；图块取自按格子大小缓存的图集，分层批量贴图"""
+        import pygame
+        from render import sprite_atlas
         if board_pixel is None:
             board_pixel = min(width, height-100) - 40*2
         tile_size = board_pixel // BOARD_SIZE
+        atlas = sprite_atlas(tile_size)
         # 势力范围高亮
-        for player in [1, 2]:
-            color = (255, 220, 220, 80) if player == 1 else (180, 200, 255, 80)
-            for (x, y) in self.influence[player]:
-                rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
-                s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
-                s.fill(color)
-                screen.blit(s, rect.topleft)
+        atlas.draw(screen, [(atlas.rects[('influence', player)], (offset_x + x*tile_size, offset_y + y*tile_size))
+                            for player in [1, 2] for (x, y) in self.influence[player]])
         # 地形
-        for y in range(BOARD_SIZE):
-            for x in range(BOARD_SIZE):
-                rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
-                if self.grid[y][x] == LAND:
-                    color = (180, 220, 180)
-                elif self.grid[y][x] == WATER:
-                    color = (120, 180, 220)
-                else:
-                    color = (150, 150, 150)
-                pygame.draw.rect(screen, color, rect)
-                pygame.draw.rect(screen, (80, 80, 80), rect, 1)
-                if selected and (x, y) == selected:
-                    pygame.draw.rect(screen, (255, 180, 60), rect, 4)
+        atlas.draw(screen, [(atlas.terrain(self.grid[y][x]), (offset_x + x*tile_size, offset_y + y*tile_size))
+                            for y in range(BOARD_SIZE) for x in range(BOARD_SIZE)])
+        if selected:
+            x, y = selected
+            rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
+            pygame.draw.rect(screen, (255, 180, 60), rect, 4)
         # 棋子
-        for piece in self.pieces:
-            px = offset_x + piece.x*tile_size + tile_size//2
-            py = offset_y + piece.y*tile_size + tile_size//2
-            if piece.type == PieceType.ARMY:
-                points = [
-                    (px, py-int(tile_size*0.3)), 
-                    (px-int(tile_size*0.25), py+int(tile_size*0.2)), 
-                    (px+int(tile_size*0.25), py+int(tile_size*0.2))
-                ]
-                color = (220, 60, 60) if piece.player == Player.WHITE else (60, 60, 220)
-                pygame.draw.polygon(screen, color, points)
-            elif piece.type == PieceType.FARM:
-                color = (200, 220, 80) if piece.player == Player.WHITE else (80, 200, 120)
-                pygame.draw.circle(screen, color, (px, py), int(tile_size*0.27))
-            elif piece.type == PieceType.INDUSTRY:
-                color = (180, 180, 180) if piece.player == Player.WHITE else (220, 140, 60)
-                pygame.draw.rect(screen, color, (px-int(tile_size*0.27), py-int(tile_size*0.27), int(tile_size*0.54), int(tile_size*0.54)))
-            elif piece.type == PieceType.TOWER:
-                color = (255, 255, 255) if piece.player == Player.WHITE else (0, 0, 0)
-                pygame.draw.rect(screen, color, (px-int(tile_size*0.2), py-int(tile_size*0.2), int(tile_size*0.4), int(tile_size*0.4)))
-                pygame.draw.rect(screen, (120, 60, 0), (px-int(tile_size*0.13), py-int(tile_size*0.13), int(tile_size*0.26), int(tile_size*0.26))) 
\ No newline at end of file
+        atlas.draw(screen, [(atlas.rects[(piece.type, piece.player)], (offset_x + piece.x*tile_size, offset_y + piece.y*tile_size))
+                            for piece in self.pieces])
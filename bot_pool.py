@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from ai import AIPlayer, DIFFICULTY_LEVELS
+from board import Board
+from piece import Piece, PieceType, Player
+
+# 单个机器人每回合思考时间上限（秒），在难度预算之上再封顶，防止个别对局占满工作进程
+BOT_TIME_CAP = 1.0
+# 最多保留多少条思考记录用于统计
+METRIC_WINDOW = 1000
+
+
+def board_state(board):
+    """导出无界面规则核心所需的局面（格式与客户端init_state相同）"""
+    return {
+        "grid": board.grid,
+        "pieces": [
+            {"type": p.type.value, "player": p.player.value, "x": p.x, "y": p.y}
+            for p in board.pieces
+        ],
+    }
+
+
+def board_from_state(state):
+    """由init_state构造无界面棋盘"""
+    board = Board()
+    board.grid = state["grid"]
+    board.pieces = [Piece(PieceType(p["type"]), Player(p["player"]), p["x"], p["y"])
+                    for p in state["pieces"]]
+    board.winner = None
+    board.update_all_status()
+    return board
+
+
+def think(difficulty, state, player, seed=0, time_cap=BOT_TIME_CAP):
+    """工作进程入口：在局面副本上走完整回合，返回动作与计算量"""
+    level = DIFFICULTY_LEVELS[difficulty]
+    ai = AIPlayer(difficulty, time_limit=min(level['time_ms'] / 1000, time_cap), seed=seed)
+    board = board_from_state(state)
+    start = time.perf_counter()
+    cpu = time.process_time()
+    actions = ai.play_turn(board, player)
+    return {
+        "actions": actions,
+        "nodes": ai.nodes,
+        "think_ms": (time.perf_counter() - start) * 1000,
+        "cpu_ms": (time.process_time() - cpu) * 1000,
+    }
+
+
+class BotBusy(Exception):
+    """等待队列已满，暂不接受新的机器人计算"""
+
+
+class BotPool:
+    """服务器托管机器人的计算池
+
+    AI计算放在进程池中，不阻塞asyncio事件循环；同时在算的任务数不超过工作进程数，
+    其余任务在事件循环上排队，排队数超过max_queue时拒绝（BotBusy）。
+    每回合的计算量由难度预算（节点数、思考时间）决定，思考时间再受time_cap封顶。
+    """
+    def __init__(self, workers=None, max_queue=256, time_cap=BOT_TIME_CAP):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.time_cap = time_cap
+        self.executor = None
+        self.slots = None  # asyncio.Semaphore，首次使用时在事件循环内创建
+        self.running = 0
+        self.queued = 0
+        self.records = []  # [(排队ms, 思考ms, CPU ms, 节点数)]
+        self.rejected = 0
+
+    def _ensure(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.slots = asyncio.Semaphore(self.workers)
+
+    async def think(self, difficulty, board, player, seed=0):
+        """为player计算一个整回合，返回think()的结果（另加排队时间queue_ms）"""
+        if difficulty not in DIFFICULTY_LEVELS:
+            raise ValueError(f"未知的AI难度: {difficulty}")
+        self._ensure()
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise BotBusy("机器人计算繁忙")
+        state = board_state(board)
+        enqueued = time.perf_counter()
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        queue_ms = (time.perf_counter() - enqueued) * 1000
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.executor, think, difficulty, state, player, seed, self.time_cap)
+        finally:
+            self.running -= 1
+            self.slots.release()
+        result["queue_ms"] = queue_ms
+        self.records.append((queue_ms, result["think_ms"], result["cpu_ms"], result["nodes"]))
+        del self.records[:-METRIC_WINDOW]
+        return result
+
+    def metrics(self):
+        """思考时间统计：次数、平均与P95思考时间、平均排队时间、当前排队与运行数"""
+        stats = {"turns": len(self.records), "queued": self.queued,
+                 "running": self.running, "rejected": self.rejected}
+        if self.records:
+            think_ms = sorted(r[1] for r in self.records)
+            stats["think_ms_avg"] = sum(think_ms) / len(think_ms)
+            stats["think_ms_p95"] = think_ms[min(len(think_ms) - 1, int(len(think_ms) * 0.95))]
+            stats["think_ms_max"] = think_ms[-1]
+            stats["cpu_ms_avg"] = sum(r[2] for r in self.records) / len(self.records)
+            stats["queue_ms_avg"] = sum(r[0] for r in self.records) / len(self.records)
+            stats["nodes_avg"] = sum(r[3] for r in self.records) / len(self.records)
+        return stats
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
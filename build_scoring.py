@@ -0,0 +1,112 @@
+import numpy as np
+from piece import PieceType
+from board import BOARD_SIZE, LAND, WATER
+from distance import DistanceMaps
+
+# 不能建造的格子的分数，比任何真实分数都小
+ILLEGAL = -10 ** 9
+
+
+def _box_sum(planes):
+    """对每个平面做3x3邻域（含自身）求和，边界外按0计；先横向再纵向，各两次加法"""
+    padded = np.zeros((planes.shape[0], BOARD_SIZE + 2, BOARD_SIZE + 2), dtype=planes.dtype)
+    padded[:, 1:-1, 1:-1] = planes
+    rows = padded[:, :, :-2] + padded[:, :, 1:-1] + padded[:, :, 2:]
+    return rows[:, :-2] + rows[:, 1:-1] + rows[:, 2:]
+
+
+_terrain = (None, None)  # (地图内容, (陆地掩码, 陆地或海洋掩码))，同一张地图只转换一次
+
+
+def _terrain_masks(grid):
+    global _terrain
+    key = tuple(map(tuple, grid))
+    if _terrain[0] != key:
+        g = np.asarray(grid)
+        _terrain = (key, (g == LAND, (g == LAND) | (g == WATER)))
+    return _terrain[1]
+
+
+def _mask(cells):
+    mask = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    if cells:
+        xs, ys = zip(*cells)
+        mask[list(ys), list(xs)] = True
+    return mask
+
+
+def build_scores(board, player, limits=True):
+    """一次算出三种建造在每个格子上的评分，返回形状(3, BOARD_SIZE, BOARD_SIZE)的整数数组
+
+    评分与FeatureAccumulator.build_score一致，合法性与Board.can_build一致，不能建造的格子为ILLEGAL。
+    limits为False时不检查数量限制（工业、军队受农田数约束），只看格子本身能否建造。
+    """
+    occupied = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    # 第0层农田、第1层工业（双方合计）
+    planes = np.zeros((2, BOARD_SIZE, BOARD_SIZE), dtype=np.int64)
+    counts = {PieceType.FARM: 0, PieceType.INDUSTRY: 0, PieceType.ARMY: 0}
+    towers = {}
+    for p in board.pieces:
+        occupied[p.y, p.x] = True
+        if p.type == PieceType.FARM:
+            planes[0, p.y, p.x] += 1
+        elif p.type == PieceType.INDUSTRY:
+            planes[1, p.y, p.x] += 1
+        elif p.type == PieceType.TOWER:
+            towers[p.player.value] = (p.x, p.y)
+        if p.player.value == player and p.type in counts:
+            counts[p.type] += 1
+
+    # 与王塔的距离分
+    maps = DistanceMaps.for_grid(board.grid)
+    base = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int64)
+    own = towers.get(player)
+    if own:
+        base += (10 - np.asarray(maps.field(*own)).reshape(BOARD_SIZE, BOARD_SIZE)) * 2
+    enemy = towers.get(3 - player)
+    enemy_dist = None
+    if enemy:
+        enemy_dist = np.asarray(maps.field(*enemy)).reshape(BOARD_SIZE, BOARD_SIZE)
+        base += enemy_dist
+
+    scores = np.empty((3, BOARD_SIZE, BOARD_SIZE), dtype=np.int64)
+    near = _box_sum(planes)
+    scores[0] = base - 20 * near[1]
+    scores[1] = base + 10 * near[0]
+    scores[2] = base + (20 - enemy_dist) * 3 if enemy_dist is not None else base
+
+    # 合法性：空格、地形、所在区域、数量限制
+    farm, ind, army = counts[PieceType.FARM], counts[PieceType.INDUSTRY], counts[PieceType.ARMY]
+    land, land_or_water = _terrain_masks(board.grid)
+    legal = np.empty((3, BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    legal[0] = land & _mask(board.farmland_areas[player])
+    legal[1] = land_or_water & _mask(board.development_areas[player])
+    legal[2] = land & _mask(board.preparation_areas[player])
+    legal &= ~occupied
+    if limits and ind + 1 > farm // 2:
+        legal[1] = False
+    if limits and (army + 1 > farm // 2 or army + 1 > ind):
+        legal[2] = False
+    scores[~legal] = ILLEGAL
+    return scores
+
+
+def top_sites(scores, build_type, count):
+    """取某种建造评分最高的count个格子[(x, y, build_type)]
+
+    用argpartition取前count名；同分时按格子顺序（先y后x）优先，与逐格扫描后稳定排序的结果一致。
+    """
+    flat = scores[build_type].ravel()
+    legal = np.flatnonzero(flat > ILLEGAL)
+    if count <= 0 or legal.size == 0:
+        return []
+    values = flat[legal]
+    if legal.size > count:
+        # 第count名的分数；高于它的全要，等于它的按格子顺序补足
+        threshold = values[np.argpartition(-values, count - 1)[count - 1]]
+        above = legal[values > threshold]
+        tied = legal[values == threshold][:count - above.size]
+        legal = np.concatenate([above, tied])
+        values = flat[legal]
+    order = np.lexsort((legal, -values))
+    return [(int(i % BOARD_SIZE), int(i // BOARD_SIZE), build_type) for i in legal[order]]
@@ -0,0 +1,143 @@
+from piece import PieceType
+from board import LAND, WATER, can_build_type
+from evaluation import PIECE_VALUES, features_for
+
+ORTHOGONAL = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+# 一回合内农田、工业的建造组合（先农田后工业）；建军队只会加重濒危，不考虑
+BUILD_COMBOS = [(nf, ni) for nf in range(3) for ni in range(3) if nf + ni <= 3]
+
+
+def _removals(farm, ind, army):
+    """建造之后还需拆除的工业、军队数：拆农田只会更糟，工业拆到 农田//2，军队拆到不超过 农田//2 与剩余工业"""
+    half = farm // 2
+    ri = max(0, ind - half)
+    ra = max(0, army - half, army - (ind - ri))
+    return ri, ra
+
+
+def recovery_counts(farm, ind, army, build_counts=None, farm_sites=3, industry_losses=()):
+    """在棋子计数上求解代价最小的脱险方案，返回(拆除代价, 建农田数, 建工业数, 拆工业数, 拆军队数)
+
+    build_counts为本回合已建造的数量（None表示建造阶段尚未开始）；
+    farm_sites为可建农田的格子数；industry_losses为可建工业的格子按升序排列的“会摧毁的己方农田数”。
+    工业按顺序建造，每次建造前检查 工业+1 <= 农田//2，建成后扣掉被摧毁的农田。
+    代价为拆除棋子的价值之和，同代价时动作少的优先。只做整数运算，几微秒即可完成。
+    """
+    counts = dict(build_counts or {0: 0, 1: 0, 2: 0})
+    best = None
+    for nf, ni in BUILD_COMBOS:
+        if nf > farm_sites or ni > len(industry_losses):
+            continue
+        trial = dict(counts)
+        ok = True
+        for build_type in [0] * nf + [1] * ni:
+            if not can_build_type(trial, build_type):
+                ok = False
+                break
+            trial[build_type] += 1
+        if not ok:
+            continue
+        f, i = farm + nf, ind
+        for loss in industry_losses[:ni]:
+            if i + 1 > f // 2:
+                ok = False
+                break
+            i += 1
+            f -= loss
+        if not ok:
+            continue
+        ri, ra = _removals(f, i, army)
+        cost = (ri * PIECE_VALUES[PieceType.INDUSTRY] + ra * PIECE_VALUES[PieceType.ARMY], nf + ni + ri + ra)
+        if best is None or cost < best[0]:
+            best = (cost, nf, ni, ri, ra)
+    if best is None:
+        return None
+    (cost, _), nf, ni, ri, ra = best
+    return cost, nf, ni, ri, ra
+
+
+def _cross(x, y):
+    """在(x, y)建工业后不能再建农田的格子：自身及上下左右（农田会被摧毁）"""
+    return {(x + dx, y + dy) for dx, dy in ORTHOGONAL + [(0, 0)]}
+
+
+class RecoveryPlan:
+    """脱险方案：按顺序执行的建造与拆除"""
+    __slots__ = ('builds', 'removes', 'cost')
+
+    def __init__(self, builds, removes, cost):
+        self.builds = builds  # [(x, y, build_type)]，农田在前
+        self.removes = removes  # [(x, y)]
+        self.cost = cost
+
+    def __repr__(self):
+        return f"RecoveryPlan(builds={self.builds}, removes={self.removes}, cost={self.cost})"
+
+
+def plan_recovery(board, player, build_counts=None, builds=True):
+    """为处于濒危的player规划脱险的建造与拆除，不在濒危时返回None
+
+    先在计数上求最优组合，再落到具体格子：工业选摧毁己方农田最少的位置，
+    农田避开这些工业及其上下左右，拆除选价值最低的工业与军队。
+    build_counts为本回合已建造的数量；builds为False时（拆除阶段）只规划拆除。
+    """
+    if not board.danger[player]:
+        return None
+    acc = features_for(board)
+    material = acc.material[player]
+    farm, ind, army = material[PieceType.FARM], material[PieceType.INDUSTRY], material[PieceType.ARMY]
+    can_build = builds and (build_counts is None or sum(build_counts.values()) < 3)
+    industry_sites = []  # (会摧毁的己方农田数, x, y)
+    farm_cells = []
+    if can_build:
+        # 候选格子只取棋盘维护的开发区、耕地区，不逐格扫描全盘；
+        # 工业的数量限制在先建农田后可能满足，这里只看格子本身，数量由recovery_counts检查
+        occupied = set()
+        farm_loss = {}  # 格子 -> 在此建工业会摧毁的己方农田数
+        for p in board.pieces:
+            occupied.add((p.x, p.y))
+            if p.type == PieceType.FARM and p.player.value == player:
+                for dx, dy in ORTHOGONAL:
+                    cell = (p.x + dx, p.y + dy)
+                    farm_loss[cell] = farm_loss.get(cell, 0) + 1
+        grid = board.grid
+        industry_sites = [(farm_loss.get((x, y), 0), x, y) for x, y in board.development_areas[player]
+                          if (x, y) not in occupied and grid[y][x] in (LAND, WATER)]
+        farm_cells = [(x, y) for x, y in board.farmland_areas[player]
+                      if (x, y) not in occupied and grid[y][x] == LAND]
+    losses = sorted(site[0] for site in industry_sites)[:3]
+    farm_sites = len(farm_cells)
+    while True:
+        result = recovery_counts(farm, ind, army, build_counts, farm_sites, losses)
+        if result is None:
+            return None
+        cost, nf, ni, ri, ra = result
+        # 确定要建几个之后才给候选格子评分：工业只比较摧毁农田数不超过第ni名的格子，
+        # 第k个工业取摧毁农田数等于losses[k]的格子，优先选建成后仍留得下nf个农田格子的
+        industries = []
+        taken = set()
+        if ni:
+            ranked = sorted((loss, -acc.build_score(player, x, y, 1), x, y)
+                            for loss, x, y in industry_sites if loss <= losses[ni - 1])
+            for k in range(ni):
+                options = [(x, y) for loss, _, x, y in ranked if loss == losses[k] and (x, y, 1) not in industries]
+                free = [c for c in farm_cells if c not in taken]
+                keep = [(x, y) for x, y in options if len(free) - len(_cross(x, y).intersection(free)) >= nf]
+                x, y = (keep or options)[0]
+                industries.append((x, y, 1))
+                taken |= _cross(x, y)
+        free = [(x, y) for x, y in farm_cells if (x, y) not in taken]
+        if len(free) >= nf:
+            break
+        # 避开工业后农田格子不够：按实际剩下的格子数重新求解（格子数严格减少，最终nf为0）
+        farm_sites = len(free)
+    farms = []
+    if nf:
+        ranked = sorted((-acc.build_score(player, x, y, 0), x, y) for x, y in free)
+        farms = [(x, y, 0) for _, x, y in ranked[:nf]]
+
+    removes = []
+    for ptype, count in ((PieceType.INDUSTRY, ri), (PieceType.ARMY, ra)):
+        pieces = sorted(board.get_player_pieces(player, ptype), key=lambda p: acc.piece_value(player, p))
+        removes.extend((p.x, p.y) for p in pieces[:count])
+    return RecoveryPlan(farms + industries, removes, cost)
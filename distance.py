@@ -0,0 +1,170 @@
+from collections import OrderedDict, deque
+from board import BOARD_SIZE, LAND, MOUNTAIN, NEIGHBORS
+
+CELLS = BOARD_SIZE * BOARD_SIZE
+# 不可达距离，比任何真实距离都大
+UNREACHABLE = 2 * BOARD_SIZE
+
+# 每个格子八方向相邻格子的下标（军队按国际象棋王的规则移动）
+KING_NEIGHBORS = []
+for _y in range(BOARD_SIZE):
+    for _x in range(BOARD_SIZE):
+        KING_NEIGHBORS.append([
+            (_y + _dy) * BOARD_SIZE + (_x + _dx)
+            for _dx, _dy in NEIGHBORS
+            if 0 <= _x + _dx < BOARD_SIZE and 0 <= _y + _dy < BOARD_SIZE
+        ])
+
+# 按地图缓存的距离表，地图内容相同即复用
+_CACHE = OrderedDict()
+_CACHE_SIZE = 16
+
+
+def _bfs(passable, source, blocked=None):
+    """从source出发的王步BFS，返回扁平距离表"""
+    dist = [UNREACHABLE] * CELLS
+    dist[source] = 0
+    queue = deque([source])
+    while queue:
+        i = queue.popleft()
+        d = dist[i] + 1
+        for j in KING_NEIGHBORS[i]:
+            if dist[j] > d and passable[j] and not (blocked and j in blocked):
+                dist[j] = d
+                queue.append(j)
+    return dist
+
+
+class DistanceMaps:
+    """某张地图的地形距离表
+
+    距离为军队的行军步数：八方向移动、不能进入山脉，海洋可以通过（与can_move_army一致）。
+    以任一格为起点的距离场在第一次使用时计算，王塔与陆地格在创建时预先计算。
+    """
+    def __init__(self, grid):
+        self.passable = [grid[i // BOARD_SIZE][i % BOARD_SIZE] != MOUNTAIN for i in range(CELLS)]
+        self.fields = {}
+        self.disks = {}
+        for i in range(CELLS):
+            if grid[i // BOARD_SIZE][i % BOARD_SIZE] == LAND:
+                self.fields[i] = _bfs(self.passable, i)
+
+    @staticmethod
+    def for_grid(grid):
+        """取得地图的距离表（按地图内容缓存）"""
+        key = tuple(tuple(row) for row in grid)
+        maps = _CACHE.get(key)
+        if maps is None:
+            maps = DistanceMaps(grid)
+            _CACHE[key] = maps
+            if len(_CACHE) > _CACHE_SIZE:
+                _CACHE.popitem(last=False)
+        else:
+            _CACHE.move_to_end(key)
+        return maps
+
+    def field(self, x, y):
+        """以(x, y)为起点的距离场（扁平列表，下标为y*BOARD_SIZE+x）"""
+        i = y * BOARD_SIZE + x
+        dist = self.fields.get(i)
+        if dist is None:
+            dist = _bfs(self.passable, i)
+            self.fields[i] = dist
+        return dist
+
+    def distance(self, sx, sy, tx, ty):
+        """不考虑棋子阻挡的行军距离"""
+        return self.field(sx, sy)[ty * BOARD_SIZE + tx]
+
+    def within(self, x, y, radius):
+        """从(x, y)出发radius步内可到达的格子下标（不含起点，按需计算并缓存）"""
+        key = (y * BOARD_SIZE + x, radius)
+        cells = self.disks.get(key)
+        if cells is None:
+            dist = self.field(x, y)
+            cells = [i for i in range(CELLS) if 0 < dist[i] <= radius]
+            self.disks[key] = cells
+        return cells
+
+    def blocked_field(self, x, y, blockers=()):
+        """以(x, y)为起点、考虑动态阻挡的距离场"""
+        return BlockedField(self, x, y, blockers)
+
+
+class BlockedField:
+    """考虑棋子阻挡的距离场，阻挡增减时只重算受影响的部分
+
+    起点与查询终点本身可以被占据（终点上的棋子即要吃掉或出发的棋子），
+    路径中间的格子不能有阻挡。
+    """
+    def __init__(self, maps, x, y, blockers=()):
+        self.maps = maps
+        self.source = y * BOARD_SIZE + x
+        self.blocked = set(by * BOARD_SIZE + bx for bx, by in blockers)
+        self.blocked.discard(self.source)
+        if self.blocked:
+            self.dist = _bfs(maps.passable, self.source, self.blocked)
+        else:
+            self.dist = maps.field(x, y)[:]
+
+    def distance(self, x, y):
+        """到(x, y)的步数，终点被占据时按相邻格+1计算"""
+        i = y * BOARD_SIZE + x
+        if i == self.source:
+            return 0
+        if i not in self.blocked and self.maps.passable[i]:
+            return self.dist[i]
+        best = UNREACHABLE
+        for j in KING_NEIGHBORS[i]:
+            if j not in self.blocked and self.dist[j] + 1 < best:
+                best = self.dist[j] + 1
+        return best
+
+    def add_blocker(self, x, y):
+        """增加阻挡：只有距离大于该格的格子可能变远，从同层前沿重新扩展"""
+        i = y * BOARD_SIZE + x
+        if i == self.source or i in self.blocked:
+            return
+        self.blocked.add(i)
+        level = self.dist[i]
+        if level >= UNREACHABLE:
+            return
+        self.dist[i] = UNREACHABLE
+        passable = self.maps.passable
+        frontier = []
+        for j in range(CELLS):
+            d = self.dist[j]
+            if d > level and d < UNREACHABLE:
+                self.dist[j] = UNREACHABLE
+            elif d == level:
+                frontier.append(j)
+        queue = deque(frontier)
+        while queue:
+            j = queue.popleft()
+            d = self.dist[j] + 1
+            for k in KING_NEIGHBORS[j]:
+                if self.dist[k] > d and passable[k] and k not in self.blocked:
+                    self.dist[k] = d
+                    queue.append(k)
+
+    def remove_blocker(self, x, y):
+        """移除阻挡：该格及其后方只可能变近，从该格向外松弛"""
+        i = y * BOARD_SIZE + x
+        if i not in self.blocked:
+            return
+        self.blocked.discard(i)
+        passable = self.maps.passable
+        if not passable[i]:
+            return
+        best = min((self.dist[j] for j in KING_NEIGHBORS[i] if j not in self.blocked), default=UNREACHABLE)
+        if best + 1 >= self.dist[i]:
+            return
+        self.dist[i] = best + 1
+        queue = deque([i])
+        while queue:
+            j = queue.popleft()
+            d = self.dist[j] + 1
+            for k in KING_NEIGHBORS[j]:
+                if self.dist[k] > d and passable[k] and k not in self.blocked:
+                    self.dist[k] = d
+                    queue.append(k)
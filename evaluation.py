@@ -0,0 +1,274 @@
+import json
+import os
+from piece import PieceType
+from board import BOARD_SIZE, is_endangered
+from distance import DistanceMaps
+
+CELLS = BOARD_SIZE * BOARD_SIZE
+WIN_SCORE = 100000
+
+# 棋子基础价值（与AIPlayer.evaluate_piece_value保持一致）
+PIECE_VALUES = {
+    PieceType.FARM: 10,
+    PieceType.INDUSTRY: 15,
+    PieceType.ARMY: 20,
+}
+
+# 每个格子周围3x3（含自身）的格子下标，预先计算避免重复边界判断
+BLOCK = []
+# 每个格子周围八格（不含自身）的格子下标
+RING = []
+for _y in range(BOARD_SIZE):
+    for _x in range(BOARD_SIZE):
+        block = []
+        ring = []
+        for _dx in [-1, 0, 1]:
+            for _dy in [-1, 0, 1]:
+                _nx, _ny = _x + _dx, _y + _dy
+                if 0 <= _nx < BOARD_SIZE and 0 <= _ny < BOARD_SIZE:
+                    block.append(_ny * BOARD_SIZE + _nx)
+                    if _dx != 0 or _dy != 0:
+                        ring.append(_ny * BOARD_SIZE + _nx)
+        BLOCK.append(block)
+        RING.append(ring)
+
+
+def features_for(board):
+    """取得棋盘上挂载的特征累加器，没有则创建并挂载"""
+    for obs in board.observers:
+        if isinstance(obs, FeatureAccumulator):
+            return obs
+    return FeatureAccumulator(board)
+
+
+class FeatureAccumulator:
+    """局面特征累加器
+
+    作为棋盘监听者随棋子的增删、移动、易主增量更新以下特征：
+    - 双方王塔坐标
+    - 双方各类棋子数量
+    - 每个格子3x3范围内各方各类棋子的数量
+    - 每个格子被多少支军队的势力范围覆盖，以及双方势力范围大小
+    - 双方军队向敌方王塔推进的累计分
+    距离使用地形距离表（王步、绕开山脉），同一张地图的距离表全局共享。
+    这样候选格子的评分是O(1)的，整盘评估也只需常数次查表。
+    """
+    def __init__(self, board, attach=True):
+        self.board = board
+        if attach:
+            self.rebuild()
+            board.add_observer(self)
+
+    def rebuild(self):
+        """按当前棋子从头计算全部特征"""
+        self.maps = DistanceMaps.for_grid(self.board.grid)
+        self.towers = {1: None, 2: None}
+        self.tower_fields = {1: None, 2: None}
+        self.material = {pl: {t: 0 for t in PieceType} for pl in (1, 2)}
+        self.near = {(pl, t): [0] * CELLS for pl in (1, 2) for t in PieceType}
+        self.influence_count = {1: [0] * CELLS, 2: [0] * CELLS}
+        self.influence_size = {1: 0, 2: 0}
+        self.advance = {1: 0, 2: 0}
+        for p in self.board.pieces:
+            if p.type == PieceType.TOWER:
+                self._set_tower(p.player.value, (p.x, p.y))
+        for p in self.board.pieces:
+            self._add(p, p.x, p.y, p.player.value)
+        self.advance = {pl: self._advance_sum(pl) for pl in (1, 2)}
+
+    def clone_for(self, board):
+        """为复制出的棋盘复制一份累加器（列表切片，比重算便宜）"""
+        acc = FeatureAccumulator(board, attach=False)
+        acc.maps = self.maps
+        acc.towers = dict(self.towers)
+        acc.tower_fields = dict(self.tower_fields)
+        acc.material = {pl: dict(counts) for pl, counts in self.material.items()}
+        acc.near = {k: v[:] for k, v in self.near.items()}
+        acc.influence_count = {pl: v[:] for pl, v in self.influence_count.items()}
+        acc.influence_size = dict(self.influence_size)
+        acc.advance = dict(self.advance)
+        board.add_observer(acc)
+        return acc
+
+    # ---- 增量更新 ----
+    def on_board_change(self, event, piece, old):
+        if event == 'add':
+            self._add(piece, piece.x, piece.y, piece.player.value)
+        elif event == 'remove':
+            self._remove(piece, piece.x, piece.y, piece.player.value)
+        elif event == 'move':
+            self._remove(piece, old[0], old[1], piece.player.value)
+            self._add(piece, piece.x, piece.y, piece.player.value)
+        elif event == 'owner':
+            self._remove(piece, piece.x, piece.y, old)
+            self._add(piece, piece.x, piece.y, piece.player.value)
+        elif event == 'reset':
+            self.rebuild()
+
+    def _set_tower(self, player, pos):
+        self.towers[player] = pos
+        self.tower_fields[player] = self.maps.field(pos[0], pos[1]) if pos else None
+
+    def _army_advance(self, player, x, y):
+        dist = self.tower_distance(3 - player, x, y)
+        if dist is None:
+            return 0
+        return max(0, 20 - dist)
+
+    def _advance_sum(self, player):
+        return sum(self._army_advance(player, p.x, p.y) for p in self.board.pieces
+                   if p.type == PieceType.ARMY and p.player.value == player)
+
+    def _add(self, piece, x, y, player):
+        self._update(piece.type, x, y, player, 1)
+
+    def _remove(self, piece, x, y, player):
+        self._update(piece.type, x, y, player, -1)
+
+    def _update(self, ptype, x, y, player, delta):
+        i = y * BOARD_SIZE + x
+        self.material[player][ptype] += delta
+        near = self.near[(player, ptype)]
+        for j in BLOCK[i]:
+            near[j] += delta
+        if ptype == PieceType.ARMY:
+            counts = self.influence_count[player]
+            for j in RING[i]:
+                before = counts[j]
+                counts[j] = before + delta
+                if before == 0:
+                    self.influence_size[player] += 1
+                elif counts[j] == 0:
+                    self.influence_size[player] -= 1
+            self.advance[player] += delta * self._army_advance(player, x, y)
+        elif ptype == PieceType.TOWER:
+            self._set_tower(player, (x, y) if delta > 0 else None)
+            # 王塔变化后重算对方军队的推进分
+            self.advance[3 - player] = self._advance_sum(3 - player)
+
+    # ---- O(1)查询 ----
+    def count_near(self, x, y, ptype, player=None):
+        """(x, y)周围3x3范围内的棋子数量，player为None时统计双方"""
+        i = y * BOARD_SIZE + x
+        if player is None:
+            return self.near[(1, ptype)][i] + self.near[(2, ptype)][i]
+        return self.near[(player, ptype)][i]
+
+    def tower_distance(self, player, x, y):
+        """到指定玩家王塔的行军距离（查表），王塔不存在时返回None"""
+        field = self.tower_fields[player]
+        if field is None:
+            return None
+        return field[y * BOARD_SIZE + x]
+
+    def in_danger(self, player):
+        """按棋子数量判断濒危"""
+        m = self.material[player]
+        return is_endangered(m[PieceType.FARM], m[PieceType.INDUSTRY], m[PieceType.ARMY])
+
+    def build_score(self, player, x, y, build_type):
+        """建造位置评分（AIPlayer.evaluate_build_position的O(1)实现）"""
+        score = 0
+        dist = self.tower_distance(player, x, y)
+        if dist is not None:
+            score += (10 - dist) * 2
+        enemy_dist = self.tower_distance(3 - player, x, y)
+        if enemy_dist is not None:
+            score += enemy_dist
+        if build_type == 0:
+            score -= 20 * self.count_near(x, y, PieceType.INDUSTRY)
+        elif build_type == 1:
+            score += 10 * self.count_near(x, y, PieceType.FARM)
+        elif build_type == 2:
+            if enemy_dist is not None:
+                score += (20 - enemy_dist) * 3
+        return score
+
+    def position_value(self, player, x, y):
+        """行军目标位置评分（AIPlayer.evaluate_position_value的O(1)实现）"""
+        score = 0
+        enemy_dist = self.tower_distance(3 - player, x, y)
+        if enemy_dist is not None:
+            score -= enemy_dist * 2
+        score += 5 * self.count_near(x, y, PieceType.FARM, player)
+        score += 8 * self.count_near(x, y, PieceType.INDUSTRY, player)
+        score += 20 * self.count_near(x, y, PieceType.TOWER, player)
+        return score
+
+    def piece_value(self, player, piece):
+        """棋子价值（AIPlayer.evaluate_piece_value的O(1)实现）"""
+        value = PIECE_VALUES.get(piece.type, 0)
+        if piece.type == PieceType.ARMY:
+            dist = self.tower_distance(3 - player, piece.x, piece.y)
+            if dist is not None:
+                value += 20 - dist
+        return value
+
+    def features(self, player):
+        """player视角的评估特征向量（顺序见FEATURE_NAMES）"""
+        enemy = 3 - player
+        own, other = self.material[player], self.material[enemy]
+        return [
+            own[PieceType.FARM] - other[PieceType.FARM],
+            own[PieceType.INDUSTRY] - other[PieceType.INDUSTRY],
+            own[PieceType.ARMY] - other[PieceType.ARMY],
+            self.advance[player] - self.advance[enemy],
+            1 if self.in_danger(player) else 0,
+            1 if self.in_danger(enemy) else 0,
+            self.influence_size[player] - self.influence_size[enemy],
+        ]
+
+    def evaluate(self, player, weights=None):
+        """整盘评估：特征向量与权重的点积，已分胜负时返回±WIN_SCORE"""
+        winner = self.board.winner
+        if winner:
+            return WIN_SCORE if winner == player else -WIN_SCORE
+        weights = weights or DEFAULT_WEIGHTS
+        return sum(w * f for w, f in zip(weights, self.features(player)))
+
+
+# 评估特征：双方差值（己方-对方）与濒危标志
+FEATURE_NAMES = [
+    'farm',          # 农田数差
+    'industry',      # 工业数差
+    'army',          # 军队数差
+    'advance',       # 军队向敌方王塔推进分差
+    'own_danger',    # 己方濒危
+    'enemy_danger',  # 对方濒危
+    'influence',     # 势力范围格数差
+]
+
+# 手工权重：物资价值、推进与势力范围各1分、濒危-60/对方濒危+30
+DEFAULT_WEIGHTS = [10, 15, 20, 1, -60, 30, 1]
+
+# 自对弈训练得到的权重文件（由train_eval.py生成）
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_weights.json')
+
+
+def load_weights(path=WEIGHTS_FILE):
+    """读取训练得到的权重，文件不存在或特征不匹配时返回None（使用手工权重）"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取评估权重失败: {e}")
+        return None
+    if data.get('features') != FEATURE_NAMES:
+        print(f"评估权重文件的特征与当前版本不一致，忽略: {path}")
+        return None
+    return [float(w) for w in data['weights']]
+
+
+def save_weights(weights, path=WEIGHTS_FILE, **meta):
+    """写出权重文件"""
+    data = {'features': FEATURE_NAMES, 'weights': [float(w) for w in weights]}
+    data.update(meta)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def evaluate_board(board, player, weights=None):
+    """整盘评估入口，使用棋盘上挂载的特征累加器"""
+    return features_for(board).evaluate(player, weights)
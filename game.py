@@ -1,82 +1,126 @@
 import os
+import sys
+import json
 import pygame
-from board import Board, BOARD_SIZE
-from ai import AIPlayer
+from board import Board, BOARD_SIZE, can_build_type
+from ai import AIPlayer, DIFFICULTY_LEVELS, DIFFICULTY_ORDER
+from ai_worker import AIWorker, ACTION_STEPS
+from ponder import Ponderer
+import tactics
+from threats import threats_for
 from piece import PieceType
-import threading
-import tkinter as tk
-from tkinter import simpledialog
-import subprocess
+from render import DirtyRenderer, TextCache
+from profiler import FrameProfiler, WAIT_STAGE
+from net_queue import NetInbox, NET_CLOSED, NET_RECONNECTING
+from sync import SyncState, board_cells, apply_delta, load_snapshot
 import time
-import socket
+# 对话框（tkinter）、网络连接与本地服务器（netclient、server及其依赖的websockets）相关模块在用到时才导入，加快启动
+
+FONT_PATHS = [
+    "C:/Windows/Fonts/simhei.ttf",
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simsun.ttc"
+]
+# 解析出的中文字体路径缓存在磁盘上，下次启动不用再扫描系统字体；删除该文件可重新查找
+FONT_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'font_cache.json')
+
+_font_path = False  # False表示尚未解析，None表示没有中文字体、使用pygame默认字体
+_fonts = {}  # 字号 -> 字体对象，同一字号只加载一次（文字缓存按字体对象区分）
+
+def resolve_font_path():
+    """中文字体文件路径：先读磁盘缓存，缓存的文件不存在时探测Windows字体、再在系统字体中找SimHei，结果写回缓存"""
+    global _font_path
+    if _font_path is not False:
+        return _font_path
+    path = False
+    try:
+        with open(FONT_CACHE_FILE, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['platform'] == sys.platform and (cached['path'] is None or os.path.exists(cached['path'])):
+            path = cached['path']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if path is False:
+        path = next((p for p in FONT_PATHS if os.path.exists(p)), None)
+        if path is None:
+            path = pygame.font.match_font("SimHei")  # 扫描系统字体，较慢
+        try:
+            with open(FONT_CACHE_FILE, 'w', encoding='utf-8') as f:
+                json.dump({'platform': sys.platform, 'path': path}, f)
+        except OSError:
+            pass  # 目录不可写时只是下次还要扫描
+    _font_path = path
+    return path
 
 # 中文字体加载工具
 def get_chinese_font(size):
-    font_paths = [
-        "C:/Windows/Fonts/simhei.ttf",
-        "C:/Windows/Fonts/msyh.ttc",
-        "C:/Windows/Fonts/simsun.ttc"
-    ]
-    for path in font_paths:
-        if os.path.exists(path):
-            return pygame.font.Font(path, size)
-    return pygame.font.SysFont("SimHei", size)
-
-def check_port_available(port):
-    """检查端口是否可用"""
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(('localhost', port))
-            return True
-    except OSError:
-        return False
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.Font(resolve_font_path(), size)
+    return font
+
+class _Font:
+    """Game的字体属性：第一次使用时才加载"""
+    def __init__(self, size):
+        self.size = size
+
+    def __get__(self, obj, owner=None):
+        return get_chinese_font(self.size)
 
 def start_local_server(port=8765):
-    """启动本地服务器"""
+    """在本进程的后台线程里启动服务器，端口绑定成功即返回；端口被占用时改用系统分配的空闲端口"""
+    from server import EmbeddedServer
     try:
-        # 检查端口是否被占用
-        if not check_port_available(port):
-            return False, f"端口 {port} 已被占用", None
-        
-        # 启动服务器进程，不使用PIPE避免阻塞
-        if os.name == 'nt':  # Windows
-            server_process = subprocess.Popen(
-                ['python', 'server.py'],
-                creationflags=subprocess.CREATE_NEW_CONSOLE
-            )
-        else:  # Linux/Mac
-            server_process = subprocess.Popen(
-                ['python', 'server.py'],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-        
-        # 等待服务器启动
-        time.sleep(3)
-        
-        # 检查服务器是否成功启动
-        if server_process.poll() is None:  # 进程仍在运行
-            # 再次检查端口是否被监听
-            if not check_port_available(port):
-                return True, f"本地服务器已启动 (端口: {port})", server_process
-            else:
-                # 进程在运行但端口未被监听，可能启动失败
-                return False, "服务器启动失败：端口未被监听", None
-        else:
-            return False, "服务器启动失败：进程已退出", None
-            
+        server = EmbeddedServer("localhost", port)
+        try:
+            server.start()
+        except OSError:
+            server = EmbeddedServer("localhost", 0)
+            server.start()
+        return True, f"本地服务器已启动 (端口: {server.port})", server
     except Exception as e:
         return False, f"启动服务器时出错: {e}", None
 
 MODE_NAMES = ['行军', '建造', '拆除']
+AI_ACTION_DELAY = 400  # AI动作逐个播放的间隔（毫秒）
 BUILD_NAMES = ['农田', '工业', '军队']
+DIFFICULTY_NAMES = {'easy': '简单', 'normal': '普通', 'hard': '困难'}
 
 TOP_TEXT_HEIGHT = 40
 BOTTOM_TEXT_HEIGHT = 100
 MARGIN = 10
+IDLE_WAIT_MS = 1000  # 空闲时阻塞等待事件的最长时间，超时后照常走一帧兜底
+NET_EVENT = pygame.USEREVENT + 1  # 网络线程收到消息后投递，唤醒阻塞等待的主循环
+STATUS_HEIGHT = 140  # 顶部状态区（回合、资源、濒危原因、威胁、AI思考）的高度，会盖住地图上方几行
+
+# 格子高亮样式：(颜色, 线宽)，线宽0表示半透明填充
+MARK_STYLES = {
+    'hanging': ((255, 0, 0), 2),  # 无人保护的军队
+    'farmland': ((200, 220, 80, 100), 0),  # 耕地区
+    'development': ((180, 180, 180, 100), 0),  # 开发区
+    'preparation': ((220, 60, 60, 100), 0),  # 备战区
+    'tower': ((255, 255, 0, 100), 0),  # 王塔势力范围
+    'army': ((255, 255, 0), 3),  # 所有军队
+    'army_move': ((0, 255, 0, 100), 0),  # 军队移动范围
+    'ai_action': ((255, 120, 0), 3),  # AI最近的动作
+    'tactic': ((200, 0, 120), 3),  # 杀棋第一步
+}
 
 # 1. Game类增加网络对战相关状态
 class Game:
+    # 字体（按字号共享，第一次使用时才加载）
+    font_title = _Font(36)
+    font_btn = _Font(24)
+    font_hint = _Font(20)
+    font_mid = _Font(32)
+    font_small = _Font(18)
+    font_ui = _Font(18)
+    font_res = _Font(16)
+    font_ctrl = _Font(14)
+    font_net_btn = _Font(22)
+    font_net_err = _Font(24)
+    font_net_esc = _Font(20)
+
     def __init__(self, screen):
         self.screen = screen
         self.running = True
@@ -88,30 +132,26 @@ class Game:
         self.ai_side = 2
         self.ai_difficulty = 'easy'
         self.ai = AIPlayer(self.ai_difficulty)
+        self.ai_worker = AIWorker()  # AI在后台线程计算，避免卡住界面
+        self.ponderer = Ponderer()  # 人类回合时后台预读AI的应对
+        self.ponder_key = None
         self.game_mode = 'ai'  # 'ai' or 'pvp' or 'net'
         self.net_addr = ''
         self.net_room = ''
         self.net_name = ''
         self.net_waiting = False  # 网络对战等待对手
-        self.net_ws = None  # websocket连接
+        self.net_inbox = None  # 网络线程收到的消息，主循环每帧处理（net_queue.NetInbox）
+        self.net_conn = None  # 到服务器的连接（netclient.NetConnection），收发都在网络事件循环线程上
         self.net_error = ''  # 网络错误提示
         self.net_wait_anim = 0  # 等待动画帧
         self.net_players = [None, None]  # [房主, 加入者]，dict: {'name':..., 'side':...}
         self.net_is_host = False  # 是否房主
         self.esc_down_time = None  # 记录ESC按下时间
-        self.server_process = None  # 本地服务器进程
-        # 字体缓存
-        self.font_title = get_chinese_font(36)
-        self.font_btn = get_chinese_font(24)
-        self.font_hint = get_chinese_font(20)
-        self.font_mid = get_chinese_font(32)
-        self.font_small = get_chinese_font(18)
-        self.font_ui = get_chinese_font(18)
-        self.font_res = get_chinese_font(16)
-        self.font_ctrl = get_chinese_font(14)
-        self.font_net_btn = get_chinese_font(22)
-        self.font_net_err = get_chinese_font(24)
-        self.font_net_esc = get_chinese_font(20)
+        self.local_server = None  # 内嵌的本地服务器（server.EmbeddedServer）
+        self.renderer = DirtyRenderer(self.screen)  # 只重画并推送变化的区域
+        self.text_cache = TextCache()  # 每帧重复绘制的文字只渲染一次
+        self.profiler = FrameProfiler()  # 各阶段耗时，F3显示性能面板，F4导出CSV
+        self.event_driven = True  # 空闲时阻塞等待输入或网络消息；False时始终按30帧/秒轮询
         self.last_side_click_time = 0  # 房主选边按钮防抖
         self.net_ready = [False, False]  # 记录双方准备状态
         # 新增：网络对战游戏状态
@@ -119,30 +159,26 @@ class Game:
         self.net_game_step = 0  # 当前阶段
         self.net_is_my_turn = False  # 是否是我的回合
         self.net_last_action_time = 0  # 上次动作时间，防重复
-        self.init_game()
+        self.net_sync = None  # 网络对战中带序号的局面（sync.SyncState），开局时建立
+        self.net_resync_pending = False  # 已请求重新同步，等待服务器补发
+        # 棋盘（生成地图）推迟到开始对局时，主菜单不需要
+        self.board = None
+        self.cancel_ai()
 
     def cleanup(self):
         """清理资源，关闭服务器等"""
         # 关闭网络连接
-        if self.net_ws:
-            try:
-                self.net_ws.close()
-            except Exception:
-                pass
+        self.close_net()
         
-        # 关闭本地服务器进程
-        if self.server_process:
-            try:
-                self.server_process.terminate()
-                self.server_process.wait(timeout=5)
-            except Exception:
-                try:
-                    self.server_process.kill()
-                except Exception:
-                    pass
+        # 关闭本地服务器
+        if self.local_server:
+            self.local_server.stop()
+            self.local_server = None
 
     def init_game(self):
+        self.cancel_ai()
         self.board = Board()
+        self.profiler.instrument(self.board)
         self.selected = None
         self.current_player = 1  # 白先
         self.step = 0  # 0=行军, 1=建造, 2=拆除
@@ -169,6 +205,8 @@ class Game:
         self.highlight_farmland = False  # 高亮耕地区
         self.highlight_development = False  # 高亮开发区
         self.highlight_preparation = False  # 高亮备战区
+        self.highlight_tactics = False  # 杀棋提示（能否攻破对方王塔）
+        self.tactic_hint = None  # (局面键, 求解结果) 缓存，局面不变不重复求解
 
     def update_reset_btn_pos(self):
         self.reset_btn_rect.x = self.width - 160
@@ -178,15 +216,24 @@ class Game:
         import time
         clock = pygame.time.Clock()
         self.winner_btn_rect = None
+        profiler = self.profiler
         try:
             while self.running:
-                for event in pygame.event.get():
+                profiler.frame()
+                profiler.begin('events')
+                events = self.next_events()
+                with profiler.stage('net_recv'):
+                    self.drain_net()
+                for event in events:
                     if event.type == pygame.QUIT:
                         self.running = False
                     elif event.type == pygame.VIDEORESIZE:
                         self.width, self.height = event.w, event.h
                         self.screen = pygame.display.set_mode((self.width, self.height), pygame.RESIZABLE)
                         self.update_reset_btn_pos()
+                        self.renderer.reset(self.screen)
+                    elif event.type == pygame.WINDOWEXPOSED:
+                        self.renderer.reset()  # 窗口被遮挡后恢复，整屏重画
                     if self.show_start_menu:
                         self.handle_start_menu_event(event)
                     elif self.game_mode == 'net' and self.net_waiting:
@@ -198,6 +245,8 @@ class Game:
                             self.cleanup()  # 新增，确保服务器进程关闭
                         # 如果网络连接失败，提供快速切换选项
                         elif event.type == pygame.KEYDOWN and self.net_error and "连接" in self.net_error:
+                            if event.key in (pygame.K_1, pygame.K_2):
+                                self.close_net()  # 可能还在重连
                             if event.key == pygame.K_1:
                                 # 切换到人机对战
                                 self.game_mode = 'ai'
@@ -234,38 +283,160 @@ class Game:
                             self.show_start_menu = True
                             self.esc_down_time = None
                             # 网络对战时断开连接
-                            if self.game_mode == 'net' and self.net_ws:
-                                try:
-                                    self.net_ws.close()
-                                except Exception:
-                                    pass
+                            if self.game_mode == 'net':
+                                self.close_net()
                             self.init_game()
-                self.screen.fill((220, 220, 220))
-                if self.show_start_menu:
-                    self.draw_start_menu()
-                elif self.game_mode == 'net' and self.net_waiting:
-                    self.draw_net_waiting()
-                    self.net_wait_anim = (self.net_wait_anim + 1) % 60
-                else:
-                    # 动态计算地图区域
-                    board_pixel = min(self.width, self.height - TOP_TEXT_HEIGHT - BOTTOM_TEXT_HEIGHT) - 2*MARGIN
-                    tile_size = board_pixel // BOARD_SIZE
-                    offset_x = (self.width - board_pixel) // 2
-                    offset_y = TOP_TEXT_HEIGHT + MARGIN
-                    self.board.draw(self.screen, self.width, self.height, self.selected, self.step, self.current_player, offset_x, offset_y, board_pixel)
-                    self.draw_ui()
+                profiler.end()
+                with profiler.stage('net_send'):
+                    self.publish_state()
+                # 对局逻辑每帧推进，与画面是否重画无关
+                if not self.show_start_menu and not (self.game_mode == 'net' and self.net_waiting):
                     if self.board.winner:
                         self.game_over = True
                         self.winner = self.board.winner
-                        self.draw_winner()
                     # 仅AI模式下才自动AI回合
-                    if self.game_mode == 'ai' and self.current_player == self.ai_side and not self.game_over and not self.show_start_menu:
-                        self.ai_turn()
-                pygame.display.flip()
-                clock.tick(30)
+                    if self.game_mode == 'ai' and not self.game_over:
+                        if self.current_player == self.ai_side:
+                            with profiler.stage('ai_turn'):
+                                self.ai_turn()
+                        else:
+                            with profiler.stage('ponder'):
+                                self.ponder_update()
+                with profiler.stage('render'):
+                    self.render_frame()
+                with profiler.stage(WAIT_STAGE):
+                    clock.tick(30)
         finally:
             self.cleanup()  # 退出时自动清理
 
+    def is_idle(self):
+        """没有动画、AI计算、长按计时等需要逐帧推进的事情时，主循环可以阻塞等待事件"""
+        if self.esc_down_time is not None:
+            return False  # 长按ESC计时
+        if self.show_start_menu:
+            return True
+        if self.game_mode == 'net' and self.net_waiting:
+            return False  # 等待动画，且按钮点击在绘制时轮询
+        if self.ai_thinking or self.ai_worker.pending or self.ai_actions is not None:
+            return False  # AI计算中或正在逐个播放动作
+        if self.net_inbox is not None and len(self.net_inbox):
+            return False  # 还有没处理的网络消息
+        if self.game_mode == 'ai' and not self.game_over and self.current_player == self.ai_side:
+            return False  # 轮到AI，需要每帧提交或取回计算
+        if self.build_preview and self.step == 1:
+            return False  # 建造预览闪烁
+        return True
+
+    def next_events(self):
+        """取本帧要处理的事件：空闲时阻塞在pygame.event.wait上，直到有输入、网络线程投递NET_EVENT或超时"""
+        if self.event_driven and self.is_idle():
+            with self.profiler.stage(WAIT_STAGE):
+                event = pygame.event.wait(IDLE_WAIT_MS)
+            if event.type == pygame.NOEVENT:
+                return []
+            return [event] + pygame.event.get()
+        return pygame.event.get()
+
+    def wake(self):
+        """从网络线程唤醒主循环（pygame.event.post可以跨线程调用）"""
+        try:
+            pygame.event.post(pygame.event.Event(NET_EVENT))
+        except pygame.error:
+            pass  # 显示已关闭
+
+    def render_text(self, font, text, color, antialias=True):
+        """渲染文字（经过文字缓存），返回的表面只能blit"""
+        return self.text_cache.render(font, text, color, antialias)
+
+    def board_layout(self):
+        """动态计算地图区域，返回(offset_x, offset_y, tile_size, board_pixel)"""
+        board_pixel = min(self.width, self.height - TOP_TEXT_HEIGHT - BOTTOM_TEXT_HEIGHT) - 2*MARGIN
+        tile_size = board_pixel // BOARD_SIZE
+        offset_x = (self.width - board_pixel) // 2
+        offset_y = TOP_TEXT_HEIGHT + MARGIN
+        return offset_x, offset_y, tile_size, board_pixel
+
+    def render_frame(self):
+        """各区域上报矩形与状态键，由脏矩形渲染器只重画、推送变化的部分"""
+        renderer = self.renderer
+        screen_rect = self.screen.get_rect()
+        if self.show_start_menu:
+            renderer.region('scene', screen_rect, ('menu', self.game_mode, self.player_side, self.ai_difficulty))
+            renderer.present(self.draw_start_menu)
+        elif self.game_mode == 'net' and self.net_waiting:
+            # 等待界面在绘制时处理按钮点击，每帧都重画
+            renderer.region('scene', screen_rect, ('net', self.net_wait_anim))
+            renderer.present(self.draw_net_waiting)
+            self.net_wait_anim = (self.net_wait_anim + 1) % 60
+        else:
+            offset_x, offset_y, tile_size, _ = self.board_layout()
+            marks = self.board_marks()
+            counts = tuple(self.build_counts.values())
+            renderer.region('scene', screen_rect, ('game',))
+            renderer.grid((offset_x, offset_y), tile_size, self.cell_keys(marks))
+            renderer.region('status', (0, 0, self.width, STATUS_HEIGHT), self.status_key())
+            renderer.region('controls', (0, self.height - BOTTOM_TEXT_HEIGHT - 30, self.width, BOTTOM_TEXT_HEIGHT + 30),
+                            (self.step, counts))
+            renderer.region('reset', None if self.game_over else self.reset_btn_rect, self.game_mode)
+            renderer.region('popup', self.build_popup_rect(), (self.build_popup, counts))
+            renderer.region('winner', self.winner_rect() if self.game_over else None, self.winner)
+            profile_lines = self.profiler.lines() if self.profiler.visible else None
+            renderer.region('profiler', self.profiler_rect(profile_lines) if profile_lines else None, profile_lines)
+            renderer.present(lambda: self.draw_game(marks, profile_lines))
+
+    def cell_keys(self, marks):
+        """每个格子的状态键：地形、棋子、势力范围、选中、高亮与建造预览"""
+        keys = {(x, y): [self.board.grid[y][x]] for y in range(BOARD_SIZE) for x in range(BOARD_SIZE)}
+        for p in self.board.pieces:
+            keys[(p.x, p.y)].append((p.type.value, p.player.value))
+        for player in (1, 2):
+            for cell in self.board.influence[player]:
+                keys[cell].append(('influence', player))
+        if self.selected in keys:
+            keys[self.selected].append('selected')
+        for x, y, kind in marks:
+            keys[(x, y)].append(kind)
+        if self.build_preview and self.step == 1:
+            x, y, build_type = self.build_preview
+            keys[(x, y)].append(('preview', build_type, pygame.time.get_ticks() // 300 % 2))
+        return {cell: tuple(key) for cell, key in keys.items()}
+
+    def status_key(self):
+        """顶部状态区的状态键，包含draw_ui在该区域绘制文字所用的全部状态"""
+        counts = tuple(self.board.count_type(player, ptype) for player in (1, 2)
+                       for ptype in (PieceType.FARM, PieceType.INDUSTRY, PieceType.ARMY))
+        threats = threats_for(self.board)
+        thinking = pygame.time.get_ticks() // 300 % 4 if self.ai_thinking else None
+        tactic = self.current_tactic()
+        return (self.game_mode, self.current_player, self.step, self.net_is_my_turn, counts,
+                self.board.danger[1], self.board.danger[2], self.board.get_move_limit(self.current_player),
+                threats.tower_threat(self.current_player), len(self.hanging_armies()), thinking,
+                tactic.depth if tactic else None)
+
+    def draw_game(self, marks, profile_lines=None):
+        """绘制对局画面"""
+        offset_x, offset_y, tile_size, board_pixel = self.board_layout()
+        with self.profiler.stage('board_draw'):
+            self.board.draw(self.screen, self.width, self.height, self.selected, self.step, self.current_player, offset_x, offset_y, board_pixel)
+        with self.profiler.stage('draw_ui'):
+            self.draw_ui(marks)
+        if profile_lines:
+            self.draw_profiler(profile_lines)
+
+    def profiler_rect(self, lines):
+        """性能面板的矩形（右侧，状态区下方）"""
+        return pygame.Rect(self.width - 290, STATUS_HEIGHT, 280, 8 + 16 * len(lines))
+
+    def draw_profiler(self, lines):
+        """绘制性能面板：忙碌帧耗时、p50/p99与各阶段平均/最大耗时"""
+        rect = self.profiler_rect(lines)
+        s = pygame.Surface(rect.size, pygame.SRCALPHA)
+        s.fill((0, 0, 0, 170))
+        self.screen.blit(s, rect.topleft)
+        for i, line in enumerate(lines):
+            text = self.render_text(self.font_ctrl, line, (255, 255, 255))
+            self.screen.blit(text, (rect.x + 6, rect.y + 4 + i * 16))
+
     def handle_start_menu_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             x, y = event.pos
@@ -286,12 +457,10 @@ class Game:
                 self.player_side = 2
                 self.ai_side = 1
             # AI难度选择
-            if 200 < x < 320 and 400 < y < 460:
-                self.ai_difficulty = 'easy'
-            elif 340 < x < 460 and 400 < y < 460:
-                self.ai_difficulty = 'normal'
-            elif 480 < x < 600 and 400 < y < 460:
-                self.ai_difficulty = 'hard'
+            if 430 < y < 490:
+                for idx, level in enumerate(DIFFICULTY_ORDER):
+                    if 200 + idx * 140 < x < 320 + idx * 140:
+                        self.ai_difficulty = level
             # 开始游戏
             if hasattr(self, 'start_btn_rect') and self.start_btn_rect.collidepoint(x, y):
                 if self.game_mode == 'net':
@@ -306,6 +475,7 @@ class Game:
             print(f"键盘事件: {event.key}")  # 调试信息
             if event.key == pygame.K_ESCAPE:
                 self.show_start_menu = True
+                self.cancel_ai()
                 self.cleanup()
             elif event.key == pygame.K_r:
                 if self.game_mode == 'ai':
@@ -328,6 +498,13 @@ class Game:
             elif event.key == pygame.K_6:
                 self.highlight_preparation = not self.highlight_preparation
                 print(f"高亮备战区: {self.highlight_preparation}")  # 调试信息
+            elif event.key == pygame.K_7:
+                self.highlight_tactics = not self.highlight_tactics
+                print(f"杀棋提示: {self.highlight_tactics}")  # 调试信息
+            elif event.key == pygame.K_F3:
+                self.profiler.visible = not self.profiler.visible
+            elif event.key == pygame.K_F4:
+                print(f"性能数据已导出: {self.profiler.dump_csv()}")
             elif event.key == pygame.K_SPACE:
                 # 网络对战中的回合结束
                 if self.game_mode == 'net' and self.net_is_my_turn:
@@ -388,10 +565,7 @@ class Game:
             return
         
         # 动态计算地图坐标，与绘制时保持一致
-        board_pixel = min(self.width, self.height - TOP_TEXT_HEIGHT - BOTTOM_TEXT_HEIGHT) - 2*MARGIN
-        tile_size = board_pixel // BOARD_SIZE
-        offset_x = (self.width - board_pixel) // 2
-        offset_y = TOP_TEXT_HEIGHT + MARGIN
+        offset_x, offset_y, tile_size, _ = self.board_layout()
         
         x = (pos[0] - offset_x) // tile_size
         y = (pos[1] - offset_y) // tile_size
@@ -438,25 +612,9 @@ class Game:
         
         if self.build_popup:
             popup_x, popup_y = self.build_popup
-            # 检查是否点击了弹窗按钮 - 使用动态计算的坐标
-            board_pixel = min(self.width, self.height - TOP_TEXT_HEIGHT - BOTTOM_TEXT_HEIGHT) - 2*MARGIN
-            tile_size = board_pixel // BOARD_SIZE
-            offset_x = (self.width - board_pixel) // 2
-            offset_y = TOP_TEXT_HEIGHT + MARGIN
-            
-            # 计算弹窗位置（与绘制时保持一致）
-            popup_screen_x = offset_x + popup_x * tile_size
-            popup_screen_y = offset_y + popup_y * tile_size
-            
-            # 确保弹窗不超出屏幕边界
-            popup_width = 200
-            popup_height = 120
-            if popup_screen_x + popup_width > self.width:
-                popup_screen_x = self.width - popup_width - 10
-            if popup_screen_y + popup_height > self.height - BOTTOM_TEXT_HEIGHT:
-                popup_screen_y = self.height - BOTTOM_TEXT_HEIGHT - popup_height - 10
-            
-            popup_rect = pygame.Rect(popup_screen_x, popup_screen_y, popup_width, popup_height)
+            # 检查是否点击了弹窗按钮 - 弹窗位置与绘制时保持一致
+            popup_rect = self.build_popup_rect()
+            popup_screen_x, popup_screen_y, popup_width, popup_height = popup_rect
             if popup_rect.collidepoint(pygame.mouse.get_pos()):
                 # 处理弹窗点击 - 使用动态计算的坐标
                 mouse_x, mouse_y = pygame.mouse.get_pos()
@@ -530,19 +688,7 @@ class Game:
     def can_build_type(self, build_type):
         """检查是否可以建造指定类型的建筑"""
         # 规则：最多建两个相同的建筑，若要建三个则必须不同
-        if self.build_counts[build_type] >= 2:
-            return False
-        
-        # 检查总数限制
-        total_builds = sum(self.build_counts.values())
-        if total_builds >= 3:
-            return False
-        
-        # 如果要建第三个，必须与前两个不同
-        if total_builds == 2 and self.build_counts[build_type] > 0:
-            return False
-        
-        return True
+        return can_build_type(self.build_counts, build_type)
 
     def show_cannot_build_message(self):
         # 这里可以添加一个临时的提示消息
@@ -570,34 +716,101 @@ class Game:
         self.build_preview = None
         self.build_popup = None
 
+    def cancel_ai(self):
+        """取消后台AI计算并清空待播放的动作"""
+        self.ai_worker.cancel()
+        self.ponderer.clear()
+        self.ponder_key = None
+        self.ai_thinking = False
+        self.ai_actions = None  # 待播放的AI动作，None表示尚未取得计划
+        self.ai_last_action = None  # 最近播放的动作，用于高亮
+        self.ai_next_action_time = 0
+
     def ai_turn(self):
-        """AI回合"""
-        pygame.time.wait(400)
-        
-        # 行军阶段
-        if self.step == 0:
+        """AI回合（每帧调用，不阻塞）：后台计算整回合动作，取得后按间隔逐个播放"""
+        now = pygame.time.get_ticks()
+        if self.ai_actions is None:
+            actions = None
+            if not self.ai_worker.pending:
+                # 先查人类回合中预读的结果，命中则无需再算
+                self.ponderer.stop()
+                self.ponder_key = None
+                actions = self.ponderer.take(self.board)
+                if actions is None:
+                    self.ai_worker.submit(self.ai, self.board, self.ai_side)
+                    self.ai_thinking = True
+            if actions is None:
+                actions = self.ai_worker.poll()
+            if actions is None:
+                return
+            self.ai_thinking = False
+            self.ai_actions = list(actions)
+            self.ai_next_action_time = now + AI_ACTION_DELAY
+            # 行军阶段开始：与play_phase一致地重置移动计数
+            self.step = 0
             self.move_limit = self.board.get_move_limit(self.ai_side)
             self.board.reset_move_count(self.ai_side)
-            moves = self.ai.choose_move(self.board, self.ai_side, self.move_limit)
-            for sx, sy, tx, ty in moves:
-                self.board.move_piece(sx, sy, tx, ty)
-            self.step = 1
-        
-        # 建造阶段
-        elif self.step == 1:
-            builds = self.ai.choose_build(self.board, self.ai_side)
-            for x, y, build_type in builds:
-                if self.board.can_build(x, y, self.ai_side, build_type):
-                    self.board.build_piece(x, y, self.ai_side, build_type)
-            self.step = 2
-        
-        # 拆除阶段
-        elif self.step == 2:
-            removes = self.ai.choose_remove(self.board, self.ai_side)
-            for x, y in removes:
-                if self.board.can_remove(x, y, self.ai_side):
-                    self.board.remove_piece(x, y)
+            return
+        if now < self.ai_next_action_time:
+            return
+        self.ai_next_action_time = now + AI_ACTION_DELAY
+        if not self.ai_actions:
+            self.ai_actions = None
+            self.ai_last_action = None
             self.next_turn()
+            return
+        kind, args = self.ai_actions.pop(0)
+        self.step = ACTION_STEPS[kind]
+        if kind == 'move':
+            self.board.move_piece(*args)
+            self.move_used += 1
+        elif kind == 'build':
+            x, y, build_type = args
+            if self.board.can_build(x, y, self.ai_side, build_type):
+                self.board.build_piece(x, y, self.ai_side, build_type)
+        elif kind == 'remove':
+            x, y = args
+            if self.board.can_remove(x, y, self.ai_side):
+                self.board.remove_piece(x, y)
+        self.ai_last_action = (kind, args)
+
+    def ponder_update(self):
+        """人类回合中局面变化时，把新局面交给后台预读"""
+        key = (self.board.state_key(), self.step, self.move_used, tuple(self.build_counts.values()))
+        if key != self.ponder_key:
+            self.ponder_key = key
+            self.ponderer.update(self.board.clone(), self.current_player, self.ai,
+                                 self.step, self.move_used, self.build_counts)
+
+    def draw_ai_status(self):
+        """绘制AI思考提示（最近动作的高亮见board_marks）"""
+        if self.ai_thinking:
+            dots = '.' * (pygame.time.get_ticks() // 300 % 4)
+            text = self.render_text(self.font_small, f"AI思考中{dots}", (60, 60, 160))
+            self.screen.blit(text, (self.width - 300, 30))
+
+    def current_tactic(self):
+        """杀棋提示：当前玩家行军阶段能否在本回合/两回合内攻破对方王塔，不需要提示时返回None"""
+        if not self.highlight_tactics or self.step != 0 or self.game_over or self.ai_thinking:
+            return None
+        if self.game_mode == 'ai' and self.current_player == self.ai_side:
+            return None
+        if self.game_mode == 'net' and not self.net_is_my_turn:
+            return None
+        key = (self.board.state_key(), self.current_player, self.move_used, self.move_limit)
+        if self.tactic_hint is None or self.tactic_hint[0] != key:
+            tactic = tactics.solve(self.board, self.current_player, self.move_limit, self.move_used)
+            self.tactic_hint = (key, tactic)
+        return self.tactic_hint[1]
+
+    def draw_tactic_hint(self):
+        """绘制杀棋提示文字（第一步的高亮见board_marks）"""
+        tactic = self.current_tactic()
+        if tactic is None:
+            return
+        label = "本回合可攻破王塔" if tactic.depth == 1 else "两回合内可攻破王塔"
+        text = self.render_text(self.font_small, label, (200, 0, 120))
+        self.screen.blit(text, (self.width - 300, 55))
 
     def finish_build_phase(self):
         """完成建造阶段"""
@@ -607,18 +820,12 @@ class Game:
         self.build_popup = None
         self.step = 2
 
-    def draw_build_popup(self):
-        """绘制建造选择弹窗"""
+    def build_popup_rect(self):
+        """建造选择弹窗的矩形，没有弹窗时返回None"""
         if not self.build_popup:
-            return
-        
+            return None
         popup_x, popup_y = self.build_popup
-        
-        # 动态计算弹窗位置，避免与地图重叠
-        board_pixel = min(self.width, self.height - TOP_TEXT_HEIGHT - BOTTOM_TEXT_HEIGHT) - 2*MARGIN
-        tile_size = board_pixel // BOARD_SIZE
-        offset_x = (self.width - board_pixel) // 2
-        offset_y = TOP_TEXT_HEIGHT + MARGIN
+        offset_x, offset_y, tile_size, _ = self.board_layout()
         
         # 计算弹窗位置（在地块旁边）
         popup_screen_x = offset_x + popup_x * tile_size
@@ -631,15 +838,22 @@ class Game:
             popup_screen_x = self.width - popup_width - 10
         if popup_screen_y + popup_height > self.height - BOTTOM_TEXT_HEIGHT:
             popup_screen_y = self.height - BOTTOM_TEXT_HEIGHT - popup_height - 10
+        return pygame.Rect(popup_screen_x, popup_screen_y, popup_width, popup_height)
+
+    def draw_build_popup(self):
+        """绘制建造选择弹窗"""
+        if not self.build_popup:
+            return
         
         # 绘制弹窗背景
-        popup_rect = pygame.Rect(popup_screen_x, popup_screen_y, popup_width, popup_height)
+        popup_rect = self.build_popup_rect()
+        popup_screen_x, popup_screen_y, popup_width, popup_height = popup_rect
         pygame.draw.rect(self.screen, (240, 240, 240), popup_rect)
         pygame.draw.rect(self.screen, (100, 100, 100), popup_rect, 2)
         
         # 绘制标题
         font = get_chinese_font(20)
-        title = font.render("选择建筑类型", True, (0, 0, 0))
+        title = self.render_text(font, "选择建筑类型", (0, 0, 0))
         self.screen.blit(title, (popup_screen_x + 10, popup_screen_y + 10))
         
         # 绘制建筑类型按钮
@@ -661,7 +875,7 @@ class Game:
                 pygame.draw.rect(self.screen, (120, 120, 120), rect, 3)
             pygame.draw.rect(self.screen, (100, 100, 100), rect, 1)
             
-            text = font.render(build_names[i], True, (0, 0, 0))
+            text = self.render_text(font, build_names[i], (0, 0, 0))
             text_rect = text.get_rect(center=rect.center)
             self.screen.blit(text, text_rect)
 
@@ -698,7 +912,7 @@ class Game:
         if self.step == 1:
             font = get_chinese_font(16)
             hint = f'建造阶段: 最多建两个相同的建筑，若要建三个则必须不同'
-            text = font.render(hint, True, (60, 120, 200))
+            text = self.render_text(font, hint, (60, 120, 200))
             self.screen.blit(text, (20, self.height - BOTTOM_TEXT_HEIGHT - 25))
             
             # 显示已建造的建筑
@@ -709,38 +923,27 @@ class Game:
                     built_info.append(f"{build_names[i]}:{self.build_counts[i]}")
             
             if built_info:
-                text2 = font.render(f'已建: {" ".join(built_info)}', True, (80, 80, 180))
+                text2 = self.render_text(font, f'已建: {" ".join(built_info)}', (80, 80, 180))
                 self.screen.blit(text2, (200, self.height - BOTTOM_TEXT_HEIGHT - 25))
             
-            text3 = font.render(f'总数: {sum(self.build_counts.values())}/3', True, (80, 80, 180))
+            text3 = self.render_text(font, f'总数: {sum(self.build_counts.values())}/3', (80, 80, 180))
             self.screen.blit(text3, (400, self.height - BOTTOM_TEXT_HEIGHT - 25))
 
-    def draw_highlights(self, offset_x, offset_y, tile_size):
-        """绘制高亮效果"""
-        
-        # 高亮耕地区（农田建造时）
-        if self.highlight_farmland:
-            for x, y in self.board.farmland_areas[self.current_player]:
-                rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
-                s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
-                s.fill((200, 220, 80, 100))  # 农田色高亮
-                self.screen.blit(s, rect.topleft)
-        
-        # 高亮开发区（工业建造时）
-        if self.highlight_development:
-            for x, y in self.board.development_areas[self.current_player]:
-                rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
-                s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
-                s.fill((180, 180, 180, 100))  # 工业色高亮
-                self.screen.blit(s, rect.topleft)
+    def hanging_armies(self):
+        """下回合敌军能吃到、又无人保护的己方军队（查威胁图，O(1)）"""
+        threats = threats_for(self.board)
+        return [p for p in threats.hanging(self.current_player) if p.type == PieceType.ARMY]
+
+    def board_marks(self):
+        """当前所有格子高亮[(x, y, 样式)]，按绘制顺序排列；绘制与脏矩形检测共用"""
+        marks = [(p.x, p.y, 'hanging') for p in self.hanging_armies()]
         
-        # 高亮备战区（军队建造时）
-        if self.highlight_preparation:
-            for x, y in self.board.preparation_areas[self.current_player]:
-                rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
-                s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
-                s.fill((220, 60, 60, 100))  # 军队色高亮
-                self.screen.blit(s, rect.topleft)
+        # 高亮耕地区、开发区、备战区
+        for enabled, areas, kind in ((self.highlight_farmland, self.board.farmland_areas, 'farmland'),
+                                     (self.highlight_development, self.board.development_areas, 'development'),
+                                     (self.highlight_preparation, self.board.preparation_areas, 'preparation')):
+            if enabled:
+                marks.extend((x, y, kind) for x, y in areas[self.current_player])
         
         # 高亮王塔势力范围
         if self.highlight_tower_influence:
@@ -752,17 +955,13 @@ class Game:
                                 continue
                             nx, ny = piece.x + dx, piece.y + dy
                             if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
-                                rect = pygame.Rect(offset_x + nx*tile_size, offset_y + ny*tile_size, tile_size, tile_size)
-                                s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
-                                s.fill((255, 255, 0, 100))  # 黄色高亮
-                                self.screen.blit(s, rect.topleft)
+                                marks.append((nx, ny, 'tower'))
         
         # 高亮所有军队
         if self.highlight_armies:
             for piece in self.board.pieces:
                 if piece.type == PieceType.ARMY and piece.player.value == self.current_player:
-                    rect = pygame.Rect(offset_x + piece.x*tile_size, offset_y + piece.y*tile_size, tile_size, tile_size)
-                    pygame.draw.rect(self.screen, (255, 255, 0), rect, 3)
+                    marks.append((piece.x, piece.y, 'army'))
         
         # 高亮军队移动范围（即时区）
         if self.highlight_army_moves and self.highlighted_army:
@@ -774,12 +973,35 @@ class Game:
                     nx, ny = x + dx, y + dy
                     if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
                         if self.board.can_move_army(x, y, nx, ny, self.current_player, self.move_used, self.move_limit):
-                            rect = pygame.Rect(offset_x + nx*tile_size, offset_y + ny*tile_size, tile_size, tile_size)
-                            s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
-                            s.fill((0, 255, 0, 100))  # 绿色高亮
-                            self.screen.blit(s, rect.topleft)
+                            marks.append((nx, ny, 'army_move'))
+        
+        # AI最近的动作
+        if self.ai_last_action:
+            kind, args = self.ai_last_action
+            marks.append((args[0], args[1], 'ai_action'))
+            if kind == 'move':
+                marks.append((args[2], args[3], 'ai_action'))
+        
+        # 杀棋第一步
+        tactic = self.current_tactic()
+        if tactic and tactic.moves:
+            sx, sy, tx, ty = tactic.moves[0]
+            marks.extend([(sx, sy, 'tactic'), (tx, ty, 'tactic')])
+        return marks
 
-    def draw_ui(self):
+    def draw_highlights(self, marks, offset_x, offset_y, tile_size):
+        """绘制高亮效果"""
+        for x, y, kind in marks:
+            color, width = MARK_STYLES[kind]
+            rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
+            if width:
+                pygame.draw.rect(self.screen, color, rect, width)
+            else:
+                s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
+                s.fill(color)
+                self.screen.blit(s, rect.topleft)
+
+    def draw_ui(self, marks):
         # 绘制顶部信息
         font = self.font_mid
         if self.game_mode == 'net':
@@ -792,7 +1014,7 @@ class Game:
             # 本地游戏状态
             full_text = f"当前玩家: {'白方' if self.current_player == 1 else '黑方'} - 阶段: {MODE_NAMES[self.step]}"
         
-        text = font.render(full_text, True, (0, 0, 0))
+        text = self.render_text(font, full_text, (0, 0, 0))
         self.screen.blit(text, (10, 10))
         
         # 绘制资源信息
@@ -815,20 +1037,14 @@ class Game:
         if self.build_popup:
             self.draw_build_popup()
         
-        # 绘制建造预览 - 使用动态计算的坐标
+        # 绘制建造预览与高亮 - 使用动态计算的坐标
+        offset_x, offset_y, tile_size, _ = self.board_layout()
         if self.build_preview:
-            board_pixel = min(self.width, self.height - TOP_TEXT_HEIGHT - BOTTOM_TEXT_HEIGHT) - 2*MARGIN
-            tile_size = board_pixel // BOARD_SIZE
-            offset_x = (self.width - board_pixel) // 2
-            offset_y = TOP_TEXT_HEIGHT + MARGIN
             self.draw_build_preview(offset_x, offset_y, tile_size)
-        
-        # 绘制高亮 - 使用动态计算的坐标
-        board_pixel = min(self.width, self.height - TOP_TEXT_HEIGHT - BOTTOM_TEXT_HEIGHT) - 2*MARGIN
-        tile_size = board_pixel // BOARD_SIZE
-        offset_x = (self.width - board_pixel) // 2
-        offset_y = TOP_TEXT_HEIGHT + MARGIN
-        self.draw_highlights(offset_x, offset_y, tile_size)
+        with self.profiler.stage('highlights'):
+            self.draw_highlights(marks, offset_x, offset_y, tile_size)
+        self.draw_ai_status()
+        self.draw_tactic_hint()
         
         # 绘制胜利界面
         if self.game_over:
@@ -844,7 +1060,7 @@ class Game:
             color = (255, 255, 255) if player == 1 else (0, 0, 0)
             danger_text = " (濒危)" if self.board.danger[player] else ""
             text = f"{player_name}{danger_text}: 农田{farm} 工业{ind} 军队{army}"
-            text_surface = font.render(text, True, color)
+            text_surface = self.render_text(font, text, color)
             self.screen.blit(text_surface, (x, y + (player-1)*20))
 
     def draw_controls(self, x, y):
@@ -854,6 +1070,8 @@ class Game:
             "T - 高亮王塔势力范围",
             "A - 高亮所有军队", 
             "F - 完成当前阶段",
+            "7 - 杀棋提示",
+            "F3 - 性能面板  F4 - 导出CSV",
             "左键 - 选择/操作",
             "右键 - 取消选择"
         ]
@@ -865,7 +1083,7 @@ class Game:
             row = i % per_col
             draw_x = x if col == 0 else x2
             draw_y = y + row * 18
-            text_surface = font.render(control, True, (0, 0, 0))
+            text_surface = self.render_text(font, control, (0, 0, 0))
             self.screen.blit(text_surface, (draw_x, draw_y))
 
     def draw_reset_btn(self):
@@ -877,7 +1095,7 @@ class Game:
             pygame.draw.rect(self.screen, (200, 200, 200), self.reset_btn_rect)
             pygame.draw.rect(self.screen, (100, 100, 100), self.reset_btn_rect, 2)
             font = get_chinese_font(24)
-            text = font.render("重新开始", True, (0, 0, 0))
+            text = self.render_text(font, "重新开始", (0, 0, 0))
             text_rect = text.get_rect(center=self.reset_btn_rect.center)
             self.screen.blit(text, text_rect)
         else:
@@ -885,7 +1103,7 @@ class Game:
             pygame.draw.rect(self.screen, (255, 180, 180), self.reset_btn_rect)
             pygame.draw.rect(self.screen, (180, 60, 60), self.reset_btn_rect, 2)
             font = get_chinese_font(24)
-            text = font.render("投降", True, (180, 60, 60))
+            text = self.render_text(font, "投降", (180, 60, 60))
             text_rect = text.get_rect(center=self.reset_btn_rect.center)
             self.screen.blit(text, text_rect)
 
@@ -911,22 +1129,40 @@ class Game:
             reasons.append(f"行动点不足(工业{ind}-军队{army}+1={ind-army+1})")
         
         if reasons:
-            text = font.render("濒危状态！", True, (255, 0, 0))
+            text = self.render_text(font, "濒危状态！", (255, 0, 0))
             text_rect = text.get_rect(center=(self.width//2, 30))
             self.screen.blit(text, text_rect)
             
             # 显示具体原因
             font_small = get_chinese_font(16)
             for i, reason in enumerate(reasons):
-                text = font_small.render(reason, True, (255, 0, 0))
+                text = self.render_text(font_small, reason, (255, 0, 0))
                 text_rect = text.get_rect(center=(self.width//2, 55 + i*20))
                 self.screen.blit(text, text_rect)
 
+        # 下回合敌军能吃到的王塔与无人保护的军队（查威胁图，O(1)；军队的高亮见board_marks）
+        threats = threats_for(self.board)
+        tower_threat = threats.tower_threat(self.current_player)
+        hanging = self.hanging_armies()
+        font_small = get_chinese_font(16)
+        lines = []
+        if tower_threat:
+            lines.append(f"王塔受到{tower_threat}支敌军威胁！")
+        if hanging:
+            lines.append(f"{len(hanging)}支军队无人保护")
+        for i, line in enumerate(lines):
+            text = self.render_text(font_small, line, (200, 0, 0))
+            self.screen.blit(text, (self.width - 300, 80 + i * 20))
+
+    def winner_rect(self):
+        """获胜画面（文字与重新开始按钮）占据的矩形"""
+        return pygame.Rect(self.width//2 - 200, self.height//2 - 50, 400, 150)
+
     def draw_winner(self):
         """绘制获胜画面"""
         font = get_chinese_font(48)
         winner_name = "白方" if self.winner == 1 else "黑方"
-        text = font.render(f"{winner_name}获胜！", True, (255, 215, 0))
+        text = self.render_text(font, f"{winner_name}获胜！", (255, 215, 0))
         text_rect = text.get_rect(center=(self.width//2, self.height//2))
         self.screen.blit(text, text_rect)
         
@@ -935,13 +1171,13 @@ class Game:
         pygame.draw.rect(self.screen, (200, 200, 200), self.winner_btn_rect)
         pygame.draw.rect(self.screen, (100, 100, 100), self.winner_btn_rect, 2)
         font = get_chinese_font(24)
-        text = font.render("重新开始", True, (0, 0, 0))
+        text = self.render_text(font, "重新开始", (0, 0, 0))
         text_rect = text.get_rect(center=self.winner_btn_rect.center)
         self.screen.blit(text, text_rect)
 
     def draw_start_menu(self):
         font = self.font_title
-        title = font.render("半数边疆", True, (0, 0, 0))
+        title = self.render_text(font, "半数边疆", (0, 0, 0))
         title_rect = title.get_rect(center=(self.width//2, 60))
         self.screen.blit(title, title_rect)
 
@@ -950,7 +1186,7 @@ class Game:
         net_rect = pygame.Rect(200, 120, 200, 60)
         pygame.draw.rect(self.screen, (255, 255, 200), net_rect)
         pygame.draw.rect(self.screen, (0, 0, 0), net_rect, 2)
-        text = font_btn.render("网络对战", True, (0, 0, 0))
+        text = self.render_text(font_btn, "网络对战", (0, 0, 0))
         text_rect = text.get_rect(center=net_rect.center)
         self.screen.blit(text, text_rect)
 
@@ -962,10 +1198,10 @@ class Game:
         pygame.draw.rect(self.screen, (220, 255, 220), mode_pvp_rect)
         pygame.draw.rect(self.screen, (0, 0, 0), mode_ai_rect, 2)
         pygame.draw.rect(self.screen, (0, 0, 0), mode_pvp_rect, 2)
-        text = font_btn.render("人机对战", True, (0, 0, 0))
+        text = self.render_text(font_btn, "人机对战", (0, 0, 0))
         text_rect = text.get_rect(center=mode_ai_rect.center)
         self.screen.blit(text, text_rect)
-        text = font_btn.render("双人对战", True, (0, 0, 0))
+        text = self.render_text(font_btn, "双人对战", (0, 0, 0))
         text_rect = text.get_rect(center=mode_pvp_rect.center)
         self.screen.blit(text, text_rect)
         # 高亮当前模式
@@ -976,12 +1212,12 @@ class Game:
         else:
             pygame.draw.rect(self.screen, (60, 200, 255), mode_pvp_rect, 5)
         # 玩家方选择
-        text = font_btn.render("选择玩家方:", True, (0, 0, 0))
+        text = self.render_text(font_btn, "选择玩家方:", (0, 0, 0))
         self.screen.blit(text, (200, 280))
         white_rect = pygame.Rect(200, 330, 200, 60)
         pygame.draw.rect(self.screen, (255, 255, 255), white_rect)
         pygame.draw.rect(self.screen, (0, 0, 0), white_rect, 2)
-        text = font_btn.render("白方", True, (0, 0, 0))
+        text = self.render_text(font_btn, "白方", (0, 0, 0))
         text_rect = text.get_rect(center=white_rect.center)
         self.screen.blit(text, text_rect)
         if self.player_side == 1:
@@ -989,34 +1225,37 @@ class Game:
         black_rect = pygame.Rect(420, 330, 200, 60)
         pygame.draw.rect(self.screen, (0, 0, 0), black_rect)
         pygame.draw.rect(self.screen, (255, 255, 255), black_rect, 2)
-        text = font_btn.render("黑方", True, (255, 255, 255))
+        text = self.render_text(font_btn, "黑方", (255, 255, 255))
         text_rect = text.get_rect(center=black_rect.center)
         self.screen.blit(text, text_rect)
         if self.player_side == 2:
             pygame.draw.rect(self.screen, (255, 180, 60), black_rect, 5)
         # AI难度选择（仅AI模式下显示）
         if self.game_mode == 'ai':
-            text = font_btn.render("AI难度:", True, (0, 0, 0))
+            text = self.render_text(font_btn, "AI难度:", (0, 0, 0))
             self.screen.blit(text, (200, 410))
-            difficulties = [("简单", 200), ("普通", 340), ("困难", 480)]
+            font_elo = self.font_small
             diff_rects = []
-            for idx, (name, x) in enumerate(difficulties):
-                diff_rect = pygame.Rect(x, 430, 120, 60)
+            for idx, level in enumerate(DIFFICULTY_ORDER):
+                diff_rect = pygame.Rect(200 + idx * 140, 430, 120, 60)
                 diff_rects.append(diff_rect)
                 pygame.draw.rect(self.screen, (200, 200, 200), diff_rect)
                 pygame.draw.rect(self.screen, (0, 0, 0), diff_rect, 2)
-                text = font_btn.render(name, True, (0, 0, 0))
-                text_rect = text.get_rect(center=diff_rect.center)
+                text = self.render_text(font_btn, DIFFICULTY_NAMES[level], (0, 0, 0))
+                text_rect = text.get_rect(center=(diff_rect.centerx, diff_rect.centery - 10))
+                self.screen.blit(text, text_rect)
+                # 自对弈标定的等级分
+                text = self.render_text(font_elo, f"Elo {DIFFICULTY_LEVELS[level]['elo']}", (60, 60, 60))
+                text_rect = text.get_rect(center=(diff_rect.centerx, diff_rect.bottom - 12))
                 self.screen.blit(text, text_rect)
-            color_map = {"easy":0, "normal":1, "hard":2}
-            if self.ai_difficulty in color_map:
-                idx = color_map[self.ai_difficulty]
+            if self.ai_difficulty in DIFFICULTY_ORDER:
+                idx = DIFFICULTY_ORDER.index(self.ai_difficulty)
                 pygame.draw.rect(self.screen, (60, 200, 255), diff_rects[idx], 5)
         # 开始游戏按钮
         start_rect = pygame.Rect(300, 540, 200, 60)
         pygame.draw.rect(self.screen, (0, 255, 0), start_rect)
         pygame.draw.rect(self.screen, (0, 0, 0), start_rect, 2)
-        text = font_btn.render("开始游戏", True, (0, 0, 0))
+        text = self.render_text(font_btn, "开始游戏", (0, 0, 0))
         text_rect = text.get_rect(center=start_rect.center)
         self.screen.blit(text, text_rect)
         self.start_btn_rect = start_rect  # 用于点击检测
@@ -1024,6 +1263,7 @@ class Game:
     def get_net_info_dialog(self):
         # 用tkinter弹窗选择创建/加入房间，并输入服务器地址、房间号、昵称
         def ask():
+            import tkinter as tk
             root = tk.Tk()
             root.withdraw()
             # 先弹出选择
@@ -1054,11 +1294,17 @@ class Game:
             # 创建房间时自动启动本地服务器
             if is_create:
                 # 尝试启动本地服务器
-                success, msg, server_process = start_local_server(8765)
+                if self.local_server and not self.local_server.running():
+                    self.local_server = None
+                if self.local_server:
+                    success, msg, local_server = True, f"本地服务器运行中 (端口: {self.local_server.port})", self.local_server
+                else:
+                    success, msg, local_server = start_local_server(8765)
                 if success:
-                    messagebox.showinfo("服务器启动", f"{msg}\n\n其他玩家可以使用以下地址连接:\nws://localhost:8765\nws://127.0.0.1:8765")
-                    addr = "ws://localhost:8765"
-                    self.server_process = server_process # 保存进程对象
+                    port = local_server.port
+                    messagebox.showinfo("服务器启动", f"{msg}\n\n其他玩家可以使用以下地址连接:\nws://localhost:{port}\nws://127.0.0.1:{port}")
+                    addr = local_server.url
+                    self.local_server = local_server
                 else:
                     # 如果自动启动失败，询问是否手动输入地址
                     retry = messagebox.askyesno("服务器启动失败", 
@@ -1087,7 +1333,9 @@ class Game:
             self.net_wait_anim = 0
             self.net_players = [None, None]
             self.net_is_host = False
-            threading.Thread(target=self.net_connect_thread, daemon=True).start()
+            if self.board is None:
+                self.init_game()  # 房主准备时要同步初始地图
+            self.connect_net()
         ask()
 
     def export_init_state(self):
@@ -1108,137 +1356,125 @@ class Game:
         from piece import Piece, PieceType, Player
         for p in state.get("pieces", []):
             self.board.pieces.append(Piece(PieceType(p["type"]), Player(p["player"]), p["x"], p["y"]))
+        self.board.notify('reset')
         self.board.update_all_status()
 
-    def net_connect_thread(self):
-        import websocket
-        import json
-        import time
-        try:
-            ws = websocket.create_connection(
-                self.net_addr, 
-                timeout=30,
-                ping_interval=10,
-                ping_timeout=5
-            )
-            self.net_ws = ws
-            join_msg = json.dumps({"type": "join", "room": self.net_room, "name": self.net_name})
-            ws.send(join_msg)
-            ws.settimeout(5)
-            while True:
-                try:
-                    msg = ws.recv()
-                    if not msg:
-                        continue
-                    data = json.loads(msg)
-                    print(f"收到服务器消息: {data}")
-                    if data.get("type") == "joined":
-                        player_idx = data.get("player", 1) - 1
-                        self.net_is_host = (player_idx == 0)
-                        names = data.get("names", [self.net_name, ""])
-                        side = data.get("side", 1)
-                        self.net_players = [
-                            {"name": names[0] if len(names)>0 else "", "side": side},
-                            {"name": names[1] if len(names)>1 else "", "side": 3-side}
-                        ]
-                        self.net_ready = [False, False]
-                    elif data.get("type") == "player_update":
-                        names = data.get("names", [self.net_name, ""])
-                        side = data.get("side", 1)
-                        self.net_players = [
-                            {"name": names[0] if len(names)>0 else "", "side": side},
-                            {"name": names[1] if len(names)>1 else "", "side": 3-side}
-                        ]
-                    elif data.get("type") == "ready_update":
-                        self.net_ready = data.get("ready", [False, False])
-                    elif data.get("type") == "start":
-                        names = data.get("names", [self.net_name, ""])
-                        side = data.get("side", 1)
-                        self.net_players = [
-                            {"name": names[0] if len(names)>0 else "", "side": side},
-                            {"name": names[1] if len(names)>1 else "", "side": 3-side}
-                        ]
-                        if self.net_is_host:
-                            self.player_side = side
-                        else:
-                            self.player_side = 3 - side
-                        self.net_waiting = False
-                        # 初始化网络对战状态
-                        self.net_current_player = data.get("current_player", 1)
-                        self.net_game_step = data.get("game_step", 0)
-                        self.current_player = self.net_current_player
-                        self.step = self.net_game_step
-                        
-                        # 正确设置回合状态
-                        if self.net_is_host:
-                            self.player_side = side
-                        else:
-                            self.player_side = 3 - side
-                        
-                        self.net_is_my_turn = (self.player_side == self.net_current_player)
-                        print(f"网络对战初始化: 玩家方={self.player_side}, 当前玩家={self.net_current_player}, 我的回合={self.net_is_my_turn}")
-                        # 重置游戏状态
-                        self.selected = None
-                        self.move_used = 0
-                        self.move_limit = self.board.get_move_limit(self.current_player)
-                        self.build_list = []
-                        self.build_counts = {0: 0, 1: 0, 2: 0}
-                        self.build_popup = None
-                        self.build_preview = None
-                        self.game_over = False
-                        self.winner = None
-                        # 确保游戏状态正确初始化
-                        self.board.reset_move_count(1)
-                        self.board.reset_move_count(2)
-                        self.board.update_all_status()
-                        # 不要break，继续监听消息
-                        continue
-                    elif data.get("type") == "turn_update":
-                        self.net_current_player = data.get("current_player", 1)
-                        self.net_game_step = data.get("game_step", 0)
-                        self.net_is_my_turn = (self.player_side == self.net_current_player)
-                        self.current_player = self.net_current_player
-                        self.step = self.net_game_step
-                    elif data.get("type") == "game_action":
-                        # 处理对方动作
-                        self.handle_remote_action(data)
-                    elif data.get("type") == "game_state_sync":
-                        # 同步游戏状态
-                        self.sync_game_state(data.get("game_state", {}))
-                    elif data.get("type") == "error":
-                        self.net_error = data.get("msg", "加入房间失败")
-                        self.net_waiting = True
-                        try:
-                            ws.close()
-                        except Exception:
-                            pass
-                        break
-                    elif data.get("type") == "init_state_sync":
-                        self.import_init_state(data.get("init_state"))
-                except websocket.WebSocketTimeoutException:
-                    continue
-                except websocket.WebSocketConnectionClosedException:
-                    self.net_error = "连接已断开"
-                    self.net_waiting = True
-                    break
-        except websocket.WebSocketException as e:
-            self.net_error = f"WebSocket连接失败: {e}"
-            self.net_waiting = True
-            print(f"WebSocket异常: {e}")
-        except ConnectionRefusedError:
-            self.net_error = "连接被拒绝: 服务器可能未运行或地址错误"
+    def connect_net(self):
+        """连接服务器并加入房间；收到的消息由主循环每帧处理"""
+        from netclient import NetConnection
+        self.close_net()
+        # 每个连接用自己的收件箱，旧连接迟到的消息不会混进新的对局
+        self.net_inbox = NetInbox()
+        hello = {"type": "join", "room": self.net_room, "name": self.net_name}
+        self.net_conn = NetConnection(self.net_addr, self.net_inbox, wake=self.wake, hello=hello).start()
+
+    def close_net(self):
+        """断开当前网络连接，丢弃还没处理的消息"""
+        if self.net_conn:
+            self.net_conn.close()
+        self.net_conn = None
+        self.net_inbox = None
+
+    def drain_net(self):
+        """主线程每帧调用：按到达顺序处理网络线程收到的消息"""
+        if self.net_inbox is not None:
+            self.net_inbox.drain(self.handle_net_message)
+
+    def net_send(self, message):
+        """把消息交给网络事件循环发送，不阻塞主循环；没有连接时返回False"""
+        if not self.net_conn:
+            return False
+        return self.net_conn.send(message)
+
+    def set_net_players(self, data):
+        names = data.get("names", [self.net_name, ""])
+        side = data.get("side", 1)
+        self.net_players = [
+            {"name": names[0] if len(names)>0 else "", "side": side},
+            {"name": names[1] if len(names)>1 else "", "side": 3-side}
+        ]
+        return side
+
+    def handle_net_message(self, data):
+        """处理一条服务器消息（只在主线程调用）"""
+        msg_type = data.get("type")
+        if msg_type == "joined":
+            player_idx = data.get("player", 1) - 1
+            self.net_is_host = (player_idx == 0)
+            self.net_error = ''  # 重连成功
+            self.set_net_players(data)
+            self.net_ready = [False, False]
+        elif msg_type == "player_update":
+            self.set_net_players(data)
+        elif msg_type == "ready_update":
+            self.net_ready = data.get("ready", [False, False])
+        elif msg_type == "start":
+            side = self.set_net_players(data)
+            self.net_waiting = False
+            # 服务器不保存进行中的对局，开局后断线重连只会以新玩家身份加入，所以不再自动重连
+            if self.net_conn:
+                self.net_conn.reconnect = False
+            # 初始化网络对战状态
+            self.net_current_player = data.get("current_player", 1)
+            self.net_game_step = data.get("game_step", 0)
+            self.current_player = self.net_current_player
+            self.step = self.net_game_step
+            
+            # 正确设置回合状态
+            if self.net_is_host:
+                self.player_side = side
+            else:
+                self.player_side = 3 - side
+            
+            self.net_is_my_turn = (self.player_side == self.net_current_player)
+            print(f"网络对战初始化: 玩家方={self.player_side}, 当前玩家={self.net_current_player}, 我的回合={self.net_is_my_turn}")
+            # 重置游戏状态
+            self.selected = None
+            self.move_used = 0
+            self.move_limit = self.board.get_move_limit(self.current_player)
+            self.build_list = []
+            self.build_counts = {0: 0, 1: 0, 2: 0}
+            self.build_popup = None
+            self.build_preview = None
+            self.game_over = False
+            self.winner = None
+            # 确保游戏状态正确初始化
+            self.board.reset_move_count(1)
+            self.board.reset_move_count(2)
+            self.board.update_all_status()
+            # 双方与服务器都从开局局面的序号0开始同步
+            self.net_sync = SyncState.from_board(self.board)
+            self.net_resync_pending = False
+        elif msg_type == "turn_update":
+            previous = self.net_current_player
+            self.net_current_player = data.get("current_player", 1)
+            self.net_game_step = data.get("game_step", 0)
+            self.net_is_my_turn = (self.player_side == self.net_current_player)
+            self.current_player = self.net_current_player
+            self.step = self.net_game_step
+            if self.net_is_my_turn and previous != self.net_current_player:
+                # 轮到自己：重置本回合的计数，随后的增量会把它们同步给对方
+                self.move_used = 0
+                self.build_counts = {0: 0, 1: 0, 2: 0}
+                self.board.reset_move_count(self.player_side)
+                self.move_limit = self.board.get_move_limit(self.player_side)
+        elif msg_type == "game_action":
+            # 处理对方动作
+            self.handle_remote_action(data)
+        elif msg_type == "state_delta":
+            self.apply_state_delta(data.get("delta") or {})
+        elif msg_type == "state_snapshot":
+            self.load_state_snapshot(data.get("snapshot") or {})
+        elif msg_type == "error":
+            self.net_error = data.get("msg", "加入房间失败")
             self.net_waiting = True
-            print("连接被拒绝")
-        except Exception as e:
-            self.net_error = f"连接失败: {e}" if not self.net_error else self.net_error
+        elif msg_type == "init_state_sync":
+            self.import_init_state(data.get("init_state"))
+        elif msg_type == NET_RECONNECTING:
+            self.net_error = f"连接中断，{data.get('delay', 0):.1f}秒后第{data.get('attempt', 1)}次重连..."
+        elif msg_type == NET_CLOSED:
+            self.net_error = data.get("msg", "连接已断开")
             self.net_waiting = True
-            print(f"其他异常: {e}")
-        finally:
-            try:
-                if self.net_ws:
-                    self.net_ws.close()
-            except Exception:
-                pass
 
     def handle_remote_action(self, data):
         """处理远程玩家的动作"""
@@ -1281,28 +1517,58 @@ class Game:
             # 回合结束，状态已在turn_update中更新
             pass
 
-    def sync_game_state(self, game_state):
-        """同步游戏状态"""
-        if not game_state:
+    def sync_counters(self):
+        """随增量同步的计数器（见sync.START_COUNTERS）"""
+        return {
+            "move_used": self.move_used,
+            "build_counts": [self.build_counts[i] for i in range(3)],
+            "winner": self.board.winner,
+        }
+
+    def apply_sync_counters(self, counters):
+        if "move_used" in counters:
+            self.move_used = counters["move_used"]
+        if "build_counts" in counters:
+            self.build_counts = dict(enumerate(counters["build_counts"]))
+
+    def publish_state(self):
+        """轮到自己时，把上次发布以来的局面变化作为一条增量发给服务器"""
+        if (self.game_mode != 'net' or self.net_sync is None or not self.net_is_my_turn
+                or self.current_player != self.player_side):
             return
-        
-        # 同步棋盘状态
-        board_state = game_state.get("board")
-        if board_state:
-            # 这里可以根据需要同步具体的棋盘数据
-            pass
-        
-        # 同步游戏进度
-        self.current_player = game_state.get("current_player", self.current_player)
-        self.step = game_state.get("step", self.step)
-        self.move_used = game_state.get("move_used", self.move_used)
+        delta = self.net_sync.diff(board_cells(self.board), self.sync_counters())
+        if delta:
+            self.net_send({"type": "state_delta", "delta": delta})
+
+    def apply_state_delta(self, delta):
+        """应用对方或服务器的增量；序号接不上时请求服务器补发"""
+        if self.net_sync is None:
+            return
+        if not self.net_sync.apply(delta):
+            # base比本地新说明中间漏了增量；比本地旧的是过期或重复的，忽略
+            if delta.get("base", -1) > self.net_sync.seq and not self.net_resync_pending:
+                self.net_resync_pending = True
+                self.net_send({"type": "resync_request", "since": self.net_sync.seq})
+            return
+        self.net_resync_pending = False
+        apply_delta(self.board, delta)
+        self.apply_sync_counters(delta.get("counters", {}))
+
+    def load_state_snapshot(self, snapshot):
+        """服务器发来的完整快照（漏收太多或自己的增量基于旧局面时），以服务器为准"""
+        if self.net_sync is None or not snapshot:
+            return
+        load_snapshot(self.board, snapshot)
+        self.net_sync = SyncState.from_snapshot(snapshot)
+        self.net_resync_pending = False
+        self.apply_sync_counters(self.net_sync.counters)
 
     def send_game_action(self, action_type, action_data=None):
         """发送游戏动作到服务器"""
         print(f"尝试发送游戏动作: {action_type}")
-        print(f"网络状态: ws={self.net_ws is not None}, mode={self.game_mode}, my_turn={self.net_is_my_turn}")
+        print(f"网络状态: 连接={self.net_conn is not None}, mode={self.game_mode}, my_turn={self.net_is_my_turn}")
         
-        if not self.net_ws or self.game_mode != 'net':
+        if not self.net_conn or self.game_mode != 'net':
             print(f"发送失败: WebSocket或游戏模式问题")
             return
         
@@ -1318,17 +1584,20 @@ class Game:
             return
         self.net_last_action_time = now
         
-        try:
-            import json
-            message = {
-                "type": "game_action",
-                "action_type": action_type,
-                "action_data": action_data or {}
-            }
-            self.net_ws.send(json.dumps(message))
-            print(f"✓ 成功发送游戏动作: {action_type}")
-        except Exception as e:
-            print(f"✗ 发送游戏动作失败: {e}")
+        if action_type == "end_turn":
+            self.publish_state()  # 本回合的局面变化要在回合切换之前送达
+        
+        message = {
+            "type": "game_action",
+            "action_type": action_type,
+            "action_data": action_data or {}
+        }
+        with self.profiler.stage('net_send'):
+            queued = self.net_send(message)
+        if queued:
+            print(f"✓ 游戏动作已加入发送队列: {action_type}")
+        else:
+            print(f"✗ 发送游戏动作失败: 发送队列已满或连接已关闭")
 
     def draw_net_waiting(self):
         font = self.font_mid
@@ -1336,14 +1605,14 @@ class Game:
         # 错误提示优先显示
         if self.net_error:
             font2 = self.font_net_err
-            err = font2.render(self.net_error, True, (200, 0, 0))
+            err = self.render_text(font2, self.net_error, (200, 0, 0))
             err_rect = err.get_rect(center=(self.width//2, 80))
             self.screen.blit(err, err_rect)
             
             # 提供返回主菜单的提示
             font3 = self.font_net_esc
             back_text = "按ESC返回主菜单"
-            back = font3.render(back_text, True, (100, 100, 100))
+            back = self.render_text(font3, back_text, (100, 100, 100))
             back_rect = back.get_rect(center=(self.width//2, 120))
             self.screen.blit(back, back_rect)
             
@@ -1351,21 +1620,21 @@ class Game:
             if "连接" in self.net_error:
                 font4 = get_chinese_font(16)
                 suggest_text = "快速切换：按1键切换到人机对战，按2键切换到双人对战"
-                suggest = font4.render(suggest_text, True, (80, 80, 80))
+                suggest = self.render_text(font4, suggest_text, (80, 80, 80))
                 suggest_rect = suggest.get_rect(center=(self.width//2, 150))
                 self.screen.blit(suggest, suggest_rect)
             else:
                 # 提供建议
                 font4 = get_chinese_font(16)
                 suggest_text = "建议：选择人机对战或双人对战模式进行游戏"
-                suggest = font4.render(suggest_text, True, (80, 80, 80))
+                suggest = self.render_text(font4, suggest_text, (80, 80, 80))
                 suggest_rect = suggest.get_rect(center=(self.width//2, 150))
                 self.screen.blit(suggest, suggest_rect)
             return
         
         # 正常等待状态
         dots = '.' * ((self.net_wait_anim // 20) % 4)
-        text = font.render(f"等待另一位玩家加入{dots}", True, (0, 0, 0))
+        text = self.render_text(font, f"等待另一位玩家加入{dots}", (0, 0, 0))
         rect = text.get_rect(center=(self.width//2, 80))
         self.screen.blit(text, rect)
         
@@ -1379,7 +1648,7 @@ class Game:
                 name = p["name"]
                 ready_str = "（已准备）" if self.net_ready[idx] else "（未准备）"
                 info = f"{label}: {name}（{side_str}）{ready_str}"
-                t = font2.render(info, True, (0,0,0))
+                t = self.render_text(font2, info, (0,0,0))
                 self.screen.blit(t, (self.width//2-160, y0+idx*40))
         
         # 房主选边按钮
@@ -1392,7 +1661,7 @@ class Game:
             btn_text = "执黑方" if side == 1 else "执白方"
             pygame.draw.rect(self.screen, (200,220,255), btn_rect)
             pygame.draw.rect(self.screen, (0,0,0), btn_rect, 2)
-            t = btn_font.render(btn_text, True, (0,0,0))
+            t = self.render_text(btn_font, btn_text, (0,0,0))
             self.screen.blit(t, t.get_rect(center=btn_rect.center))
             # 鼠标点击切换执棋方（防抖）
             mouse = pygame.mouse.get_pressed()
@@ -1405,37 +1674,41 @@ class Game:
                     if self.net_players[0] is not None:
                         self.net_players[0]["side"] = new_side
                     # 发送choose_side消息
-                    try:
-                        if self.net_ws:
-                            import json
-                            self.net_ws.send(json.dumps({"type": "choose_side", "side": new_side}))
-                    except Exception:
-                        pass
+                    self.net_send({"type": "choose_side", "side": new_side})
                     self.last_side_click_time = now
-        
+            # 没有对手时可以请求服务器托管的AI对手（难度取主菜单所选）
+            if not (self.net_players[1] and self.net_players[1]["name"]):
+                bot_rect = pygame.Rect(self.width//2+80, y0+90, 140, 40)
+                pygame.draw.rect(self.screen, (255,230,180), bot_rect)
+                pygame.draw.rect(self.screen, (0,0,0), bot_rect, 2)
+                t = self.render_text(btn_font, "AI对手", (0,0,0))
+                self.screen.blit(t, t.get_rect(center=bot_rect.center))
+                if mouse[0] and bot_rect.collidepoint(mx, my) and now - self.last_side_click_time > 0.25:
+                    self.net_send({"type": "request_bot", "difficulty": self.ai_difficulty})
+                    self.last_side_click_time = now
+
         # 准备按钮
         my_idx = 0 if self.net_is_host else 1
         if not self.net_ready[my_idx]:
             ready_btn_rect = pygame.Rect(self.width//2-60, y0+150, 120, 40)
             pygame.draw.rect(self.screen, (180,255,180), ready_btn_rect)
             pygame.draw.rect(self.screen, (0,0,0), ready_btn_rect, 2)
-            t = self.font_net_btn.render("准备", True, (0,0,0))
+            t = self.render_text(self.font_net_btn, "准备", (0,0,0))
             self.screen.blit(t, t.get_rect(center=ready_btn_rect.center))
             mouse = pygame.mouse.get_pressed()
             mx, my = pygame.mouse.get_pos()
             if mouse[0] and ready_btn_rect.collidepoint(mx, my):
-                if self.net_ws:
-                    import json
+                if self.net_conn:
                     if self.net_is_host:
                         # 房主先同步初始状态
-                        self.net_ws.send(json.dumps({
+                        self.net_send({
                             "type": "init_state_sync",
                             "init_state": self.export_init_state()
-                        }))
-                    self.net_ws.send(json.dumps({"type": "ready"}))
+                        })
+                    self.net_send({"type": "ready"})
         
         # ESC返回提示
         font2 = self.font_net_esc
-        esc = font2.render("按ESC返回主菜单", True, (100, 100, 100))
+        esc = self.render_text(font2, "按ESC返回主菜单", (100, 100, 100))
         esc_rect = esc.get_rect(center=(self.width//2, self.height-60))
         self.screen.blit(esc, esc_rect) 
\ No newline at end of file
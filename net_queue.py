@@ -0,0 +1,37 @@
+from collections import deque
+
+INBOX_CAPACITY = 4096  # 主循环来不及处理时最多积压的服务器消息数
+NET_CLOSED = 'connection_closed'  # 连接结束、不再重连时放入收件箱的本地消息，msg为错误提示
+NET_RECONNECTING = 'reconnecting'  # 断线后等待重连时放入收件箱的本地消息，attempt为第几次，delay为等待秒数
+
+
+class NetInbox:
+    """网络线程到主循环的消息队列
+
+    网络事件循环（netclient）只负责收消息、解码后put，主循环每帧drain一次，按到达顺序交给处理函数，
+    界面状态只在主线程修改。deque的append/popleft在CPython中是原子操作，不需要加锁。
+    超过容量时put返回False（丢消息会让双方局面不一致，连接应当断开）。
+    """
+
+    def __init__(self, capacity=INBOX_CAPACITY):
+        self.messages = deque()
+        self.capacity = capacity
+        self.dropped = 0
+
+    def put(self, message, force=False):
+        """网络线程调用；force为True时不受容量限制（用于连接结束的通知）"""
+        if not force and len(self.messages) >= self.capacity:
+            self.dropped += 1
+            return False
+        self.messages.append(message)
+        return True
+
+    def drain(self, handler, limit=None):
+        """主线程调用：按顺序处理已到达的消息，返回处理的条数；处理期间新到的消息留到下一帧"""
+        count = len(self.messages) if limit is None else min(limit, len(self.messages))
+        for _ in range(count):
+            handler(self.messages.popleft())
+        return count
+
+    def __len__(self):
+        return len(self.messages)
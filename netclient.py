@@ -0,0 +1,191 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import websockets
+from net_queue import NET_CLOSED, NET_RECONNECTING
+
+HEARTBEAT_INTERVAL = 10  # 心跳（WebSocket ping）间隔，秒
+HEARTBEAT_TIMEOUT = 5  # 超过这么久没有收到pong视为断线
+CONNECT_TIMEOUT = 10  # 建立连接（含握手）的超时
+RECONNECT_RETRIES = 5  # 断线后最多连续重连几次
+RECONNECT_BASE = 0.5  # 第一次重连前等待的秒数，之后每次翻倍
+RECONNECT_MAX = 8.0  # 重连等待的上限
+SEND_QUEUE_SIZE = 256  # 等待发送的消息数上限
+RESOLVER_THREADS = 2  # 解析服务器域名（getaddrinfo）用的线程数，与连接数无关
+
+
+def backoff_delay(attempt, base=RECONNECT_BASE, limit=RECONNECT_MAX):
+    """第attempt次（从0开始）重连前等待的秒数"""
+    return min(limit, base * 2 ** attempt)
+
+
+class NetLoop:
+    """客户端所有连接共用的asyncio事件循环，运行在一个后台线程里
+
+    连接数再多也只占这一个线程；收发都是协程，不再需要每个连接一个阻塞在recv上的线程。
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def ensure(self):
+        """返回正在运行的事件循环，第一次调用时启动线程"""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                ready = threading.Event()
+                self.thread = threading.Thread(target=self._run, args=(ready,), name='net-loop', daemon=True)
+                self.thread.start()
+                ready.wait()
+            return self.loop
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        # 默认执行器会随并发的域名解析增长到很多线程，这里固定为少数几个
+        self.loop.set_default_executor(ThreadPoolExecutor(RESOLVER_THREADS, thread_name_prefix='net-resolve'))
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def call(self, callback, *args):
+        """在事件循环线程里执行callback（可从任意线程调用）"""
+        self.ensure().call_soon_threadsafe(callback, *args)
+
+
+_shared_loop = NetLoop()
+
+
+def net_loop():
+    return _shared_loop
+
+
+class NetConnection:
+    """一个到服务器的WebSocket连接，收发都在共用的事件循环上进行
+
+    收到的消息解码后放进inbox（net_queue.NetInbox），再调用wake唤醒主循环；
+    send可以在任何线程调用，消息排进发送队列后立即返回，断线期间的消息在重连后发出。
+    连接建立（包括重连）后先发送hello（如加入房间）。断线或连接失败时按指数退避重连，
+    重连前在inbox中放一条NET_RECONNECTING；放弃重连时放一条NET_CLOSED。主动close不发通知。
+    心跳使用WebSocket协议的ping/pong，超时未回应即按断线处理。
+    """
+
+    def __init__(self, url, inbox, wake=None, hello=None, retries=RECONNECT_RETRIES, loop=None):
+        self.url = url
+        self.inbox = inbox
+        self.wake = wake
+        self.hello = hello
+        self.retries = retries
+        self.reconnect = True  # 为False时断线后不再重连
+        self.loop = loop or net_loop()
+        self.outbox = None  # asyncio.Queue，在事件循环线程中创建
+        self.unsent = None  # 因断线没发出去的消息，重连后最先发送
+        self.task = None
+        self.closed = False
+        self.connected = False
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    def start(self):
+        self.loop.call(self._start)
+        return self
+
+    def _start(self):
+        self.outbox = asyncio.Queue(SEND_QUEUE_SIZE)
+        if not self.closed:
+            self.task = asyncio.ensure_future(self._run())
+
+    def send(self, message):
+        """把消息（可JSON序列化的对象）交给事件循环发送，不阻塞；已关闭时返回False"""
+        if self.closed:
+            return False
+        self.loop.call(self._enqueue, message)
+        return True
+
+    def _enqueue(self, message):
+        try:
+            self.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def close(self):
+        """断开连接并停止重连，可重复调用"""
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.call(self._cancel)
+
+    def _cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def _deliver(self, message, force=False):
+        if not self.inbox.put(message, force=force):
+            return False
+        if self.wake:
+            self.wake()
+        return True
+
+    async def _run(self):
+        attempt = 0
+        reason = None
+        try:
+            while True:
+                try:
+                    reason = await self._session()
+                except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                    reason = "连接已断开" if self.connected else f"连接失败: {e}"
+                    print(f"网络连接异常: {e}")
+                if self.connected:
+                    attempt = 0  # 连上过，重连等待从头计算
+                self.connected = False
+                if reason is None or not self.reconnect or attempt >= self.retries:
+                    break
+                delay = backoff_delay(attempt)
+                attempt += 1
+                self._deliver({"type": NET_RECONNECTING, "attempt": attempt, "delay": delay}, force=True)
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return  # 主动关闭
+        finally:
+            self.connected = False
+        if reason:
+            self._deliver({"type": NET_CLOSED, "msg": reason}, force=True)
+
+    async def _session(self):
+        """一次连接：并发收发直到断开，返回断线原因；收到服务器的error消息后返回None（不再重连）"""
+        async with websockets.connect(self.url, open_timeout=CONNECT_TIMEOUT, close_timeout=1,
+                                      ping_interval=HEARTBEAT_INTERVAL, ping_timeout=HEARTBEAT_TIMEOUT) as ws:
+            self.connected = True
+            if self.hello is not None:
+                await ws.send(json.dumps(self.hello))
+            sender = asyncio.ensure_future(self._send_loop(ws))
+            try:
+                async for text in ws:
+                    try:
+                        data = json.loads(text)
+                    except ValueError:
+                        print(f"无效的服务器消息: {text!r}")
+                        continue
+                    self.received += 1
+                    if not self._deliver(data):
+                        self.reconnect = False
+                        return "网络消息积压过多，连接已断开"
+                    if data.get("type") == "error":
+                        return None  # 错误提示由主循环显示
+            finally:
+                sender.cancel()
+        return "连接已断开"
+
+    async def _send_loop(self, ws):
+        try:
+            while True:
+                if self.unsent is None:
+                    self.unsent = await self.outbox.get()
+                await ws.send(json.dumps(self.unsent))
+                self.unsent = None
+                self.sent += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass  # 断线由接收循环处理，没发出的消息留到重连后
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+开局库：离线分析开局回合的最佳整回合计划，按（地图, 局面）哈希写入紧凑的二进制索引
+
+开局时势力范围几乎为空、可建造的位置很多，是每局搜索最慢的几个回合。
+离线用较大的计算预算自对弈，记录每个开局局面下分析得到的整回合动作；
+AIPlayer在行军阶段开始时先查表，命中则直接采用，未命中照常搜索。
+
+文件格式（小端）：
+    头部   b'OBK1', 条目数 u32, 最大棋子数 u32, 保留 u32
+    索引   条目数 × (键 u64, 数据偏移 u32, 数据长度 u16, 保留 u16)，按键排序
+    数据   每条：行军数、建造数、拆除数各 u8，随后依次为
+           行军 (sx, sy, tx, ty)、建造 (x, y, 类型)、拆除 (x, y)，每个坐标 u8
+读取时用mmap映射文件，二分查找索引，不把整个文件读入内存。
+
+用法示例：
+    python opening_book.py --games 200 --plies 2 --workers 4
+    python opening_book.py --seed-list 7 8 9 --analyst hard:time_limit=3,max_nodes=20000
+"""
+
+import hashlib
+import mmap
+import os
+import random
+import struct
+import time
+# 离线生成用的argparse、ProcessPoolExecutor在用到时才导入：AI与客户端启动时只需要查表
+
+from board import Board
+
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+MAGIC = b'OBK1'
+HEADER = struct.Struct('<4sIII')
+ENTRY = struct.Struct('<QIHH')
+# 离线分析默认使用的AI配置：困难难度，预算放大若干倍
+DEFAULT_ANALYST = 'hard:time_limit=3,max_nodes=12000,beam_width=12'
+DEFAULT_PLIES = 2
+
+
+def position_key(board, player):
+    """（地图, 局面, 行动方）的64位哈希；不含移动计数（查表在行军阶段开始、计数重置后进行）"""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(bytes(cell for row in board.grid for cell in row))
+    h.update(bytes([player]))
+    h.update(bytes(v for p in sorted((p.x, p.y, p.type.value, p.player.value) for p in board.pieces)
+                   for v in p))
+    return int.from_bytes(h.digest(), 'little')
+
+
+def encode_actions(actions):
+    """把play_turn返回的动作列表编码为字节串"""
+    moves = [args for kind, args in actions if kind == 'move']
+    builds = [args for kind, args in actions if kind == 'build']
+    removes = [args for kind, args in actions if kind == 'remove']
+    data = bytearray([len(moves), len(builds), len(removes)])
+    for group in (moves, builds, removes):
+        for args in group:
+            data.extend(args)
+    return bytes(data)
+
+
+def decode_actions(data):
+    """解码为(行军列表, 建造列表, 拆除列表)"""
+    counts = data[0], data[1], data[2]
+    pos = 3
+    groups = []
+    for count, width in zip(counts, (4, 3, 2)):
+        group = []
+        for _ in range(count):
+            group.append(tuple(data[pos:pos + width]))
+            pos += width
+        groups.append(group)
+    return tuple(groups)
+
+
+class OpeningBook:
+    """只读开局库，内存映射文件，查询为一次哈希加二分查找"""
+    def __init__(self, path=BOOK_FILE):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.max_pieces, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是开局库文件: {path}")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k, offset, length, _ = ENTRY.unpack_from(self._map, HEADER.size + mid * ENTRY.size)
+            if k == key:
+                return bytes(self._map[offset:offset + length])
+            if k < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def lookup(self, board, player):
+        """查询player在当前局面的整回合计划，返回(行军, 建造, 拆除)或None"""
+        # 棋子比库里所有开局局面都多时不可能命中，省掉哈希
+        if len(board.pieces) > self.max_pieces:
+            return None
+        data = self._find(position_key(board, player))
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return decode_actions(data)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def load_book(path=BOOK_FILE):
+    """打开开局库，文件不存在或格式不对时返回None（照常搜索）"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return OpeningBook(path)
+    except (OSError, ValueError) as e:
+        print(f"读取开局库失败: {e}")
+        return None
+
+
+def write_book(entries, path=BOOK_FILE):
+    """写出开局库；entries为{键: (棋子数, 编码后的动作)}"""
+    keys = sorted(entries)
+    offset = HEADER.size + len(keys) * ENTRY.size
+    index = bytearray()
+    blob = bytearray()
+    for key in keys:
+        data = entries[key][1]
+        index.extend(ENTRY.pack(key, offset + len(blob), len(data), 0))
+        blob.extend(data)
+    max_pieces = max((n for n, _ in entries.values()), default=0)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys), max_pieces, 0))
+        f.write(index)
+        f.write(blob)
+
+
+# ---- 离线分析 ----
+def analyse_map(seed, analyst=DEFAULT_ANALYST, plies=DEFAULT_PLIES):
+    """在seed对应的地图上用分析AI走完开局plies个回合，返回[(键, 棋子数, 编码后的动作)]
+
+    地图与tournament.play_game相同（同一seed得到同一地图），分析AI不读开局库。
+    """
+    from ai import AIPlayer
+    from tournament import parse_ai_spec
+    random.seed(seed)
+    board = Board(seed=seed)
+    ai = AIPlayer(book=False, **parse_ai_spec(analyst))
+    entries = []
+    for ply in range(plies):
+        player = 1 + ply % 2
+        board.reset_move_count(player)
+        key = position_key(board, player)
+        count = len(board.pieces)
+        actions = ai.play_turn(board, player)
+        entries.append((key, count, encode_actions(actions)))
+        if board.winner:
+            break
+    return entries
+
+
+def _analyse_job(job):
+    return analyse_map(*job)
+
+
+def build_book(seeds, analyst=DEFAULT_ANALYST, plies=DEFAULT_PLIES, workers=None):
+    """并行分析多张地图，返回可交给write_book的条目"""
+    jobs = [(seed, analyst, plies) for seed in seeds]
+    if workers == 1:
+        results = [_analyse_job(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_analyse_job, jobs))
+    entries = {}
+    for found in results:
+        for key, count, data in found:
+            entries[key] = (count, data)
+    return entries
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="离线分析生成开局库")
+    parser.add_argument('--games', type=int, default=100, help="分析的地图数")
+    parser.add_argument('--seed', type=int, default=0, help="生成地图种子的随机种子")
+    parser.add_argument('--seed-list', type=int, nargs='*', help="直接指定地图种子（与tournament.py的对局种子一致）")
+    parser.add_argument('--plies', type=int, default=DEFAULT_PLIES, help="每张地图分析的开局回合数")
+    parser.add_argument('--analyst', default=DEFAULT_ANALYST, help="分析用的AI配置，格式同tournament.py --ai")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="进程数")
+    parser.add_argument('--merge', action='store_true', help="保留已有开局库中的条目")
+    parser.add_argument('--out', default=BOOK_FILE, help="开局库文件路径")
+    args = parser.parse_args()
+
+    if args.seed_list:
+        seeds = args.seed_list
+    else:
+        rng = random.Random(args.seed)
+        seeds = [rng.randrange(2 ** 31) for _ in range(args.games)]
+    start = time.perf_counter()
+    entries = build_book(seeds, args.analyst, args.plies, args.workers)
+    if args.merge and os.path.exists(args.out):
+        old = OpeningBook(args.out)
+        for i in range(old.count):
+            key, offset, length, _ = ENTRY.unpack_from(old._map, HEADER.size + i * ENTRY.size)
+            entries.setdefault(key, (old.max_pieces, bytes(old._map[offset:offset + length])))
+        old.close()
+    write_book(entries, args.out)
+    print(f"分析 {len(seeds)} 张地图，写出 {len(entries)} 条开局，"
+          f"{os.path.getsize(args.out)} 字节，用时 {time.perf_counter() - start:.1f}s → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import time
+from piece import PieceType
+from board import BOARD_SIZE, ARMY_STEPS, NEIGHBORS, can_build_type
+from evaluation import WIN_SCORE, evaluate_board
+from danger import plan_recovery
+
+class TurnPlan:
+    """完整回合计划：行军、建造、拆除三个阶段的动作序列"""
+    def __init__(self, moves=None, builds=None, removes=None, score=-WIN_SCORE * 2):
+        self.moves = moves or []  # [(sx, sy, tx, ty)]
+        self.builds = builds or []  # [(x, y, build_type)]
+        self.removes = removes or []  # [(x, y)]
+        self.score = score
+        self.keys = {}  # 各阶段开始前的局面键，用于校验计划是否仍然适用
+
+
+class _Node:
+    """搜索节点：推演棋盘与到达该局面的动作序列"""
+    __slots__ = ('board', 'moves', 'builds', 'removes', 'counts', 'score')
+
+    def __init__(self, board, moves, builds, removes, counts, score):
+        self.board = board
+        self.moves = moves
+        self.builds = builds
+        self.removes = removes
+        self.counts = counts
+        self.score = score
+
+
+class TurnPlanner:
+    """整回合束搜索规划器
+
+    依次展开行军、建造、拆除三个阶段，每层只保留评分最高的beam_width个局面，
+    相同局面（不同动作顺序到达）只展开一次。超出时间或节点预算时返回已找到的最佳完整计划。
+    """
+    # 各阶段占用的时间与节点预算比例
+    PHASE_BUDGET = (0.5, 0.35, 0.15)
+
+    def __init__(self, ai=None, beam_width=8, time_limit=0.5, build_candidates=3, max_removes=2,
+                 evaluate=None, cancel=None, max_nodes=0):
+        self.ai = ai
+        self.beam_width = beam_width
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes  # 节点预算，0表示只受时间限制
+        self.build_candidates = build_candidates
+        self.max_removes = max_removes
+        self.evaluate = evaluate or evaluate_board
+        self.cancel = cancel  # threading.Event，置位后尽快返回当前最佳计划
+        self.nodes = 0
+        self.node_limit = 0
+        self._memo = {}
+
+    def _expired(self, deadline):
+        if self.node_limit and self.nodes >= self.node_limit:
+            return True
+        return time.perf_counter() > deadline or (self.cancel is not None and self.cancel.is_set())
+
+    def _phase_budget(self, share):
+        """进入下一阶段：节点预算按比例追加（前一阶段没用完的部分顺延）"""
+        if self.max_nodes:
+            self.node_limit = max(self.node_limit, self.nodes) + max(1, int(self.max_nodes * share))
+
+    def _score(self, board, player):
+        key = board.state_key()
+        score = self._memo.get(key)
+        if score is None:
+            score = self.evaluate(board, player)
+            self._memo[key] = score
+        return score
+
+    def plan(self, board, player, move_limit):
+        """返回时间预算内找到的最佳整回合计划"""
+        start = time.perf_counter()
+        self.nodes = 0
+        self._memo = {}
+        root = _Node(board.clone(), [], [], [], {0: 0, 1: 0, 2: 0}, 0)
+        root.score = self._score(root.board, player)
+
+        self.node_limit = 0
+        budgets = [self.time_limit * r for r in self.PHASE_BUDGET]
+        deadline = start + budgets[0]
+        self._phase_budget(self.PHASE_BUDGET[0])
+        leaves = self._expand_moves(root, player, move_limit, deadline)
+        deadline = max(deadline, time.perf_counter()) + budgets[1]
+        self._phase_budget(self.PHASE_BUDGET[1])
+        leaves = self._expand_builds(leaves, player, deadline)
+        deadline = max(deadline, time.perf_counter()) + budgets[2]
+        self._phase_budget(self.PHASE_BUDGET[2])
+        leaves = self._expand_removes(leaves, player, deadline)
+
+        best = max(leaves, key=lambda n: n.score)
+        plan = TurnPlan(best.moves, best.builds, best.removes, best.score)
+        plan.keys = self._phase_keys(board, player, plan)
+        return plan
+
+    def _phase_keys(self, board, player, plan):
+        """重放计划，记录建造/拆除阶段开始时的局面键"""
+        b = board.clone()
+        for sx, sy, tx, ty in plan.moves:
+            b.move_piece(sx, sy, tx, ty)
+        keys = {1: b.state_key()}
+        for x, y, build_type in plan.builds:
+            b.build_piece(x, y, player, build_type)
+        keys[2] = b.state_key()
+        return keys
+
+    def _select(self, nodes):
+        """按评分保留前beam_width个节点"""
+        nodes.sort(key=lambda n: n.score, reverse=True)
+        return nodes[:self.beam_width]
+
+    def _expand_moves(self, root, player, move_limit, deadline):
+        beam = [root]
+        finished = [root]
+        seen = {root.board.state_key()}
+        for depth in range(move_limit):
+            children = []
+            for node in beam:
+                b = node.board
+                if b.winner or b.danger[player]:
+                    continue
+                for army in b.get_player_pieces(player, PieceType.ARMY):
+                    if army.move_count >= ARMY_STEPS:
+                        continue
+                    for dx, dy in NEIGHBORS:
+                        if self._expired(deadline):
+                            return self._select(finished + children)
+                        tx, ty = army.x + dx, army.y + dy
+                        if not (0 <= tx < BOARD_SIZE and 0 <= ty < BOARD_SIZE):
+                            continue
+                        # can_move_army在吃王塔时会设置winner，检查时需还原
+                        winner = b.winner
+                        ok = b.can_move_army(army.x, army.y, tx, ty, player, depth, move_limit)
+                        b.winner = winner
+                        if not ok:
+                            continue
+                        child = b.clone()
+                        child.move_piece(army.x, army.y, tx, ty)
+                        self.nodes += 1
+                        key = child.state_key()
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        children.append(_Node(child, node.moves + [(army.x, army.y, tx, ty)], [], [],
+                                              node.counts, self._score(child, player)))
+            if not children:
+                break
+            finished.extend(children)
+            beam = self._select(children)
+        return self._select(finished)
+
+    def _build_sites(self, board, player, build_type):
+        """候选建造位置：沿用AI的位置评估，只取前几名"""
+        if self.ai is not None:
+            return self.ai.find_build_positions(board, player, build_type, self.build_candidates)
+        sites = []
+        for y in range(BOARD_SIZE):
+            for x in range(BOARD_SIZE):
+                if board.can_build(x, y, player, build_type):
+                    sites.append((x, y, build_type))
+        return sites[:self.build_candidates]
+
+    def _recovery_child(self, node, player, builds):
+        """濒危节点直接套用脱险规划（建造或拆除）得到的子节点，规划不可行时返回None"""
+        plan = plan_recovery(node.board, player, node.counts, builds=builds)
+        if plan is None:
+            return None
+        actions = plan.builds if builds else plan.removes
+        if not actions:
+            return None
+        child = node.board.clone()
+        counts = dict(node.counts)
+        for action in actions:
+            if builds:
+                x, y, build_type = action
+                if not child.can_build(x, y, player, build_type):
+                    return None
+                child.build_piece(x, y, player, build_type)
+                counts[build_type] += 1
+            else:
+                child.remove_piece(*action)
+        self.nodes += 1
+        if builds:
+            return _Node(child, node.moves, node.builds + actions, [], counts, self._score(child, player))
+        return _Node(child, node.moves, node.builds, node.removes + actions, counts, self._score(child, player))
+
+    def _expand_builds(self, leaves, player, deadline):
+        beam = [n for n in leaves if not n.board.winner]
+        finished = list(leaves)
+        seen = set()
+        # 濒危的局面先加入脱险建造的候选（单步展开未必能在束宽内找到）
+        for node in beam:
+            if node.board.danger[player]:
+                child = self._recovery_child(node, player, True)
+                if child is not None:
+                    finished.append(child)
+        for _ in range(3):
+            children = []
+            for node in beam:
+                for build_type in range(3):
+                    if not can_build_type(node.counts, build_type):
+                        continue
+                    for x, y, _t in self._build_sites(node.board, player, build_type):
+                        if self._expired(deadline):
+                            return self._select(finished + children)
+                        counts = dict(node.counts)
+                        counts[build_type] += 1
+                        child = node.board.clone()
+                        child.build_piece(x, y, player, build_type)
+                        self.nodes += 1
+                        key = (child.state_key(), tuple(sorted(counts.items())))
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        children.append(_Node(child, node.moves, node.builds + [(x, y, build_type)], [],
+                                              counts, self._score(child, player)))
+            if not children:
+                break
+            finished.extend(children)
+            beam = self._select(children)
+        return self._select(finished)
+
+    def _expand_removes(self, leaves, player, deadline):
+        beam = [n for n in leaves if not n.board.winner]
+        finished = list(leaves)
+        seen = set()
+        # 拆除可能需要超过max_removes个，濒危的局面直接加入脱险拆除的候选
+        for node in beam:
+            if node.board.danger[player]:
+                child = self._recovery_child(node, player, False)
+                if child is not None:
+                    finished.append(child)
+        for _ in range(self.max_removes):
+            children = []
+            for node in beam:
+                for p in node.board.get_player_pieces(player):
+                    if p.type == PieceType.TOWER:
+                        continue
+                    if self._expired(deadline):
+                        return finished + children
+                    child = node.board.clone()
+                    child.remove_piece(p.x, p.y)
+                    self.nodes += 1
+                    key = child.state_key()
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    score = self._score(child, player)
+                    if score <= node.score:
+                        # 拆除只用于改善局面（如解除濒危），不改善的分支直接剪掉
+                        continue
+                    children.append(_Node(child, node.moves, node.builds, node.removes + [(p.x, p.y)],
+                                          node.counts, score))
+            if not children:
+                break
+            finished.extend(children)
+            beam = self._select(children)
+        return finished
@@ -0,0 +1,141 @@
+import copy
+import threading
+import traceback
+from ai import AIPlayer
+from board import can_build_type
+
+# 预测人类玩家剩余回合所用的AI配置，覆盖“直接结束”之外几种常见走法
+PREDICTORS = [
+    {'difficulty': 'normal', 'search': 'greedy', 'seed': 0},
+    {'difficulty': 'hard', 'search': 'greedy'},
+    {'difficulty': 'hard', 'time_limit': 0.1},
+]
+
+
+class _Entry:
+    """一条预测：人类回合的推演路径与AI对结果局面的应对"""
+    __slots__ = ('path', 'actions')
+
+    def __init__(self, path, actions):
+        self.path = path  # 推演过程中经过的局面键
+        self.actions = actions
+
+
+class Ponderer:
+    """后台预读：在人类回合推演对方可能的走法，并提前算好AI的应对
+
+    主线程在局面变化时调用update提交快照；后台线程补全人类本回合的剩余动作，
+    再为每个结果局面计算AI整回合动作，按AI回合开始时的局面键存表。
+    人类每走一步，推演路径不经过当前局面的条目被丢弃，经过的保留。
+    AI回合开始时用take查表，命中则无需再算。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.table = {}  # AI回合开始局面键 -> _Entry
+        self.snapshot = None
+        self.version = 0
+        self.thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, board, human, ai, step, move_used, build_counts):
+        """提交人类回合中的最新局面（board需为副本）"""
+        key = board.state_key()
+        with self.lock:
+            # 保留推演路径经过当前局面的工作，其余丢弃
+            self.table = {k: e for k, e in self.table.items() if key in e.path}
+            self.version += 1
+            self.snapshot = (self.version, board, human, copy.copy(ai), step, move_used, dict(build_counts))
+            self.wakeup.notify()
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """停止推演（AI回合开始或对局重置时调用）"""
+        with self.lock:
+            self.version += 1
+            self.snapshot = None
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.snapshot = None
+            self.table = {}
+
+    def take(self, board):
+        """查表取出AI在当前局面的应对，未命中返回None"""
+        key = board.state_key()
+        with self.lock:
+            entry = self.table.pop(key, None)
+            self.table = {}
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(entry.actions)
+
+    def _current(self, version):
+        return self.version == version
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while self.snapshot is None:
+                    self.wakeup.wait()
+                snapshot = self.snapshot
+                self.snapshot = None
+            try:
+                self._ponder(*snapshot)
+            except Exception:
+                traceback.print_exc()
+
+    def _ponder(self, version, board, human, ai, step, move_used, build_counts):
+        ai.plan = None
+        ai_side = 3 - human
+        # 先考虑人类直接结束回合，再考虑各预测器补全的回合
+        candidates = [None] + PREDICTORS
+        for predictor in candidates:
+            if not self._current(version):
+                return
+            b = board.clone()
+            path = [board.state_key()]
+            if predictor is not None:
+                self._complete_turn(b, human, AIPlayer(**predictor), step, move_used, build_counts, path)
+                if b.winner:
+                    continue
+            # 与Game.next_turn一致：AI回合开始时重置其移动计数
+            b.reset_move_count(ai_side)
+            key = b.state_key()
+            with self.lock:
+                if not self._current(version):
+                    return
+                if key in self.table:
+                    # 不同走法到达同一局面：合并推演路径，应对只算一次
+                    self.table[key].path.extend(path)
+                    continue
+            actions = ai.play_turn(b.clone(), ai_side)
+            with self.lock:
+                if self._current(version):
+                    self.table[key] = _Entry(path + [key], actions)
+
+    def _complete_turn(self, board, player, predictor, step, move_used, build_counts, path):
+        """用预测器补全人类本回合剩余的阶段，记录途经的局面键"""
+        if step == 0:
+            move_limit = board.get_move_limit(player)
+            for sx, sy, tx, ty in predictor.choose_move(board, player, max(0, move_limit - move_used)):
+                board.move_piece(sx, sy, tx, ty)
+                path.append(board.state_key())
+            build_counts = {0: 0, 1: 0, 2: 0}
+        if step <= 1:
+            counts = dict(build_counts)
+            for x, y, build_type in predictor.choose_build(board, player):
+                if can_build_type(counts, build_type) and board.can_build(x, y, player, build_type):
+                    board.build_piece(x, y, player, build_type)
+                    counts[build_type] += 1
+                    path.append(board.state_key())
+        for x, y in predictor.choose_remove(board, player):
+            if board.can_remove(x, y, player):
+                board.remove_piece(x, y)
+                path.append(board.state_key())
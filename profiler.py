@@ -0,0 +1,147 @@
+import csv
+import threading
+import time
+from collections import deque
+
+FRAME_WINDOW = 300  # 保留最近多少帧的记录（30帧/秒约10秒）
+WAIT_STAGE = 'wait'  # 阻塞等待事件与帧率限制的睡眠，不算作忙碌时间
+# 界面所用棋盘上被计时的变更方法
+BOARD_METHODS = ('move_piece', 'build_piece', 'remove_piece', 'update_all_status')
+
+
+def percentile(values, q):
+    """values已排序，取第q分位（最近秩）"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class _Stage:
+    """with profiler.stage(名称): 的计时块"""
+    __slots__ = ('profiler', 'name', 'started')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = self.profiler.begin(self.name)
+
+    def __exit__(self, *exc):
+        if self.started:
+            self.profiler.end()
+
+
+class FrameProfiler:
+    """客户端帧耗时统计
+
+    主循环每帧开始时调用frame()；各阶段用 with profiler.stage(名称): 或 begin()/end() 计时。
+    嵌套的阶段只计自身的时间（进入子阶段时父阶段暂停），所以各阶段之和加上未计时的部分等于整帧耗时。
+    只统计主线程，其他线程（如网络线程改动棋盘）进入计时块时直接跳过。
+    """
+
+    def __init__(self, window=FRAME_WINDOW):
+        self.frames = deque(maxlen=window)  # [(整帧耗时, {阶段: 耗时})]，单位秒
+        self.stages = []  # 出现过的阶段名，按首次出现的顺序
+        self.current = {}
+        self.stack = []  # [[阶段名, 本段开始时间]]
+        self.frame_start = None
+        self.thread_id = threading.get_ident()
+        self.visible = False  # 是否显示性能面板
+
+    def frame(self):
+        """结束上一帧的记录，开始新的一帧"""
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frames.append((now - self.frame_start, self.current))
+        self.current = {}
+        self.stack = []
+        self.frame_start = now
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def begin(self, name):
+        """开始计时一个阶段，返回是否真的开始（非主线程或尚未开始记帧时不计）"""
+        if self.frame_start is None or threading.get_ident() != self.thread_id:
+            return False
+        now = time.perf_counter()
+        if self.stack:
+            self._add(self.stack[-1], now)
+        self.stack.append([name, now])
+        return True
+
+    def end(self):
+        now = time.perf_counter()
+        if not self.stack:
+            return
+        self._add(self.stack.pop(), now)
+        if self.stack:
+            self.stack[-1][1] = now  # 父阶段从现在继续计时
+
+    def _add(self, entry, now):
+        name, start = entry
+        if name not in self.current:
+            self.current[name] = 0.0
+            if name not in self.stages:
+                self.stages.append(name)
+        self.current[name] += now - start
+
+    def instrument(self, board, methods=BOARD_METHODS):
+        """给界面所用的棋盘套上计时（只包装这个实例，AI推演用的副本不受影响）"""
+        for name in methods:
+            if name in board.__dict__:
+                continue  # 已经包装过
+            setattr(board, name, self._timed('board.' + name, getattr(board, name)))
+
+    def _timed(self, label, method):
+        def timed(*args, **kwargs):
+            with self.stage(label):
+                return method(*args, **kwargs)
+        return timed
+
+    def summary(self):
+        """最近各帧的统计，时间单位毫秒：
+        {'frames', 'fps', 'last', 'p50', 'p99', 'stages': [(阶段名, 平均, 最大)]}
+        last/p50/p99是忙碌时间（整帧减去等待），阶段按平均耗时从大到小排列
+        """
+        frames = list(self.frames)
+        busy = sorted((total - stages.get(WAIT_STAGE, 0.0)) * 1000 for total, stages in frames)
+        elapsed = sum(total for total, _ in frames)
+        rows = []
+        for name in self.stages:
+            times = [stages.get(name, 0.0) * 1000 for _, stages in frames]
+            if times:
+                rows.append((name, sum(times) / len(times), max(times)))
+        rows.sort(key=lambda row: -row[1])
+        last = frames[-1] if frames else None
+        return {
+            'frames': len(frames),
+            'fps': len(frames) / elapsed if elapsed else 0.0,
+            'last': (last[0] - last[1].get(WAIT_STAGE, 0.0)) * 1000 if last else 0.0,
+            'p50': percentile(busy, 0.5),
+            'p99': percentile(busy, 0.99),
+            'stages': rows,
+        }
+
+    def lines(self, max_stages=8):
+        """性能面板显示的文字"""
+        s = self.summary()
+        lines = [f"帧耗时 {s['last']:.1f}ms  {s['fps']:.0f}帧/秒",
+                 f"p50 {s['p50']:.1f}ms  p99 {s['p99']:.1f}ms  ({s['frames']}帧)"]
+        for name, average, peak in s['stages'][:max_stages]:
+            lines.append(f"{name:<22}{average:6.2f} /{peak:6.1f}ms")
+        return lines
+
+    def dump_csv(self, path=None):
+        """把最近各帧的各阶段耗时（毫秒）写成CSV，返回文件路径"""
+        if path is None:
+            path = time.strftime('profile_%Y%m%d_%H%M%S.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'total_ms', 'busy_ms'] + self.stages)
+            for i, (total, stages) in enumerate(self.frames):
+                busy = total - stages.get(WAIT_STAGE, 0.0)
+                writer.writerow([i, f'{total * 1000:.3f}', f'{busy * 1000:.3f}'] +
+                                [f'{stages.get(name, 0.0) * 1000:.3f}' for name in self.stages])
+        return path
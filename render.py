@@ -0,0 +1,218 @@
+from collections import OrderedDict
+import pygame
+from board import LAND, WATER
+from piece import PieceType, Player
+
+# 地形颜色（山脉为其他）与格子边框
+TERRAIN_COLORS = {LAND: (180, 220, 180), WATER: (120, 180, 220)}
+MOUNTAIN_COLOR = (150, 150, 150)
+GRID_LINE_COLOR = (80, 80, 80)
+# 势力范围底色（半透明）
+INFLUENCE_COLORS = {1: (255, 220, 220, 80), 2: (180, 200, 255, 80)}
+# 棋子颜色：(白方, 黑方)
+PIECE_COLORS = {
+    PieceType.ARMY: ((220, 60, 60), (60, 60, 220)),
+    PieceType.FARM: ((200, 220, 80), (80, 200, 120)),
+    PieceType.INDUSTRY: ((180, 180, 180), (220, 140, 60)),
+    PieceType.TOWER: ((255, 255, 255), (0, 0, 0)),
+}
+ATLAS_CACHE_SIZE = 4  # 最多同时保留几种格子大小的图集
+
+
+class DirtyRenderer:
+    """脏矩形渲染器
+
+    每帧由界面各部分上报自己占据的矩形和决定其外观的状态键：棋盘按格子上报，
+    面板、按钮、弹窗按区域上报。与上一帧比较后只在变化的矩形内重画（用set_clip裁剪），
+    并只把这些矩形推送到屏幕（pygame.display.update）；画面不变时既不重画也不推送。
+    状态键必须覆盖影响该矩形内像素的全部状态，否则画面会残留旧内容。
+    """
+
+    def __init__(self, screen, background=(220, 220, 220)):
+        self.screen = screen
+        self.background = background
+        self.regions = {}  # 区域名 -> (矩形, 状态键)
+        self.reported = {}  # 本帧上报的区域
+        self.cells = None  # (棋盘原点, 格子大小, {(x, y): 状态键})
+        self.dirty = []
+        self.full = True
+        self.updated = []  # 上一次重画推送的矩形
+        self.frames = 0  # 实际重画的帧数
+        self.skipped = 0  # 画面不变而跳过的帧数
+
+    def reset(self, screen=None):
+        """窗口大小变化或被遮挡后需要整屏重画"""
+        if screen is not None:
+            self.screen = screen
+        self.regions = {}
+        self.cells = None
+        self.full = True
+
+    def region(self, name, rect, key):
+        """上报一个区域；rect为None表示本帧不显示（上一帧的位置会被擦除）"""
+        rect = pygame.Rect(rect) if rect is not None else None
+        old = self.regions.get(name)
+        if old is None or old[1] != key or old[0] != rect:
+            if old is not None and old[0] is not None:
+                self.dirty.append(old[0])
+            if rect is not None:
+                self.dirty.append(rect)
+        self.reported[name] = (rect, key)
+
+    def grid(self, origin, tile_size, keys):
+        """上报棋盘所有格子的状态键{(x, y): 键}，只有键变化的格子变脏；棋盘位置或大小变化时整块变脏"""
+        ox, oy = origin
+        if self.cells is None or self.cells[0] != origin or self.cells[1] != tile_size:
+            if self.cells is not None:
+                self.dirty.append(self._board_rect(*self.cells))
+            self.dirty.append(self._board_rect(origin, tile_size, keys))
+        else:
+            old = self.cells[2]
+            for cell, key in keys.items():
+                if old.get(cell) != key:
+                    x, y = cell
+                    self.dirty.append(pygame.Rect(ox + x * tile_size, oy + y * tile_size, tile_size, tile_size))
+        self.cells = (origin, tile_size, keys)
+
+    def _board_rect(self, origin, tile_size, keys):
+        width = (max(x for x, _ in keys) + 1) * tile_size if keys else 0
+        height = (max(y for _, y in keys) + 1) * tile_size if keys else 0
+        return pygame.Rect(origin[0], origin[1], width, height)
+
+    def present(self, draw):
+        """按本帧上报的结果重画变脏的矩形并推送，返回本帧是否重画"""
+        for name, (rect, _) in self.regions.items():
+            if name not in self.reported and rect is not None:
+                self.dirty.append(rect)  # 本帧没有上报的区域视为消失
+        self.regions = self.reported
+        self.reported = {}
+        if not self.full:
+            bounds = self.screen.get_rect()
+            self.dirty = [r.clip(bounds) for r in self.dirty]
+            self.dirty = [r for r in self.dirty if r.width and r.height]
+            if not self.dirty:
+                self.skipped += 1
+                return False
+        self.frames += 1
+        if self.full:
+            self.screen.fill(self.background)
+            draw()
+            pygame.display.flip()
+            self.updated = [self.screen.get_rect()]
+        else:
+            # 裁剪到所有脏矩形的外接矩形内整体重画一次，只推送各个脏矩形
+            self.screen.set_clip(self.dirty[0].unionall(self.dirty[1:]))
+            self.screen.fill(self.background)
+            draw()
+            self.screen.set_clip(None)
+            pygame.display.update(self.dirty)
+            self.updated = self.dirty
+        self.dirty = []
+        self.full = False
+        return True
+
+
+class TextCache:
+    """渲染好的文字表面缓存
+
+    键为(字体, 文字, 颜色, 抗锯齿)，按最近使用淘汰（LRU），按表面占用的字节数计量总大小。
+    返回的表面是共享的，调用方只能blit，不能修改。
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        size = surface.get_pitch() * surface.get_height()
+        if size > self.max_bytes:
+            return surface  # 比整个缓存还大的不缓存
+        self.entries[key] = surface
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= old.get_pitch() * old.get_height()
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+
+def draw_piece(surface, piece_type, color, px, py, tile_size):
+    """以(px, py)为中心画一个棋子"""
+    if piece_type == PieceType.ARMY:
+        points = [
+            (px, py-int(tile_size*0.3)),
+            (px-int(tile_size*0.25), py+int(tile_size*0.2)),
+            (px+int(tile_size*0.25), py+int(tile_size*0.2))
+        ]
+        pygame.draw.polygon(surface, color, points)
+    elif piece_type == PieceType.FARM:
+        pygame.draw.circle(surface, color, (px, py), int(tile_size*0.27))
+    elif piece_type == PieceType.INDUSTRY:
+        pygame.draw.rect(surface, color, (px-int(tile_size*0.27), py-int(tile_size*0.27), int(tile_size*0.54), int(tile_size*0.54)))
+    elif piece_type == PieceType.TOWER:
+        pygame.draw.rect(surface, color, (px-int(tile_size*0.2), py-int(tile_size*0.2), int(tile_size*0.4), int(tile_size*0.4)))
+
+
+class SpriteAtlas:
+    """某个格子大小下预先画好的图块：地形、势力范围底色、四种棋子×两方，排成一行放在同一张表面上
+
+    绘制时用Surface.blits一次批量贴图，代替每帧逐个计算多边形顶点、调用pygame.draw。
+    """
+
+    def __init__(self, tile_size):
+        self.tile_size = tile_size
+        keys = [('terrain', t) for t in (LAND, WATER, None)]
+        keys += [('influence', player) for player in (1, 2)]
+        keys += [(piece_type, player) for piece_type in PIECE_COLORS for player in (Player.WHITE, Player.BLACK)]
+        self.surface = pygame.Surface((tile_size * len(keys), tile_size), pygame.SRCALPHA)
+        self.rects = {}
+        for i, key in enumerate(keys):
+            rect = pygame.Rect(i * tile_size, 0, tile_size, tile_size)
+            self.rects[key] = rect
+            kind, value = key
+            if kind == 'terrain':
+                self.surface.fill(TERRAIN_COLORS.get(value, MOUNTAIN_COLOR), rect)
+                pygame.draw.rect(self.surface, GRID_LINE_COLOR, rect, 1)
+            elif kind == 'influence':
+                self.surface.fill(INFLUENCE_COLORS[value], rect)
+            else:
+                color = PIECE_COLORS[kind][0 if value == Player.WHITE else 1]
+                draw_piece(self.surface, kind, color, rect.x + tile_size//2, tile_size//2, tile_size)
+        # 山脉等其他地形共用一个图块
+        self.terrain_other = self.rects[('terrain', None)]
+
+    def terrain(self, terrain):
+        return self.rects.get(('terrain', terrain), self.terrain_other)
+
+    def draw(self, screen, items):
+        """items为[(图块矩形, 目标左上角)]，一次blits画完"""
+        screen.blits([(self.surface, dest, area) for area, dest in items], doreturn=False)
+
+
+_atlases = OrderedDict()  # 格子大小 -> SpriteAtlas
+
+
+def sprite_atlas(tile_size):
+    """取某个格子大小的图集；只在格子大小变化（窗口缩放）时重新生成"""
+    atlas = _atlases.get(tile_size)
+    if atlas is None:
+        atlas = _atlases[tile_size] = SpriteAtlas(tile_size)
+        while len(_atlases) > ATLAS_CACHE_SIZE:
+            _atlases.popitem(last=False)
+    else:
+        _atlases.move_to_end(tile_size)
+    return atlas
@@ -2,12 +2,27 @@ import asyncio
 import websockets
 import json
 import logging
-from typing import Dict, List, Set, Any
+import threading
+import zlib
+from collections import deque
+from typing import Dict, List, Set, Any, Optional
+from ai import DIFFICULTY_LEVELS
+from bot_pool import BotPool, BotBusy, board_from_state
+from sync import SyncState, SYNC_WINDOW, board_cells
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class BotSeat:
+    """机器人座位：占据玩家列表中ws的位置，发给它的消息直接丢弃"""
+    def __init__(self, difficulty: str, seed: int = 0):
+        self.difficulty = difficulty
+        self.seed = seed
+
+    async def send(self, message: str):
+        pass
+
 class GameRoom:
     def __init__(self, room_id: str, host_name: str):
         self.room_id = room_id
@@ -18,10 +33,14 @@ class GameRoom:
         self.game_started = False
         self.host_side = 1  # 房主默认执白方
         # 新增：游戏状态
-        self.game_state = None  # 游戏状态数据
+        self.sync: Optional[SyncState] = None  # 带序号的最新局面，开局时由init_state建立
+        self.deltas = deque(maxlen=SYNC_WINDOW)  # 最近的增量，供漏收的客户端补发
         self.current_player = 1  # 当前轮到谁
         self.game_step = 0  # 当前阶段：0=行军, 1=建造, 2=拆除
         self.init_state = None  # 新增，初始地图和棋盘
+        self.board = None  # 有机器人时服务器维护的无界面棋盘
+        self.turn = 0  # 已结束的回合数
+        self.bot_task = None  # 正在进行的机器人回合
         
     def add_player(self, name: str, websocket: Any):
         if len(self.players) >= self.max_players:
@@ -62,6 +81,16 @@ class GameRoom:
                 except Exception as e:
                     logger.error(f"发送消息失败: {e}")
     
+    def get_bot(self) -> Optional[Dict[str, Any]]:
+        """房间内的机器人玩家，没有则返回None"""
+        for player in self.players:
+            if isinstance(player["ws"], BotSeat):
+                return player
+        return None
+
+    def has_humans(self):
+        return any(not isinstance(p["ws"], BotSeat) for p in self.players)
+
     def get_player_by_ws(self, websocket: Any):
         """根据websocket获取玩家信息"""
         for player in self.players:
@@ -70,9 +99,10 @@ class GameRoom:
         return None
 
 class GameServer:
-    def __init__(self):
+    def __init__(self, bot_pool: Optional[BotPool] = None):
         self.rooms: Dict[str, GameRoom] = {}
         self.websocket_to_room: Dict[Any, str] = {}
+        self.bots = bot_pool or BotPool()
     
     async def handle_client(self, websocket: Any, path: str):
         """处理客户端连接"""
@@ -97,10 +127,16 @@ class GameServer:
                         await self.handle_game_action(websocket, data)
                     elif msg_type == "ready":
                         await self.handle_ready(websocket, data)
-                    elif msg_type == "game_state_sync":
-                        await self.handle_game_state_sync(websocket, data)
+                    elif msg_type == "state_delta":
+                        await self.handle_state_delta(websocket, data)
+                    elif msg_type == "resync_request":
+                        await self.handle_resync_request(websocket, data)
                     elif msg_type == "init_state_sync":
                         await self.handle_init_state_sync(websocket, data)
+                    elif msg_type == "request_bot":
+                        await self.handle_request_bot(websocket, data)
+                    elif msg_type == "bot_metrics":
+                        await websocket.send(json.dumps({"type": "bot_metrics", "metrics": self.bots.metrics()}))
                     else:
                         logger.warning(f"未知消息类型: {msg_type} from {client_addr}")
                         
@@ -221,6 +257,9 @@ class GameServer:
             }))
             
             logger.info(f"房间 {room_id} 游戏开始")
+            
+            if room.get_bot():
+                self.start_bot_game(room)
     
     async def handle_game_action(self, websocket: Any, data: Dict[str, Any]):
         """处理游戏动作（移动、建造、拆除等）"""
@@ -247,24 +286,40 @@ class GameServer:
         action_type = data.get("action_type")
         action_data = data.get("action_data", {})
         
+        self.apply_action(room, player["side"], action_type, action_data, exclude_ws=websocket)
+        
+        logger.info(f"房间 {room_id} 玩家 {player['name']} 执行动作: {action_type}")
+    
+    def apply_action(self, room: GameRoom, side: int, action_type: str, action_data: Dict[str, Any],
+                     exclude_ws: Any = None):
+        """广播一个游戏动作并推进房间状态（人类玩家与机器人共用）"""
         # 广播游戏动作给其他玩家
         broadcast_msg = {
             "type": "game_action",
-            "player_side": player["side"],
+            "player_side": side,
             "action_type": action_type,
             "action_data": action_data
         }
         
-        room.broadcast(json.dumps(broadcast_msg), exclude_ws=websocket)
+        room.broadcast(json.dumps(broadcast_msg), exclude_ws=exclude_ws)
+        
+        # 有机器人的房间同步维护服务器端棋盘
+        if room.board is not None:
+            self.apply_to_board(room.board, side, action_type, action_data)
         
+        if action_type == "skip_phase":
+            to_step = action_data.get("to_step")
+            if to_step in (0, 1, 2):
+                room.game_step = to_step
         # 处理特殊动作（如回合结束）
-        if action_type == "end_turn":
+        elif action_type == "end_turn":
             # 切换到下一个玩家或下一个阶段
             if room.game_step < 2:  # 0=行军, 1=建造, 2=拆除
                 room.game_step += 1
             else:
                 room.game_step = 0
                 room.current_player = 3 - room.current_player  # 切换玩家
+                room.turn += 1
             
             # 广播回合更新
             room.broadcast(json.dumps({
@@ -272,27 +327,176 @@ class GameServer:
                 "current_player": room.current_player,
                 "game_step": room.game_step
             }))
-        
-        logger.info(f"房间 {room_id} 玩家 {player['name']} 执行动作: {action_type}")
+            
+            bot = room.get_bot()
+            if bot and bot["side"] == room.current_player and room.game_step == 0:
+                self.schedule_bot_turn(room)
+    
+    def apply_to_board(self, board, side: int, action_type: str, action_data: Dict[str, Any]):
+        """在服务器端棋盘上执行动作（与客户端handle_remote_action一致）"""
+        if action_type == "move":
+            from_pos, to_pos = action_data.get("from"), action_data.get("to")
+            if from_pos and to_pos:
+                board.move_piece(from_pos[0], from_pos[1], to_pos[0], to_pos[1])
+        elif action_type == "build":
+            x, y, build_type = action_data.get("x"), action_data.get("y"), action_data.get("build_type")
+            if x is not None and y is not None and build_type is not None:
+                board.build_piece(x, y, side, build_type)
+        elif action_type == "remove":
+            x, y = action_data.get("x"), action_data.get("y")
+            if x is not None and y is not None:
+                board.remove_piece(x, y)
     
-    async def handle_game_state_sync(self, websocket: Any, data: Dict[str, Any]):
-        """处理游戏状态同步"""
+    async def handle_request_bot(self, websocket: Any, data: Dict[str, Any]):
+        """房主请求服务器机器人作为对手"""
         room_id = self.websocket_to_room.get(websocket)
         if not room_id or room_id not in self.rooms:
             return
         
         room = self.rooms[room_id]
-        if not room.game_started:
+        difficulty = data.get("difficulty", "normal")
+        error_msg = None
+        if difficulty not in DIFFICULTY_LEVELS:
+            error_msg = f"未知的AI难度: {difficulty}"
+        elif not room.players or room.players[0]["ws"] != websocket:
+            error_msg = "只有房主可以添加机器人"
+        elif len(room.players) >= room.max_players or room.game_started:
+            error_msg = "房间已满"
+        if error_msg:
+            await websocket.send(json.dumps({"type": "error", "msg": error_msg}))
             return
         
-        # 更新房间的游戏状态
-        room.game_state = data.get("game_state")
+        # 种子取房间号的CRC：str的hash每次启动都不同，服务器重启后同一房间的机器人对局无法重现
+        seat = BotSeat(difficulty, seed=zlib.crc32(room_id.encode()) & 0xffff)
+        room.players.append({
+            "name": f"AI({difficulty})",
+            "side": 3 - room.host_side,
+            "ws": seat
+        })
+        room.ready[seat] = True
         
-        # 广播给其他玩家
         room.broadcast(json.dumps({
-            "type": "game_state_sync",
-            "game_state": room.game_state
-        }), exclude_ws=websocket)
+            "type": "player_update",
+            "names": room.get_player_names(),
+            "side": room.host_side
+        }))
+        room.broadcast(json.dumps({
+            "type": "ready_update",
+            "ready": [room.ready.get(p["ws"], False) for p in room.players],
+            "names": room.get_player_names()
+        }))
+        logger.info(f"房间 {room_id} 加入机器人: {difficulty}")
+    
+    def start_bot_game(self, room: GameRoom):
+        """开局时根据房主同步的初始局面建立服务器端棋盘"""
+        if not room.init_state:
+            logger.error(f"房间 {room.room_id} 缺少初始局面，机器人无法对局")
+            return
+        room.board = board_from_state(room.init_state)
+        room.turn = 0
+        bot = room.get_bot()
+        if bot["side"] == room.current_player:
+            self.schedule_bot_turn(room)
+    
+    def schedule_bot_turn(self, room: GameRoom):
+        room.bot_task = asyncio.create_task(self.run_bot_turn(room))
+    
+    async def run_bot_turn(self, room: GameRoom):
+        """在进程池中计算机器人的整回合，再按人类客户端的消息格式逐个广播"""
+        bot = room.get_bot()
+        if not bot or room.board is None or room.board.winner:
+            return
+        side = bot["side"]
+        seat = bot["ws"]
+        try:
+            result = await self.bots.think(seat.difficulty, room.board, side, seed=seat.seed + room.turn)
+        except BotBusy as e:
+            logger.warning(f"房间 {room.room_id} 机器人排队已满: {e}")
+            room.broadcast(json.dumps({"type": "error", "msg": "服务器繁忙，机器人暂时无法行动"}))
+            return
+        except Exception as e:
+            logger.error(f"房间 {room.room_id} 机器人计算失败: {e}")
+            return
+        # 计算期间房间可能已解散
+        if self.rooms.get(room.room_id) is not room or room.get_bot() is not bot:
+            return
+        logger.info(f"房间 {room.room_id} 机器人思考 {result['think_ms']:.0f}ms "
+                    f"(排队 {result['queue_ms']:.0f}ms, 节点 {result['nodes']})")
+        
+        room.board.reset_move_count(side)
+        step = 0
+        for kind, args in result["actions"]:
+            if kind == "move":
+                sx, sy, tx, ty = args
+                action_data = {"from": [sx, sy], "to": [tx, ty]}
+                to_step = 0
+            elif kind == "build":
+                x, y, build_type = args
+                action_data = {"x": x, "y": y, "build_type": build_type}
+                to_step = 1
+            else:
+                x, y = args
+                action_data = {"x": x, "y": y}
+                to_step = 2
+            while step < to_step:
+                self.apply_action(room, side, "skip_phase", {"from_step": step, "to_step": step + 1})
+                step += 1
+            self.apply_action(room, side, kind, action_data)
+        # 增量在回合结束之前发出，人类玩家开始行动时已经同步到机器人走完的局面
+        self.publish_board_state(room)
+        if room.board.winner:
+            return
+        while step < 2:
+            self.apply_action(room, side, "skip_phase", {"from_step": step, "to_step": step + 1})
+            step += 1
+        self.apply_action(room, side, "end_turn", {})
+    
+    async def handle_state_delta(self, websocket: Any, data: Dict[str, Any]):
+        """行动方发来的局面增量：接在最新序号之后的记入窗口并转发，基于旧序号的回给发送方完整快照"""
+        room_id = self.websocket_to_room.get(websocket)
+        if not room_id or room_id not in self.rooms:
+            return
+        
+        room = self.rooms[room_id]
+        if not room.game_started or room.sync is None or not room.get_player_by_ws(websocket):
+            return
+        
+        delta = data.get("delta") or {}
+        if not room.sync.apply(delta):
+            logger.info(f"房间 {room_id} 收到过期的增量 {delta.get('base')}->{delta.get('seq')}，"
+                        f"当前序号 {room.sync.seq}，发回快照")
+            await websocket.send(json.dumps({"type": "state_snapshot", "snapshot": room.sync.snapshot()}))
+            return
+        room.deltas.append(delta)
+        room.broadcast(json.dumps({"type": "state_delta", "delta": delta}), exclude_ws=websocket)
+    
+    async def handle_resync_request(self, websocket: Any, data: Dict[str, Any]):
+        """客户端发现漏收增量：窗口内还有的补发增量，否则发送完整快照"""
+        room_id = self.websocket_to_room.get(websocket)
+        if not room_id or room_id not in self.rooms:
+            return
+        
+        room = self.rooms[room_id]
+        if room.sync is None:
+            return
+        since = data.get("since", -1)
+        missed = [d for d in room.deltas if d["seq"] > since]
+        if since == room.sync.seq:
+            return
+        if missed and missed[0]["base"] == since:
+            for delta in missed:
+                await websocket.send(json.dumps({"type": "state_delta", "delta": delta}))
+        else:
+            await websocket.send(json.dumps({"type": "state_snapshot", "snapshot": room.sync.snapshot()}))
+    
+    def publish_board_state(self, room: GameRoom):
+        """服务器棋盘（机器人对局）有变化时生成增量并广播"""
+        if room.sync is None or room.board is None:
+            return
+        delta = room.sync.diff(board_cells(room.board), {"winner": room.board.winner})
+        if delta:
+            room.deltas.append(delta)
+            room.broadcast(json.dumps({"type": "state_delta", "delta": delta}))
     
     async def handle_start_game(self, websocket: Any, data: Dict[str, Any]):
         """处理开始游戏请求（保留兼容性）"""
@@ -322,6 +526,9 @@ class GameServer:
         # 只允许房主同步
         if room.players and room.players[0]["ws"] == websocket:
             room.init_state = data.get("init_state")
+            if not room.game_started:
+                room.sync = SyncState.from_init_state(room.init_state or {})
+                room.deltas.clear()
             # 广播给所有玩家
             for p in room.players:
                 try:
@@ -342,7 +549,9 @@ class GameServer:
             if player:
                 logger.info(f"玩家 {player['name']} 离开房间 {room_id}")
                 
-                if len(room.players) == 0:
+                if not room.has_humans():
+                    if room.bot_task:
+                        room.bot_task.cancel()
                     del self.rooms[room_id]
                     logger.info(f"删除空房间: {room_id}")
                 else:
@@ -354,6 +563,77 @@ class GameServer:
         if websocket in self.websocket_to_room:
             del self.websocket_to_room[websocket]
 
+class EmbeddedServer:
+    """在客户端进程的后台线程里运行GameServer（创建房间时免去启动子进程和等待）
+
+    后台线程有自己的asyncio事件循环；端口绑定成功后通过threading.Event通知start返回，
+    不必固定睡眠再探测端口。port为0时由系统分配空闲端口，实际端口见self.port。
+    """
+    def __init__(self, host: str = "localhost", port: int = 8765, bot_pool: Optional[BotPool] = None):
+        self.host = host
+        self.port = port
+        self.server = GameServer(bot_pool)
+        self.thread: Optional[threading.Thread] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stopping: Optional[asyncio.Event] = None
+        self.ready = threading.Event()
+        self.error: Optional[BaseException] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 5.0) -> int:
+        """启动后台线程并等待端口绑定完成，返回实际端口；绑定失败时抛出原来的异常"""
+        self.thread = threading.Thread(target=self._run, name="embedded-server", daemon=True)
+        self.thread.start()
+        if not self.ready.wait(timeout):
+            self.stop()
+            raise TimeoutError(f"服务器在 {timeout} 秒内未就绪")
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+        return self.port
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.ready.set()  # 启动失败时也要让start返回
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+
+        async def handler(websocket):
+            await self.server.handle_client(websocket, "")
+
+        try:
+            # 关闭时不久等对方回应关闭握手，退出游戏不会因此卡住
+            async with websockets.serve(handler, self.host, self.port, close_timeout=1) as ws_server:
+                self.port = ws_server.sockets[0].getsockname()[1]
+                logger.info(f"内嵌服务器已启动: {self.url}")
+                self.ready.set()
+                await self.stopping.wait()
+        finally:
+            self.server.bots.shutdown()
+        logger.info("内嵌服务器已停止")
+
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self, timeout: float = 5.0):
+        """关闭监听与所有连接并等待后台线程退出，可重复调用"""
+        if self.loop is not None and self.stopping is not None and self.running():
+            try:
+                self.loop.call_soon_threadsafe(self.stopping.set)
+            except RuntimeError:
+                pass  # 事件循环已经关闭
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
 async def main():
     """启动服务器"""
     server = GameServer()
@@ -372,8 +652,11 @@ async def main():
     async def handler(websocket):
         await server.handle_client(websocket, "")
     
-    async with websockets.serve(handler, host, port):
-        await asyncio.Future()  # 保持服务器运行
+    try:
+        async with websockets.serve(handler, host, port):
+            await asyncio.Future()  # 保持服务器运行
+    finally:
+        server.bots.shutdown()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,123 @@
+from piece import Piece, PieceType, Player
+
+SYNC_WINDOW = 64  # 服务器保留最近多少条增量，落后更多的客户端改发完整快照
+# 随增量同步的计数器及开局时的值（当前玩家与阶段由服务器的turn_update决定，不在此列）
+START_COUNTERS = {"move_used": 0, "build_counts": [0, 0, 0], "winner": None}
+
+
+def board_cells(board):
+    """棋盘上的棋子按格子索引：{(x, y): (类型值, 玩家值, 移动计数)}"""
+    return {(p.x, p.y): (p.type.value, p.player.value, p.move_count) for p in board.pieces}
+
+
+class SyncState:
+    """带序号的对局状态：各格子上的棋子与计数器，用于网络对战的增量同步
+
+    每次状态变化序号加一，生成的增量只含变化的部分：
+    {"seq": 新序号, "base": 旧序号, "set": [[x, y, 类型, 玩家, 移动计数]], "clear": [[x, y]], "counters": {名称: 值}}
+    增量必须按序号顺序应用，base与本地序号不一致说明漏收了消息，应向服务器请求重新同步。
+    """
+
+    def __init__(self, cells=None, counters=None, seq=0, grid=None):
+        self.cells = dict(cells or {})
+        self.counters = dict(START_COUNTERS if counters is None else counters)
+        self.seq = seq
+        self.grid = grid
+
+    @classmethod
+    def from_board(cls, board, counters=None, seq=0):
+        return cls(board_cells(board), counters, seq, board.grid)
+
+    @classmethod
+    def from_init_state(cls, state):
+        """由开局时同步的init_state（格式见Game.export_init_state）建立序号为0的状态"""
+        cells = {(p["x"], p["y"]): (p["type"], p["player"], 0) for p in state.get("pieces", [])}
+        return cls(cells, None, 0, state.get("grid"))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        cells = {(x, y): (t, p, moves) for x, y, t, p, moves in snapshot.get("pieces", [])}
+        return cls(cells, snapshot.get("counters"), snapshot.get("seq", 0), snapshot.get("grid"))
+
+    def snapshot(self):
+        """完整快照，客户端漏收的增量超出服务器保留范围时发送"""
+        return {
+            "seq": self.seq,
+            "grid": self.grid,
+            "pieces": [[x, y] + list(value) for (x, y), value in self.cells.items()],
+            "counters": dict(self.counters),
+        }
+
+    def diff(self, cells, counters=None):
+        """与给定的格子、计数器比较：有变化时生成增量并前进到该状态，没有变化时返回None"""
+        changed = [[x, y] + list(value) for (x, y), value in cells.items() if self.cells.get((x, y)) != value]
+        cleared = [[x, y] for (x, y) in self.cells if (x, y) not in cells]
+        counters = {k: v for k, v in (counters or {}).items() if self.counters.get(k) != v}
+        if not (changed or cleared or counters):
+            return None
+        delta = {"seq": self.seq + 1, "base": self.seq}
+        if changed:
+            delta["set"] = changed
+        if cleared:
+            delta["clear"] = cleared
+        if counters:
+            delta["counters"] = counters
+        self.apply(delta)
+        return delta
+
+    def apply(self, delta):
+        """按顺序应用增量；base与当前序号不一致时不做任何修改，返回False"""
+        if delta.get("base") != self.seq or delta.get("seq") != self.seq + 1:
+            return False
+        # 先解析完再修改，格式错误的增量不会留下改了一半的状态
+        cleared = [(x, y) for x, y in delta.get("clear", ())]
+        changed = [((x, y), (t, p, moves)) for x, y, t, p, moves in delta.get("set", ())]
+        for cell in cleared:
+            self.cells.pop(cell, None)
+        self.cells.update(changed)
+        self.counters.update(delta.get("counters", {}))
+        self.seq = delta["seq"]
+        return True
+
+
+def apply_delta(board, delta):
+    """把增量中的棋子变化落到棋盘上（与已有棋子相同的格子不动），返回棋子是否有变化"""
+    changed = False
+    for x, y in delta.get("clear", ()):
+        piece = board.get_piece(x, y)
+        if piece:
+            board.pieces.remove(piece)
+            board.notify('remove', piece)
+            changed = True
+    for x, y, t, p, moves in delta.get("set", ()):
+        piece = board.get_piece(x, y)
+        if piece and piece.type.value == t and piece.player.value == p:
+            piece.move_count = moves
+            continue
+        if piece:
+            board.pieces.remove(piece)
+            board.notify('remove', piece)
+        piece = Piece(PieceType(t), Player(p), x, y)
+        piece.move_count = moves
+        board.pieces.append(piece)
+        board.notify('add', piece)
+        changed = True
+    if "winner" in delta.get("counters", {}):
+        board.winner = delta["counters"]["winner"]
+    if changed:
+        board.update_all_status()
+    return changed
+
+
+def load_snapshot(board, snapshot):
+    """用完整快照替换棋盘上的全部棋子"""
+    if snapshot.get("grid"):
+        board.grid = snapshot["grid"]
+    board.pieces = []
+    for x, y, t, p, moves in snapshot.get("pieces", []):
+        piece = Piece(PieceType(t), Player(p), x, y)
+        piece.move_count = moves
+        board.pieces.append(piece)
+    board.winner = snapshot.get("counters", {}).get("winner")
+    board.notify('reset')
+    board.update_all_status()
@@ -0,0 +1,258 @@
+import time
+from piece import PieceType
+from board import BOARD_SIZE, MOUNTAIN, ARMY_STEPS, NEIGHBORS
+from distance import DistanceMaps
+
+# 两回合杀棋只考虑距离敌方王塔不超过该步数的军队（本回合3步 + 下回合3步 + 吃塔1步）
+MATE2_RADIUS = 2 * ARMY_STEPS + 1
+# 每次求解最多在真实棋盘上验证的候选走法数
+MAX_VERIFY = 24
+
+
+class Tactic:
+    """攻破王塔的战术：depth=1本回合即可吃塔，depth=2下回合必能吃塔；moves为本回合的行军序列"""
+    __slots__ = ('depth', 'moves')
+
+    def __init__(self, depth, moves):
+        self.depth = depth
+        self.moves = moves
+
+    def __repr__(self):
+        return f"Tactic(depth={self.depth}, moves={self.moves})"
+
+
+def _enemy_tower(board, player):
+    for p in board.pieces:
+        if p.type == PieceType.TOWER and p.player.value != player:
+            return (p.x, p.y)
+    return None
+
+
+def _occupancy(board):
+    """格子 -> (棋子类型, 所属玩家)"""
+    return {(p.x, p.y): (p.type, p.player.value) for p in board.pieces}
+
+
+def _army_lines(board, occ, army, player, budget):
+    """枚举一支军队本回合能走出的全部路线
+
+    规则与can_move_army一致：吃对方军队/王塔不受步数限制；走到空格需要该军队move_count < ARMY_STEPS
+    且总步数未用完；不能进入山脉，不能走到己方棋子或对方农田、工业上。
+    按(位置, 已走步数, 已吃掉的军队)去重，逐条产出(路线, 是否吃掉王塔)。
+    """
+    start = (army.x, army.y)
+    seen = set()
+    stack = [(start, army.move_count, 0, frozenset(), [])]
+    while stack:
+        pos, count, used, captured, line = stack.pop()
+        yield line, False
+        for dx, dy in NEIGHBORS:
+            tx, ty = pos[0] + dx, pos[1] + dy
+            if not (0 <= tx < BOARD_SIZE and 0 <= ty < BOARD_SIZE):
+                continue
+            target = (tx, ty)
+            move = (pos[0], pos[1], tx, ty)
+            occupant = occ.get(target) if target != start and target not in captured else None
+            if occupant is not None:
+                ptype, owner = occupant
+                if owner == player:
+                    continue
+                if ptype == PieceType.TOWER:
+                    yield line + [move], True
+                    continue
+                if ptype != PieceType.ARMY:
+                    continue
+                state = (target, count + 1, used + 1, captured | {target})
+                if state not in seen:
+                    seen.add(state)
+                    stack.append(state + (line + [move],))
+                continue
+            if board.grid[ty][tx] == MOUNTAIN or count >= ARMY_STEPS or used >= budget:
+                continue
+            state = (target, count + 1, used + 1, captured)
+            if state not in seen:
+                seen.add(state)
+                stack.append(state + (line + [move],))
+
+
+def _replay(board, player, moves, move_limit, move_used):
+    """在board上按规则执行行军序列，任何一步不合法返回False"""
+    used = move_used
+    for sx, sy, tx, ty in moves:
+        if not board.can_move_army(sx, sy, tx, ty, player, used, move_limit):
+            return False
+        board.move_piece(sx, sy, tx, ty)
+        used += 1
+    return True
+
+
+def _scratch(board):
+    """复制一份不带监听者的棋盘，推演时复制更便宜"""
+    scratch = board.clone()
+    scratch.observers = []
+    return scratch
+
+
+def _capture_lines(board, player, budget):
+    """按离敌方王塔由近到远产出本回合吃塔的候选路线（单支军队，必要时先让开一支己方军队）"""
+    tower = _enemy_tower(board, player)
+    if tower is None:
+        return
+    maps = DistanceMaps.for_grid(board.grid)
+    field = maps.field(*tower)
+    armies = sorted(board.get_player_pieces(player, PieceType.ARMY),
+                    key=lambda a: field[a.y * BOARD_SIZE + a.x])
+    occ = _occupancy(board)
+    for army in armies:
+        for line, wins in _army_lines(board, occ, army, player, budget):
+            if wins:
+                yield line
+    if budget < 2:
+        return
+    # 己方军队挡路：先让开一步，再用另一支军队进攻
+    for blocker in armies:
+        for dx, dy in NEIGHBORS:
+            tx, ty = blocker.x + dx, blocker.y + dy
+            if not (0 <= tx < BOARD_SIZE and 0 <= ty < BOARD_SIZE) or (tx, ty) in occ:
+                continue
+            if board.grid[ty][tx] == MOUNTAIN or blocker.move_count >= ARMY_STEPS:
+                continue
+            step = (blocker.x, blocker.y, tx, ty)
+            moved = dict(occ)
+            moved[(tx, ty)] = moved.pop((blocker.x, blocker.y))
+            for army in armies:
+                if army is blocker:
+                    continue
+                for line, wins in _army_lines(board, moved, army, player, budget - 1):
+                    if wins:
+                        yield [step] + line
+
+
+def find_capture(board, player, move_limit, move_used=0):
+    """本回合能否吃掉敌方王塔，能则返回行军序列，否则返回None
+
+    先在轻量的占位表上搜索候选路线，再在棋盘副本上用can_move_army逐步验证
+    （行军引起的势力范围变化可能让己方进入濒危而无法继续行军）。
+    """
+    if board.winner or board.danger[player]:
+        return None
+    budget = move_limit - move_used
+    base = None
+    for count, line in enumerate(_capture_lines(board, player, budget)):
+        if count >= MAX_VERIFY:
+            break
+        if base is None:
+            base = _scratch(board)
+        trial = base.clone()
+        if _replay(trial, player, line, move_limit, move_used) and trial.winner == player:
+            return line
+    return None
+
+
+def _next_turn_capture(board, player):
+    """轮到player行军时（移动计数已重置）能否吃塔"""
+    board.reset_move_count(player)
+    return find_capture(board, player, board.get_move_limit(player)) is not None
+
+
+def _defenses(board, enemy, threat_cells):
+    """对方可能的防守：单步行军/吃子、在进攻路线上建造，逐个产出执行后的棋盘"""
+    enemy_limit = board.get_move_limit(enemy)
+    for army in board.get_player_pieces(enemy, PieceType.ARMY):
+        for dx, dy in NEIGHBORS:
+            tx, ty = army.x + dx, army.y + dy
+            if not (0 <= tx < BOARD_SIZE and 0 <= ty < BOARD_SIZE):
+                continue
+            trial = board.clone()
+            if _replay(trial, enemy, [(army.x, army.y, tx, ty)], enemy_limit, 0):
+                yield trial
+    for x, y in threat_cells:
+        for build_type in range(3):
+            if board.can_build(x, y, enemy, build_type):
+                trial = board.clone()
+                trial.build_piece(x, y, enemy, build_type)
+                yield trial
+
+
+def _survives_defense(board, player, enemy, deadline, reply=None):
+    """player在对方回合后仍能吃塔（对方先手吃塔则失败）；超时视为不成立"""
+    if find_capture(board, enemy, board.get_move_limit(enemy)) is not None:
+        return False
+    probe = board.clone()
+    probe.reset_move_count(player)
+    line = find_capture(probe, player, probe.get_move_limit(player))
+    if line is None:
+        return False
+    cells = set()
+    tower = _enemy_tower(board, player)
+    for sx, sy, tx, ty in line:
+        cells.add((tx, ty))
+    for dx, dy in NEIGHBORS:
+        cells.add((tower[0] + dx, tower[1] + dy))
+    cells = [c for c in cells if 0 <= c[0] < BOARD_SIZE and 0 <= c[1] < BOARD_SIZE]
+    for trial in _defenses(board, enemy, cells):
+        if time.perf_counter() > deadline:
+            return False
+        if trial.winner == enemy or not _next_turn_capture(trial, player):
+            return False
+    if reply is not None:
+        trial = board.clone()
+        reply.play_turn(trial, enemy)
+        if trial.winner == enemy or not _next_turn_capture(trial, player):
+            return False
+    return True
+
+
+def _turn_lines(board, player, budget):
+    """本回合单支军队的全部行军路线（含不动），只考虑离敌方王塔足够近的军队"""
+    tower = _enemy_tower(board, player)
+    field = DistanceMaps.for_grid(board.grid).field(*tower)
+    occ = _occupancy(board)
+    yield []
+    armies = [a for a in board.get_player_pieces(player, PieceType.ARMY)
+              if field[a.y * BOARD_SIZE + a.x] <= MATE2_RADIUS]
+    armies.sort(key=lambda a: field[a.y * BOARD_SIZE + a.x])
+    for army in armies:
+        for line, wins in _army_lines(board, occ, army, player, budget):
+            if line and not wins:
+                yield line
+
+
+def find_forced_capture(board, player, move_limit, move_used=0, time_limit=0.05, reply=None):
+    """本回合行军后，下回合能否必然吃塔，能则返回本回合的行军序列
+
+    对方的应对只检验：对方先手吃塔、任意单步行军或吃子、在进攻路线与王塔周围建造，
+    以及reply（可选的AIPlayer）走完的整回合；超过time_limit返回None。
+    """
+    if board.winner or board.danger[player] or _enemy_tower(board, player) is None:
+        return None
+    deadline = time.perf_counter() + time_limit
+    enemy = 3 - player
+    base = _scratch(board)
+    seen = set()
+    for line in _turn_lines(base, player, move_limit - move_used):
+        if time.perf_counter() > deadline:
+            return None
+        trial = base.clone()
+        if not _replay(trial, player, line, move_limit, move_used) or trial.winner:
+            continue
+        key = trial.state_key()
+        if key in seen:
+            continue
+        seen.add(key)
+        trial.reset_move_count(enemy)
+        if _survives_defense(trial, player, enemy, deadline, reply):
+            return line
+    return None
+
+
+def solve(board, player, move_limit, move_used=0, depth=2, time_limit=0.05, reply=None):
+    """攻破王塔求解：先找本回合吃塔，depth>=2时再找两回合必胜，返回Tactic或None"""
+    line = find_capture(board, player, move_limit, move_used)
+    if line is not None:
+        return Tactic(1, line)
+    if depth >= 2:
+        line = find_forced_capture(board, player, move_limit, move_used, time_limit, reply)
+        if line is not None:
+            return Tactic(2, line)
+    return None
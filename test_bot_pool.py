@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务器托管机器人测试：进程池计算、排队统计、按网络协议广播机器人动作
+"""
+
+import asyncio
+import json
+import random
+import zlib
+from board import Board
+from bot_pool import BotPool, BotBusy, board_from_state, board_state
+from server import GameServer
+from sync import SyncState, board_cells
+
+
+class FakeSocket:
+    """记录收到消息的假websocket"""
+    def __init__(self):
+        self.sent = []
+        self.remote_address = ("test", 0)
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def of_type(self, msg_type):
+        return [m for m in self.sent if m["type"] == msg_type]
+
+
+def test_board_state_roundtrip():
+    """导出再导入的局面与原局面一致"""
+    print("测试局面导出导入...")
+    board = Board(seed=4)
+    copy = board_from_state(json.loads(json.dumps(board_state(board))))
+    assert copy.state_key() == board.state_key()
+    assert copy.danger == board.danger
+    print("✓ 局面导出导入测试通过")
+
+
+def test_pool_queue_and_metrics():
+    """任务数超过工作进程时排队，统计思考与排队时间"""
+    print("\n测试计算池排队...")
+    random.seed(6)
+    board = Board(seed=6)
+
+    async def run():
+        pool = BotPool(workers=1, max_queue=2)
+        try:
+            jobs = [asyncio.create_task(pool.think('easy', board, 1, seed=i)) for i in range(3)]
+            await asyncio.sleep(0)
+            assert pool.running == 1 and pool.queued == 2, pool.metrics()
+            try:
+                await pool.think('easy', board, 1)
+                assert False, "排队已满时应拒绝"
+            except BotBusy:
+                pass
+            results = await asyncio.gather(*jobs)
+            return results, pool.metrics()
+        finally:
+            pool.shutdown()
+
+    results, metrics = asyncio.run(run())
+    for result in results:
+        assert isinstance(result["actions"], list)
+        assert result["nodes"] <= 40 * 2, "节点数受难度预算限制"
+    assert metrics["turns"] == 3 and metrics["rejected"] == 1
+    assert metrics["queue_ms_avg"] > 0 and metrics["think_ms_max"] >= metrics["think_ms_avg"]
+    print(f"  统计: {metrics}")
+    print("✓ 计算池排队测试通过")
+
+
+def test_bot_plays_over_protocol():
+    """房主请求机器人后开局，机器人回合按客户端消息格式广播，客户端回放后与服务器棋盘一致"""
+    print("\n测试机器人对局...")
+    random.seed(8)
+    client_board = Board(seed=8)
+
+    async def run():
+        server = GameServer(BotPool(workers=1))
+        host = FakeSocket()
+        try:
+            await server.handle_join(host, {"type": "join", "room": "r1", "name": "host"})
+            await server.handle_request_bot(host, {"type": "request_bot", "difficulty": "normal"})
+            room = server.rooms["r1"]
+            assert room.get_player_names() == ["host", "AI(normal)"]
+            assert room.players[1]["ws"].seed == zlib.crc32(b"r1") & 0xffff, "机器人种子不应随服务器进程变化"
+            init_state = json.loads(json.dumps(board_state(client_board)))
+            await server.handle_init_state_sync(host, {"init_state": init_state})
+            await server.handle_ready(host, {"type": "ready"})
+            assert room.game_started and room.board is not None
+            # 白方（房主）不行动，直接走完三个阶段
+            for _ in range(3):
+                await server.handle_game_action(host, {"type": "game_action", "action_type": "end_turn"})
+            assert room.current_player == 2 and room.bot_task is not None
+            await room.bot_task
+            return server, room, host
+        finally:
+            server.bots.shutdown()
+
+    server, room, host = asyncio.run(run())
+    actions = [m for m in host.sent if m["type"] == "game_action"]
+    assert actions and all(m["player_side"] == 2 for m in actions)
+    assert actions[-1]["action_type"] == "end_turn"
+    for m in actions:
+        server.apply_to_board(client_board, 2, m["action_type"], m["action_data"])
+    assert client_board.state_key() == room.board.state_key(), "客户端回放后应与服务器棋盘一致"
+    # 机器人走完后广播的增量在回合切换之前，应用后与服务器棋盘一致
+    types = [m["type"] for m in host.sent]
+    assert types.index("state_delta") < len(types) - 1 - types[::-1].index("turn_update")
+    mirror = SyncState.from_init_state(json.loads(json.dumps(board_state(Board(seed=8)))))
+    for m in host.of_type("state_delta"):
+        assert mirror.apply(m["delta"])
+    assert mirror.cells == board_cells(room.board)
+    assert room.current_player == 1 and room.game_step == 0
+    assert host.of_type("turn_update")[-1] == {"type": "turn_update", "current_player": 1, "game_step": 0}
+    assert server.bots.metrics()["turns"] == 1
+    print("✓ 机器人对局测试通过")
+
+
+def main():
+    test_board_state_roundtrip()
+    test_pool_queue_and_metrics()
+    test_bot_plays_over_protocol()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量建造评分测试：与逐格can_build + build_score的结果一致，并且更快
+"""
+
+import random
+import time
+from board import Board, BOARD_SIZE
+from ai import AIPlayer
+from evaluation import features_for
+from build_scoring import ILLEGAL, build_scores, top_sites
+
+
+def scan_sites(board, player, build_type, count):
+    """逐格扫描的参考实现（原find_build_positions）"""
+    positions = []
+    acc = features_for(board)
+    for y in range(BOARD_SIZE):
+        for x in range(BOARD_SIZE):
+            if board.can_build(x, y, player, build_type):
+                positions.append((x, y, build_type, acc.build_score(player, x, y, build_type)))
+    positions.sort(key=lambda p: p[3], reverse=True)
+    return [(x, y, build_type) for x, y, build_type, _ in positions[:count]]
+
+
+def positions(seed, turns=40):
+    """自对弈产生的局面序列"""
+    random.seed(seed)
+    board = Board(seed=seed)
+    ais = {1: AIPlayer('hard', time_limit=0.05), 2: AIPlayer('normal', search='greedy')}
+    for turn in range(turns):
+        player = 1 + turn % 2
+        yield board, player
+        ais[player].play_turn(board, player)
+        if board.winner:
+            return
+
+
+def test_scores_match_scan():
+    """每个格子的评分与合法性和逐格计算一致，前k名与稳定排序一致"""
+    print("测试批量评分...")
+    checked = 0
+    for seed in (2, 3):
+        for board, player in positions(seed):
+            acc = features_for(board)
+            scores = build_scores(board, player)
+            for build_type in range(3):
+                for y in range(BOARD_SIZE):
+                    for x in range(BOARD_SIZE):
+                        legal = board.can_build(x, y, player, build_type)
+                        assert (scores[build_type, y, x] > ILLEGAL) == legal, f"({x},{y})类型{build_type}合法性不一致"
+                        if legal:
+                            assert scores[build_type, y, x] == acc.build_score(player, x, y, build_type)
+                for count in (1, 2, 5):
+                    assert top_sites(scores, build_type, count) == scan_sites(board, player, build_type, count)
+            checked += 1
+    print(f"  比较了 {checked} 个局面")
+    print("✓ 批量评分测试通过")
+
+
+def test_faster_than_scan():
+    """三种建造一次算完比逐格扫描三遍快"""
+    print("\n测试批量评分速度...")
+    samples = list((board.clone(), player) for board, player in positions(4, 30))
+    start = time.perf_counter()
+    for board, player in samples:
+        scores = build_scores(board, player)
+        for build_type in range(3):
+            top_sites(scores, build_type, 1)
+    batched = time.perf_counter() - start
+    start = time.perf_counter()
+    for board, player in samples:
+        for build_type in range(3):
+            scan_sites(board, player, build_type, 1)
+    scanned = time.perf_counter() - start
+    print(f"  批量 {batched * 1000 / len(samples):.2f}ms/局面, 逐格 {scanned * 1000 / len(samples):.2f}ms/局面")
+    assert batched < scanned
+    print("✓ 批量评分速度测试通过")
+
+
+def main():
+    test_scores_match_scan()
+    test_faster_than_scan()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+脱险规划测试：计数求解与穷举一致，规划的建造与拆除执行后确实脱离濒危
+"""
+
+import itertools
+import random
+import time
+from board import Board, MOUNTAIN, WATER, is_endangered
+from piece import PieceType
+from ai import AIPlayer
+from evaluation import PIECE_VALUES
+from danger import plan_recovery, recovery_counts
+from test_planner import make_board
+
+
+def brute_force(farm, ind, army, losses):
+    """穷举建造组合与拆除数量的参考实现，返回最小的(拆除价值, 动作数)；同类建造每回合最多两个"""
+    best = None
+    for nf in range(3):
+        for ni in range(min(2, len(losses)) + 1):
+            if nf + ni > 3 or (nf, ni) == (1, 2):
+                # 第三个建造必须与前两个都不同：1农2工不合法，2农1工合法
+                continue
+            f, i, ok = farm + nf, ind, True
+            for loss in losses[:ni]:
+                if i + 1 > f // 2:
+                    ok = False
+                    break
+                i, f = i + 1, f - loss
+            if not ok:
+                continue
+            for ri, ra in itertools.product(range(i + 1), range(army + 1)):
+                if not is_endangered(f, i - ri, army - ra):
+                    cost = (ri * PIECE_VALUES[PieceType.INDUSTRY] + ra * PIECE_VALUES[PieceType.ARMY],
+                            nf + ni + ri + ra)
+                    if best is None or cost < best:
+                        best = cost
+    return best
+
+
+def test_counts_match_brute_force():
+    """计数求解的代价与穷举一致"""
+    print("测试计数求解...")
+    checked = 0
+    for farm, ind, army in itertools.product(range(8), range(6), range(6)):
+        if not is_endangered(farm, ind, army):
+            continue
+        for losses in ((), (0,), (0, 0, 0), (1, 0, 2), (2, 2, 2)):
+            result = recovery_counts(farm, ind, army, industry_losses=losses)
+            cost, nf, ni, ri, ra = result
+            assert (cost, nf + ni + ri + ra) == brute_force(farm, ind, army, losses), f"{farm},{ind},{army},{losses}"
+            checked += 1
+    start = time.perf_counter()
+    for _ in range(1000):
+        recovery_counts(3, 4, 3, industry_losses=(0, 1, 2))
+    average = (time.perf_counter() - start) / 1000
+    print(f"  比较了 {checked} 组计数，平均 {average * 1e6:.1f}us")
+    assert average < 0.001
+    print("✓ 计数求解测试通过")
+
+
+def apply_plan(board, player, plan):
+    trial = board.clone()
+    for x, y, build_type in plan.builds:
+        assert trial.can_build(x, y, player, build_type), f"建造不合法: {plan}"
+        trial.build_piece(x, y, player, build_type)
+    for x, y in plan.removes:
+        trial.remove_piece(x, y)
+    return trial
+
+
+def test_plan_on_constructed_board():
+    """工业过多时先补农田再拆，建工业避开会摧毁己方农田的格子"""
+    print("\n测试构造局面的脱险规划...")
+    board = make_board([
+        (PieceType.TOWER, 1, 1, 1),
+        (PieceType.TOWER, 2, 12, 12),
+        (PieceType.FARM, 1, 2, 1),
+        (PieceType.FARM, 1, 1, 2),
+        (PieceType.INDUSTRY, 1, 3, 3),
+        (PieceType.INDUSTRY, 1, 4, 3),
+        (PieceType.ARMY, 1, 5, 3),
+    ])
+    assert board.danger[1]
+    plan = plan_recovery(board, 1)
+    trial = apply_plan(board, 1, plan)
+    assert not trial.danger[1], f"执行后仍濒危: {plan}"
+    assert trial.count_type(1, PieceType.FARM) >= 2, "不应摧毁己方农田"
+    # 建造阶段已用完时只能拆除
+    removes_only = plan_recovery(board, 1, {0: 2, 1: 1, 2: 0})
+    assert removes_only.builds == []
+    assert not apply_plan(board, 1, removes_only).danger[1]
+    assert removes_only.cost >= plan.cost
+    assert plan_recovery(trial, 1) is None, "不在濒危时不需要规划"
+    print(f"  {plan}")
+    print("✓ 构造局面的脱险规划测试通过")
+
+
+def test_plan_keeps_room_for_farms():
+    """农田格子只剩一个时，工业不选在它旁边；怎么选都会占掉时按剩下的格子数重新求解，而不是放弃建造阶段"""
+    print("\n测试农田格子不足时的规划...")
+    board = make_board([
+        (PieceType.TOWER, 1, 10, 0),
+        (PieceType.TOWER, 2, 0, 10),
+        (PieceType.FARM, 2, 0, 9),
+        (PieceType.ARMY, 2, 2, 10),
+    ])
+    # 黑方耕地区里只留(1, 10)一块陆地，其余改成海洋（仍可建工业）
+    for x, y in [(0, 8), (0, 11), (1, 8), (1, 9), (1, 11), (2, 9), (2, 11), (3, 9), (3, 10), (3, 11)]:
+        board.grid[y][x] = WATER
+    board.update_all_status()
+    assert board.danger[2]
+    plan = plan_recovery(board, 2)
+    assert plan is not None and plan.cost == 0, f"补一块农田、一个工业即可脱险: {plan}"
+    assert (1, 10, 0) in plan.builds
+    assert not apply_plan(board, 2, plan).danger[2]
+
+    # 能建工业的格子都紧挨着(1, 10)：建了工业就没有地方建农田
+    for x, y in [(0, 8), (0, 11), (1, 8), (1, 11), (2, 9), (2, 11), (3, 9), (3, 10), (3, 11)]:
+        board.grid[y][x] = MOUNTAIN
+    board.update_all_status()
+    plan = plan_recovery(board, 2)
+    assert plan is not None, "应重新求解出可行方案"
+    assert not apply_plan(board, 2, plan).danger[2]
+    assert plan.cost <= plan_recovery(board, 2, builds=False).cost
+    print("✓ 农田格子不足时的规划测试通过")
+
+
+def test_plan_on_self_play():
+    """自对弈局面中拆掉己方农田制造濒危，按规划执行后都能脱险；规划本身只需几十微秒"""
+    print("\n测试自对弈局面的脱险规划...")
+    checked = 0
+    positions = []
+    for seed in (5, 6, 7):
+        random.seed(seed)
+        board = Board(seed=seed)
+        ais = {1: AIPlayer('normal', search='greedy'), 2: AIPlayer('easy')}
+        for turn in range(40):
+            player = 1 + turn % 2
+            for side in (1, 2):
+                trial = board.clone()
+                farms = trial.get_player_pieces(side, PieceType.FARM)
+                random.shuffle(farms)
+                for farm in farms:
+                    if trial.danger[side]:
+                        break
+                    trial.remove_piece(farm.x, farm.y)
+                if not trial.danger[side]:
+                    continue
+                plan = plan_recovery(trial, side)
+                assert plan is not None
+                assert not apply_plan(trial, side, plan).danger[side], f"种子{seed}第{turn}回合: {plan}"
+                removes_only = plan_recovery(trial, side, builds=False)
+                assert not apply_plan(trial, side, removes_only).danger[side]
+                assert removes_only.cost >= plan.cost
+                positions.append((trial, side))
+                checked += 1
+            ais[player].play_turn(board, player)
+            if board.winner:
+                break
+    assert checked > 0
+    # 搜索中每个节点都可能调用，计时按建造阶段（候选格子最多）的完整规划
+    start = time.perf_counter()
+    for _ in range(20):
+        for trial, side in positions:
+            plan_recovery(trial, side)
+    average = (time.perf_counter() - start) / (20 * len(positions))
+    print(f"  检查了 {checked} 个濒危局面，规划平均 {average * 1e6:.1f}us")
+    assert average < 0.00015
+    print("✓ 自对弈局面的脱险规划测试通过")
+
+
+def main():
+    test_counts_match_brute_force()
+    test_plan_on_constructed_board()
+    test_plan_keeps_room_for_farms()
+    test_plan_on_self_play()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地形距离表测试：王步距离、山脉阻挡与动态阻挡的增量更新
+"""
+
+import random
+from board import Board, BOARD_SIZE, LAND, WATER, MOUNTAIN
+from distance import DistanceMaps, UNREACHABLE
+
+
+def brute_distance(grid, src, dst, blocked=()):
+    """逐层扩展的参考实现"""
+    if src == dst:
+        return 0
+    frontier = {src}
+    seen = {src}
+    for step in range(1, BOARD_SIZE * BOARD_SIZE):
+        nxt = set()
+        for x, y in frontier:
+            for dx in [-1, 0, 1]:
+                for dy in [-1, 0, 1]:
+                    nx, ny = x + dx, y + dy
+                    if not (0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE) or (nx, ny) in seen:
+                        continue
+                    if grid[ny][nx] == MOUNTAIN or (nx, ny) in blocked:
+                        continue
+                    if (nx, ny) == dst:
+                        return step
+                    seen.add((nx, ny))
+                    nxt.add((nx, ny))
+        if not nxt:
+            return UNREACHABLE
+        frontier = nxt
+    return UNREACHABLE
+
+
+def test_king_metric_with_mountains():
+    """无山脉时为切比雪夫距离，有山脉时绕行"""
+    print("测试王步距离...")
+    grid = [[LAND for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+    maps = DistanceMaps(grid)
+    assert maps.distance(0, 0, 5, 3) == 5
+    # 用山脉把第0列与其他列隔开，只留最后一行的缺口
+    for y in range(BOARD_SIZE - 1):
+        grid[y][1] = MOUNTAIN
+    maps = DistanceMaps(grid)
+    assert maps.distance(0, 0, 2, 0) == brute_distance(grid, (0, 0), (2, 0))
+    assert maps.distance(0, 0, 2, 0) == 2 * (BOARD_SIZE - 1)
+    assert maps.distance(0, 0, 1, 0) == UNREACHABLE, "山脉不可进入"
+    print("✓ 王步距离测试通过")
+
+
+def test_random_maps_match_reference():
+    """随机地图上与参考实现一致"""
+    print("\n测试随机地图...")
+    random.seed(5)
+    board = Board()
+    maps = DistanceMaps.for_grid(board.grid)
+    land = [(x, y) for y in range(BOARD_SIZE) for x in range(BOARD_SIZE) if board.grid[y][x] != MOUNTAIN]
+    for _ in range(200):
+        src, dst = random.choice(land), random.choice(land)
+        assert maps.distance(src[0], src[1], dst[0], dst[1]) == brute_distance(board.grid, src, dst)
+    print("✓ 随机地图测试通过")
+
+
+def test_cache_by_map():
+    """同一张地图复用同一份距离表"""
+    print("\n测试缓存...")
+    board = Board()
+    copy = [row[:] for row in board.grid]
+    assert DistanceMaps.for_grid(board.grid) is DistanceMaps.for_grid(copy)
+    print("✓ 缓存测试通过")
+
+
+def test_incremental_blockers():
+    """增减阻挡后的距离与重新计算一致"""
+    print("\n测试动态阻挡...")
+    random.seed(9)
+    grid = [[random.choice([LAND, LAND, WATER, MOUNTAIN]) for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+    grid[0][0] = LAND
+    maps = DistanceMaps(grid)
+    field = maps.blocked_field(0, 0)
+    blockers = set()
+    cells = [(x, y) for y in range(BOARD_SIZE) for x in range(BOARD_SIZE) if (x, y) != (0, 0)]
+    for _ in range(150):
+        cell = random.choice(cells)
+        if cell in blockers:
+            blockers.discard(cell)
+            field.remove_blocker(*cell)
+        else:
+            blockers.add(cell)
+            field.add_blocker(*cell)
+        fresh = maps.blocked_field(0, 0, blockers)
+        assert field.dist == fresh.dist, "增量结果与重算不一致"
+    for x, y in cells[:40]:
+        if grid[y][x] != MOUNTAIN and (x, y) not in blockers:
+            assert field.distance(x, y) == brute_distance(grid, (0, 0), (x, y), blockers)
+    print("✓ 动态阻挡测试通过")
+
+
+def main():
+    test_king_metric_with_mountains()
+    test_random_maps_match_reference()
+    test_cache_by_map()
+    test_incremental_blockers()
+
+
+if __name__ == "__main__":
+    main()
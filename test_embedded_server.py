@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内嵌服务器测试：后台线程启动即就绪、能完成加入房间、端口冲突时报错、停止后线程退出并释放端口
+"""
+
+import json
+import socket
+import time
+import websocket
+from bot_pool import BotPool
+from server import EmbeddedServer
+
+
+def test_start_join_stop():
+    """系统分配端口启动，客户端加入房间，停止后端口可以重新绑定"""
+    print("测试内嵌服务器启动与停止...")
+    server = EmbeddedServer("localhost", 0, BotPool(workers=1))
+    start = time.perf_counter()
+    port = server.start()
+    elapsed = time.perf_counter() - start
+    print(f"  端口 {port}，就绪耗时 {elapsed * 1000:.1f}ms")
+    assert port != 0 and server.running()
+    assert elapsed < 1.0, "不应再固定等待"
+
+    ws = websocket.create_connection(server.url, timeout=5)
+    ws.send(json.dumps({"type": "join", "room": "embedded", "name": "host"}))
+    reply = json.loads(ws.recv())
+    assert reply["type"] == "joined" and reply["names"] == ["host"]
+    assert "embedded" in server.server.rooms
+
+    server.stop()
+    assert not server.running()
+    server.stop()  # 重复调用无害
+    ws.close()
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("localhost", port))
+    print("✓ 内嵌服务器启动与停止测试通过")
+
+
+def test_port_in_use():
+    """端口被占用时start抛出OSError，线程已退出"""
+    print("\n测试端口冲突...")
+    first = EmbeddedServer("localhost", 0, BotPool(workers=1))
+    port = first.start()
+    try:
+        second = EmbeddedServer("localhost", port, BotPool(workers=1))
+        try:
+            second.start()
+        except OSError:
+            pass
+        else:
+            raise AssertionError("端口被占用时应报错")
+        assert not second.running()
+    finally:
+        first.stop()
+    print("✓ 端口冲突测试通过")
+
+
+def main():
+    test_start_join_stop()
+    test_port_in_use()
+
+
+if __name__ == "__main__":
+    main()
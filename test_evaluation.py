@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量特征评估测试：累加器在对局过程中与重新计算的结果保持一致
+"""
+
+import random
+from board import Board, BOARD_SIZE
+from piece import PieceType
+from ai import AIPlayer
+from evaluation import FeatureAccumulator, features_for
+from distance import DistanceMaps
+
+
+def scan_build_score(board, player, x, y, build_type):
+    """逐格扫描的参考实现（原evaluate_build_position，距离改为地形距离）"""
+    maps = DistanceMaps.for_grid(board.grid)
+    score = 0
+    own = [p for p in board.pieces if p.type == PieceType.TOWER and p.player.value == player]
+    enemy = [p for p in board.pieces if p.type == PieceType.TOWER and p.player.value != player]
+    if own:
+        score += (10 - maps.distance(own[0].x, own[0].y, x, y)) * 2
+    if enemy:
+        score += maps.distance(enemy[0].x, enemy[0].y, x, y)
+    for dx in [-1, 0, 1]:
+        for dy in [-1, 0, 1]:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
+                piece = board.get_piece(nx, ny)
+                if build_type == 0 and piece and piece.type == PieceType.INDUSTRY:
+                    score -= 20
+                elif build_type == 1 and piece and piece.type == PieceType.FARM:
+                    score += 10
+    if build_type == 2 and enemy:
+        score += (20 - maps.distance(enemy[0].x, enemy[0].y, x, y)) * 3
+    return score
+
+
+def assert_same(acc, fresh):
+    assert acc.towers == fresh.towers, "王塔坐标不一致"
+    assert acc.material == fresh.material, "棋子数量不一致"
+    assert acc.near == fresh.near, "邻域计数不一致"
+    assert acc.influence_size == fresh.influence_size, "势力范围大小不一致"
+    assert acc.advance == fresh.advance, "推进分不一致"
+
+
+def play_turn(board, ai, player):
+    board.reset_move_count(player)
+    for sx, sy, tx, ty in ai.choose_move(board, player, board.get_move_limit(player)):
+        board.move_piece(sx, sy, tx, ty)
+    for x, y, build_type in ai.choose_build(board, player):
+        if board.can_build(x, y, player, build_type):
+            board.build_piece(x, y, player, build_type)
+    for x, y in ai.choose_remove(board, player):
+        if board.can_remove(x, y, player):
+            board.remove_piece(x, y)
+
+
+def test_incremental_matches_rebuild():
+    """自对弈若干回合，增量结果与从头计算完全一致"""
+    print("测试增量更新...")
+    random.seed(7)
+    board = Board()
+    acc = features_for(board)
+    ai = AIPlayer('normal', search='beam', time_limit=0.05)
+    for turn in range(30):
+        play_turn(board, ai, 1 + turn % 2)
+        fresh = FeatureAccumulator(board.clone(), attach=False)
+        fresh.board.pieces = board.pieces
+        fresh.rebuild()
+        assert_same(acc, fresh)
+        assert acc.influence_size[1] == len(board.calc_influence()[1])
+        assert acc.in_danger(1) == board.danger[1]
+        if board.winner:
+            break
+    print("✓ 增量更新测试通过")
+
+
+def test_build_score_matches_scan():
+    """O(1)建造评分与逐格扫描结果一致"""
+    print("\n测试建造评分...")
+    random.seed(11)
+    board = Board()
+    ai = AIPlayer('normal')
+    for turn in range(12):
+        play_turn(board, ai, 1 + turn % 2)
+    acc = features_for(board)
+    for player in (1, 2):
+        for build_type in range(3):
+            for y in range(BOARD_SIZE):
+                for x in range(BOARD_SIZE):
+                    expected = scan_build_score(board, player, x, y, build_type)
+                    assert acc.build_score(player, x, y, build_type) == expected, f"({x},{y})评分不一致"
+    print("✓ 建造评分测试通过")
+
+
+def test_clone_copies_features():
+    """复制棋盘时累加器一起复制，互不影响"""
+    print("\n测试复制...")
+    board = Board()
+    acc = features_for(board)
+    copy = board.clone()
+    copy_acc = features_for(copy)
+    assert copy_acc is not acc
+    tower = board.get_player_pieces(1, PieceType.TOWER)[0]
+    copy.remove_piece(tower.x, tower.y)
+    assert copy_acc.towers[1] is None
+    assert acc.towers[1] == (tower.x, tower.y)
+    print("✓ 复制测试通过")
+
+
+def main():
+    test_incremental_matches_rebuild()
+    test_build_score_matches_scan()
+    test_clone_copies_features()
+
+
+if __name__ == "__main__":
+    main()
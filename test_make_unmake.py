@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行军make/unmake与堆贪心测试：撤销后局面与监听者完全恢复，局部重新评分与全部重新评分结果一致
+"""
+
+import random
+import ai as ai_module
+from board import Board, BOARD_SIZE
+from piece import PieceType, Player
+from ai import AIPlayer
+from evaluation import FeatureAccumulator, features_for
+from threats import ThreatMap, threats_for
+from test_planner import make_board
+
+
+def snapshot(board):
+    return (board.state_key(), dict(board.danger), board.winner, board._areas(),
+            [(p.x, p.y, p.type, p.player) for p in board.pieces])
+
+
+def assert_observers_fresh(board):
+    acc, fresh = features_for(board), FeatureAccumulator(board, attach=False)
+    fresh.rebuild()
+    assert acc.material == fresh.material and acc.near == fresh.near, "特征累加器未恢复"
+    assert acc.influence_size == fresh.influence_size and acc.advance == fresh.advance
+    tm, fresh_tm = threats_for(board), ThreatMap(board, attach=False)
+    fresh_tm.rebuild()
+    assert tm.attack == fresh_tm.attack and tm.radius == fresh_tm.radius, "威胁图未恢复"
+
+
+def test_unmake_restores_capture_and_conflict():
+    """吃子、势力冲突易主/消失都能撤销"""
+    print("测试撤销吃子与势力冲突...")
+    board = make_board([
+        (PieceType.TOWER, 1, 0, 0),
+        (PieceType.TOWER, 2, 13, 13),
+        (PieceType.FARM, 1, 3, 0),
+        (PieceType.FARM, 1, 0, 3),
+        (PieceType.INDUSTRY, 1, 3, 3),
+        (PieceType.ARMY, 1, 6, 6),
+        (PieceType.ARMY, 2, 8, 8),
+        (PieceType.FARM, 2, 8, 6),
+        (PieceType.FARM, 2, 10, 10),
+    ])
+    features_for(board)
+    threats_for(board)
+    before = snapshot(board)
+    undo = [board.make_move(6, 6, 7, 7)]  # 黑方农田(8,6)进入白方势力范围后易主
+    assert board.get_piece(8, 6).player == Player.WHITE
+    undo.append(board.make_move(7, 7, 8, 8))  # 吃掉黑方军队
+    assert board.count_type(2, PieceType.ARMY) == 0
+    assert_observers_fresh(board)
+    for u in reversed(undo):
+        board.unmake_move(u)
+    assert snapshot(board) == before, "撤销后局面应完全恢复"
+    assert board.journal is None
+    assert_observers_fresh(board)
+    print("✓ 撤销吃子与势力冲突测试通过")
+
+
+def test_greedy_leaves_board_untouched():
+    """贪心选择不改动棋盘，返回的序列按规则可以执行"""
+    print("\n测试贪心选择不改动棋盘...")
+    random.seed(9)
+    board = Board(seed=9)
+    players = {1: AIPlayer('hard', time_limit=0.05), 2: AIPlayer('normal', search='greedy')}
+    greedy = AIPlayer('hard', search='greedy', noise=0, max_nodes=0, time_limit=5)
+    for turn in range(40):
+        player = 1 + turn % 2
+        limit = board.get_move_limit(player)
+        board.reset_move_count(player)
+        before = snapshot(board)
+        moves = greedy.greedy_moves(board, player, limit)
+        assert snapshot(board) == before, f"第{turn}回合贪心选择改动了棋盘"
+        trial = board.clone()
+        for used, (sx, sy, tx, ty) in enumerate(moves):
+            assert trial.can_move_army(sx, sy, tx, ty, player, used, limit), f"第{turn}回合走法不合法: {moves}"
+            trial.move_piece(sx, sy, tx, ty)
+        players[player].play_turn(board, player)
+        if board.winner:
+            break
+    print("✓ 贪心选择不改动棋盘测试通过")
+
+
+def test_local_rescore_matches_full():
+    """只重新评分附近军队与每步全部重新评分选出同样的走法"""
+    print("\n测试局部重新评分...")
+    random.seed(12)
+    board = Board(seed=12)
+    players = {1: AIPlayer('hard', time_limit=0.05), 2: AIPlayer('hard', time_limit=0.05)}
+    greedy = AIPlayer('hard', search='greedy', noise=0, max_nodes=0, time_limit=5)
+    radius = ai_module.RESCORE_RADIUS
+    checked = 0
+    try:
+        for turn in range(60):
+            player = 1 + turn % 2
+            limit = board.get_move_limit(player)
+            board.reset_move_count(player)
+            ai_module.RESCORE_RADIUS = radius
+            local = greedy.greedy_moves(board, player, limit)
+            ai_module.RESCORE_RADIUS = BOARD_SIZE
+            full = greedy.greedy_moves(board, player, limit)
+            assert local == full, f"第{turn}回合结果不同: {local} vs {full}"
+            checked += len(local)
+            players[player].play_turn(board, player)
+            if board.winner:
+                break
+    finally:
+        ai_module.RESCORE_RADIUS = radius
+    print(f"  比较了 {checked} 步")
+    print("✓ 局部重新评分测试通过")
+
+
+def main():
+    test_unmake_restores_capture_and_conflict()
+    test_greedy_leaves_board_untouched()
+    test_local_rescore_matches_full()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网络消息队列测试：收件箱按顺序处理、有容量上限；网络线程只入队，界面状态在主线程处理消息时才改变
+"""
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import time
+import pygame
+from bot_pool import BotPool
+from game import Game
+from net_queue import NetInbox, NET_CLOSED
+from server import EmbeddedServer
+
+
+def test_inbox_order_and_capacity():
+    print("测试收件箱...")
+    inbox = NetInbox(capacity=3)
+    assert all(inbox.put({"n": i}) for i in range(3))
+    assert not inbox.put({"n": 3}), "超过容量应拒绝"
+    assert inbox.put({"type": NET_CLOSED}, force=True), "连接结束的通知不受容量限制"
+    assert inbox.dropped == 1
+
+    seen = []
+
+    def handler(message):
+        seen.append(message.get("n"))
+        if message.get("n") == 0:
+            inbox.put({"n": 9}, force=True)  # 处理期间新到的消息留到下一次
+
+    assert inbox.drain(handler) == 4
+    assert seen == [0, 1, 2, None]
+    assert len(inbox) == 1
+    assert inbox.drain(handler) == 1 and seen[-1] == 9
+    print("✓ 收件箱测试通过")
+
+
+def test_game_applies_messages_on_main_thread():
+    """网络线程只把消息放进收件箱，drain_net之后界面状态才变化"""
+    print("\n测试网络消息在主线程处理...")
+    pygame.init()
+    game = Game(pygame.display.set_mode((800, 600)))
+    server = EmbeddedServer("localhost", 0, BotPool(workers=1))
+    server.start()
+    try:
+        game.net_addr, game.net_room, game.net_name = server.url, "queue", "host"
+        game.game_mode = 'net'
+        game.show_start_menu = False
+        game.net_waiting = True
+        game.net_players = [None, None]
+        game.init_game()
+        game.connect_net()
+        inbox = game.net_inbox
+        deadline = time.time() + 5
+        while len(inbox) < 2 and time.time() < deadline:  # joined + player_update
+            time.sleep(0.01)
+        assert len(inbox) >= 2
+        assert game.net_players == [None, None], "网络线程不应直接修改界面状态"
+        game.drain_net()
+        assert game.net_is_host and game.net_players[0]["name"] == "host"
+
+        assert game.net_send({"type": "ready"})
+        deadline = time.time() + 5
+        while not len(inbox) and time.time() < deadline:
+            time.sleep(0.01)
+        game.drain_net()
+        assert game.net_ready[0]
+
+        # 服务器关闭后连接放弃重连，主循环收到NET_CLOSED
+        game.net_conn.retries = 0
+        server.stop()
+        deadline = time.time() + 5
+        while not len(inbox) and time.time() < deadline:
+            time.sleep(0.01)
+        game.drain_net()
+        assert game.net_waiting and game.net_error == "连接已断开", game.net_error
+
+        game.close_net()
+        assert game.net_conn is None and game.net_inbox is None
+    finally:
+        game.close_net()
+        server.stop()
+    print("✓ 网络消息在主线程处理测试通过")
+
+
+def main():
+    test_inbox_order_and_capacity()
+    test_game_applies_messages_on_main_thread()
+
+
+if __name__ == "__main__":
+    main()
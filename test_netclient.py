@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio客户端连接测试：多个连接共用一个事件循环线程、收发并发、断线按退避重连并重新加入房间、
+断线期间发送的消息在重连后送达、主动关闭不再通知
+"""
+
+import threading
+import time
+from bot_pool import BotPool
+from net_queue import NetInbox, NET_CLOSED, NET_RECONNECTING
+from netclient import NetConnection, backoff_delay, RECONNECT_MAX, RESOLVER_THREADS
+from server import EmbeddedServer
+
+
+def wait_for(inbox, msg_type, timeout=5.0):
+    """等收件箱里出现某种消息，返回它之前（含）的所有消息"""
+    seen = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        while len(inbox):
+            message = inbox.messages.popleft()
+            seen.append(message)
+            if message.get("type") == msg_type:
+                return seen
+        time.sleep(0.005)
+    raise AssertionError(f"没有等到 {msg_type}，收到 {seen}")
+
+
+def test_backoff():
+    print("测试重连退避...")
+    delays = [backoff_delay(i) for i in range(8)]
+    assert delays[:4] == [0.5, 1.0, 2.0, 4.0]
+    assert max(delays) == RECONNECT_MAX and delays == sorted(delays)
+    print("✓ 重连退避测试通过")
+
+
+def test_many_connections_one_thread():
+    """同时连接多个房间只多一个网络线程（另有固定的域名解析线程），消息各自送到自己的收件箱"""
+    print("\n测试多个连接共用事件循环...")
+    server = EmbeddedServer("localhost", 0, BotPool(workers=1))
+    server.start()
+    before = threading.active_count()
+    woken = threading.Event()
+    conns = []
+    try:
+        start = time.perf_counter()
+        for i in range(5):
+            inbox = NetInbox()
+            conn = NetConnection(server.url, inbox, wake=woken.set,
+                                 hello={"type": "join", "room": f"room{i}", "name": f"p{i}"}).start()
+            conns.append(conn)
+        for i, conn in enumerate(conns):
+            joined = wait_for(conn.inbox, "joined")[-1]
+            assert joined["room"] == f"room{i}"
+        elapsed = time.perf_counter() - start
+        assert woken.is_set()
+        loops = [t for t in threading.enumerate() if t.name == 'net-loop']
+        assert len(loops) == 1
+        assert threading.active_count() - before <= 1 + RESOLVER_THREADS, "不应每个连接一个线程"
+        print(f"  5个连接全部加入房间耗时 {elapsed * 1000:.1f}ms")
+
+        # 收发并发：连续发送的同时陆续收到回复
+        for _ in range(20):
+            conns[0].send({"type": "bot_metrics"})
+        for _ in range(20):
+            wait_for(conns[0].inbox, "bot_metrics")
+        assert conns[0].sent == 20 and conns[0].received == 22  # 另有joined、player_update
+    finally:
+        for conn in conns:
+            conn.close()
+        server.stop()
+    print("✓ 多个连接共用事件循环测试通过")
+
+
+def test_reconnect_after_server_restart():
+    """服务器重启后按退避重连，重新发送hello，断线期间排队的消息随后送达；主动关闭不发NET_CLOSED"""
+    print("\n测试断线重连...")
+    server = EmbeddedServer("localhost", 0, BotPool(workers=1))
+    port = server.start()
+    inbox = NetInbox()
+    conn = NetConnection(server.url, inbox, hello={"type": "join", "room": "r", "name": "host"}).start()
+    try:
+        wait_for(inbox, "joined")
+        server.stop()
+        notice = wait_for(inbox, NET_RECONNECTING)[-1]
+        assert notice["attempt"] == 1 and notice["delay"] == backoff_delay(0)
+        conn.send({"type": "ready"})  # 断线期间发送
+
+        server = EmbeddedServer("localhost", port, BotPool(workers=1))
+        server.start()
+        wait_for(inbox, "joined", timeout=10)
+        wait_for(inbox, "ready_update")
+        assert server.server.rooms["r"].ready, "断线期间的消息应在重连后送达"
+    finally:
+        conn.close()
+        server.stop()
+    time.sleep(0.2)
+    assert not any(m.get("type") == NET_CLOSED for m in inbox.messages)
+
+    # 连不上且不重试时报告失败原因
+    inbox = NetInbox()
+    NetConnection(f"ws://localhost:{port}", inbox, retries=0).start()
+    closed = wait_for(inbox, NET_CLOSED)[-1]
+    assert closed["msg"].startswith("连接失败")
+    print("✓ 断线重连测试通过")
+
+
+def main():
+    test_backoff()
+    test_many_connections_one_thread()
+    test_reconnect_after_server_restart()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+开局库测试：编码与查表、AI命中时采用库中计划、未命中时照常搜索
+"""
+
+import os
+import random
+import tempfile
+import time
+from board import Board
+from ai import AIPlayer
+from opening_book import (OpeningBook, analyse_map, build_book, decode_actions, encode_actions,
+                          position_key, write_book)
+
+ANALYST = 'hard:time_limit=0.2'
+
+
+def test_encode_roundtrip():
+    """动作编码后解码，按阶段分组"""
+    print("测试动作编码...")
+    actions = [('move', (1, 2, 2, 3)), ('build', (4, 5, 0)), ('build', (4, 6, 2)), ('remove', (7, 8))]
+    moves, builds, removes = decode_actions(encode_actions(actions))
+    assert moves == [(1, 2, 2, 3)]
+    assert builds == [(4, 5, 0), (4, 6, 2)]
+    assert removes == [(7, 8)]
+    print("✓ 动作编码测试通过")
+
+
+def test_book_lookup():
+    """写出的开局库能按局面查到，其他地图与行动方查不到"""
+    print("\n测试开局库查表...")
+    entries = build_book([11, 12], ANALYST, plies=2, workers=1)
+    assert len(entries) == 4
+    path = os.path.join(tempfile.mkdtemp(), 'book.bin')
+    write_book(entries, path)
+    book = OpeningBook(path)
+    random.seed(11)
+    board = Board(seed=11)
+    assert book.lookup(board, 1) is not None
+    assert book.lookup(board, 2) is None, "行动方不同不应命中"
+    random.seed(13)
+    assert book.lookup(Board(seed=13), 1) is None, "没分析过的地图不应命中"
+    start = time.perf_counter()
+    for _ in range(1000):
+        book.lookup(board, 1)
+    average = (time.perf_counter() - start) / 1000
+    print(f"  平均查表 {average * 1e6:.1f}us")
+    assert average < 0.001
+    book.close()
+    print("✓ 开局库查表测试通过")
+
+
+def test_ai_follows_book():
+    """命中时AI直接采用库中整回合计划；未命中的局面照常搜索"""
+    print("\n测试AI使用开局库...")
+    seed = 21
+    entries = analyse_map(seed, ANALYST, plies=1)
+    path = os.path.join(tempfile.mkdtemp(), 'book.bin')
+    write_book({key: (count, data) for key, count, data in entries}, path)
+
+    random.seed(seed)
+    board = Board(seed=seed)
+    key = position_key(board, 1)
+    ai = AIPlayer('normal', book=path)
+    actions = ai.play_turn(board, 1)
+    assert encode_actions(actions) == entries[0][2], "应按库中计划行动"
+    assert key == entries[0][0] and ai.book.hits == 1
+
+    # 黑方局面棋子数超过库中所有局面，不做哈希直接照常搜索
+    assert len(board.pieces) > ai.book.max_pieces
+    ai.play_turn(board, 2)
+    assert ai.book.hits == 1 and ai.book.misses == 0
+    assert AIPlayer('normal', book=False).book is None
+    ai.book.close()
+    print("✓ AI使用开局库测试通过")
+
+
+def main():
+    test_encode_roundtrip()
+    test_book_lookup()
+    test_ai_follows_book()
+
+
+if __name__ == "__main__":
+    main()
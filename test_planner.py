@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+整回合束搜索规划器测试
+"""
+
+import subprocess
+import sys
+import time
+from board import Board, BOARD_SIZE, LAND, can_build_type
+from piece import Piece, PieceType, Player
+from ai import AIPlayer, DIFFICULTY_LEVELS
+from planner import TurnPlanner
+
+
+def make_board(pieces, base=()):
+    """构造全陆地的固定局面：base与pieces中的(类型, 玩家, x, y)依次放上棋盘（其他测试文件也用）"""
+    board = Board()
+    board.grid = [[LAND for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+    board.pieces = [Piece(t, Player(pl), x, y) for t, pl, x, y in list(base) + list(pieces)]
+    board.winner = None
+    board.update_all_status()
+    return board
+
+
+def test_plan_captures_tower():
+    """军队能吃到王塔时必须直接吃"""
+    print("测试规划器吃王塔...")
+    board = make_board([
+        (PieceType.TOWER, 1, 0, 0),
+        (PieceType.TOWER, 2, 6, 6),
+        (PieceType.FARM, 1, 1, 0),
+        (PieceType.FARM, 1, 0, 1),
+        (PieceType.INDUSTRY, 1, 2, 2),
+        (PieceType.ARMY, 1, 4, 4),
+    ])
+    board.update_all_status()
+    planner = TurnPlanner(AIPlayer('normal'), time_limit=1.0)
+    plan = planner.plan(board, 1, 2)
+    assert plan.moves, "应该产生行军计划"
+    assert plan.moves[-1][2:] == (6, 6), f"最后一步应吃掉王塔，实际{plan.moves}"
+    assert board.get_piece(6, 6) is not None, "规划不应修改原棋盘"
+    print("✓ 吃王塔测试通过")
+
+
+def test_plan_respects_build_rule():
+    """建造计划满足“两个相同或三个不同”的规则且可以按序执行"""
+    print("\n测试建造规则...")
+    board = Board()
+    ai = AIPlayer('normal')
+    plan = ai.plan_turn(board, 1, board.get_move_limit(1))
+    counts = {0: 0, 1: 0, 2: 0}
+    for x, y, build_type in plan.builds:
+        assert can_build_type(counts, build_type), f"违反建造规则: {plan.builds}"
+        counts[build_type] += 1
+    # 按计划执行，每一步都应合法
+    for sx, sy, tx, ty in plan.moves:
+        board.move_piece(sx, sy, tx, ty)
+    assert plan.keys[1] == board.state_key()
+    for x, y, build_type in plan.builds:
+        assert board.can_build(x, y, 1, build_type), f"建造({x},{y},{build_type})不合法"
+        board.build_piece(x, y, 1, build_type)
+    print("✓ 建造规则测试通过")
+
+
+def test_plan_time_budget():
+    """规划器在时间预算内返回"""
+    print("\n测试时间预算...")
+    board = Board()
+    planner = TurnPlanner(AIPlayer('normal'), beam_width=32, time_limit=0.2)
+    start = time.perf_counter()
+    planner.plan(board, 1, board.get_move_limit(1))
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1.0, f"规划耗时过长: {elapsed:.3f}s"
+    print(f"✓ 时间预算测试通过 ({elapsed*1000:.1f}ms, {planner.nodes}节点)")
+
+
+def test_plan_node_budget():
+    """节点预算封顶：每阶段的节点数不超过预算（超出不多于一次扩展）"""
+    print("\n测试节点预算...")
+    board = Board(seed=4)
+    ai = AIPlayer('normal', search='greedy')
+    for turn in range(10):
+        ai.play_turn(board, 1 + turn % 2)
+    for max_nodes in (10, 40, 150):
+        planner = TurnPlanner(AIPlayer('hard'), beam_width=32, time_limit=10.0, max_nodes=max_nodes)
+        planner.plan(board, 1, board.get_move_limit(1))
+        assert planner.nodes <= max_nodes + 3, f"节点数{planner.nodes}超出预算{max_nodes}"
+    print("✓ 节点预算测试通过")
+
+
+def test_difficulty_levels():
+    """难度即计算预算：参数来自难度表，显式参数优先，噪声可复现"""
+    print("\n测试难度等级...")
+    ai = AIPlayer('hard')
+    assert ai.max_nodes == DIFFICULTY_LEVELS['hard']['max_nodes']
+    assert AIPlayer('hard', max_nodes=7).max_nodes == 7
+    try:
+        AIPlayer('impossible')
+        assert False, "未知难度应报错"
+    except ValueError:
+        pass
+    board = Board(seed=9)
+    easy = AIPlayer('easy', seed=3)
+    assert easy.evaluate_board(board, 1) == AIPlayer('easy', seed=3).evaluate_board(board, 1), "同种子噪声应一致"
+    assert easy.evaluate_board(board, 1) != AIPlayer('hard').evaluate_board(board, 1), "简单难度应带噪声"
+    # 工作进程（机器人进程池、锦标赛）中噪声也要一致：None的hash随进程变化，不能参与种子
+    code = "from ai import AIPlayer; from board import Board; print(repr(AIPlayer('easy', seed=3).evaluate_board(Board(seed=9), 1)))"
+    outputs = {subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+               for _ in range(2)}
+    assert outputs == {repr(easy.evaluate_board(board, 1))}, f"不同进程的噪声不一致: {outputs}"
+    print("✓ 难度等级测试通过")
+
+
+def main():
+    test_plan_captures_tower()
+    test_plan_respects_build_rule()
+    test_plan_time_budget()
+    test_plan_node_budget()
+    test_difficulty_levels()
+
+
+if __name__ == "__main__":
+    main()
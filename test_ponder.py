@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台预读测试：人类回合中提前算好AI应对，人类实际走法到达后保留匹配的结果
+"""
+
+import time
+from board import Board
+from ai import AIPlayer
+from ponder import Ponderer
+
+
+def wait_for(predicate, timeout=10.0):
+    start = time.time()
+    while time.time() - start < timeout:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_ponder_hit_when_human_passes():
+    """人类直接结束回合时，AI回合查表命中"""
+    print("测试预读命中...")
+    board = Board(seed=3)
+    ai = AIPlayer('normal')
+    ponderer = Ponderer()
+    ponderer.update(board.clone(), 1, ai, 0, 0, {0: 0, 1: 0, 2: 0})
+    assert wait_for(lambda: len(ponderer.table) >= 1), "预读应产生结果"
+    ponderer.stop()
+    board.reset_move_count(2)
+    actions = ponderer.take(board)
+    assert actions is not None and ponderer.hits == 1
+    # 预读结果与现算结果一致
+    assert actions == ai.play_turn(board.clone(), 2)
+    print("✓ 预读命中测试通过")
+
+
+def test_ponder_keeps_matching_work():
+    """人类走出预测中的一步后，经过该局面的预测被保留，其他的被丢弃"""
+    print("\n测试保留匹配的预读...")
+    board = Board(seed=4)
+    ai = AIPlayer('normal')
+    ponderer = Ponderer()
+    ponderer.update(board.clone(), 1, ai, 1, 0, {0: 0, 1: 0, 2: 0})
+    # 人类按normal预测器的走法建造
+    x, y, build_type = AIPlayer('normal').choose_build(board, 1)[0]
+    after = board.clone()
+    after.build_piece(x, y, 1, build_type)
+    assert wait_for(lambda: any(after.state_key() in e.path for e in list(ponderer.table.values())))
+    ponderer.stop()
+    board.build_piece(x, y, 1, build_type)
+    ponderer.update(board.clone(), 1, ai, 1, 1, {0: 1, 1: 0, 2: 0})
+    ponderer.stop()
+    assert ponderer.table, "经过当前局面的预测应被保留"
+    for entry in ponderer.table.values():
+        assert board.state_key() in entry.path
+    print("✓ 保留匹配的预读测试通过")
+
+
+def main():
+    test_ponder_hit_when_human_passes()
+    test_ponder_keeps_matching_work()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧耗时统计测试：嵌套阶段只计自身时间、只统计主线程、棋盘计时只包装界面棋盘、CSV导出与性能面板
+"""
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import csv
+import random
+import tempfile
+import threading
+import time
+import pygame
+from board import Board
+from profiler import FrameProfiler, WAIT_STAGE, percentile
+
+
+def test_nested_stages_are_exclusive():
+    """子阶段的时间不计入父阶段，等待时间不算忙碌"""
+    print("测试嵌套阶段计时...")
+    profiler = FrameProfiler()
+    for _ in range(3):
+        profiler.frame()
+        with profiler.stage('render'):
+            time.sleep(0.01)
+            with profiler.stage('board_draw'):
+                time.sleep(0.02)
+        with profiler.stage(WAIT_STAGE):
+            time.sleep(0.03)
+    profiler.frame()
+    total, stages = profiler.frames[-1]
+    assert 0.009 < stages['render'] < 0.019, "父阶段不应包含子阶段"
+    assert 0.019 < stages['board_draw'] < 0.029
+    assert abs(total - sum(stages.values())) < 0.005, "各阶段之和应接近整帧耗时"
+    summary = profiler.summary()
+    assert summary['frames'] == 3
+    assert 29 < summary['p50'] < 40, f"忙碌时间不含等待: {summary['p50']}"
+    assert [name for name, _, _ in summary['stages']][:2] == [WAIT_STAGE, 'board_draw']
+    assert percentile([1, 2, 3, 4], 0.5) in (2, 3) and percentile([], 0.99) == 0.0
+    print("✓ 嵌套阶段计时测试通过")
+
+
+def test_board_instrument_and_threads():
+    """界面棋盘的变更方法被计时，副本不受影响；其他线程调用不计"""
+    print("\n测试棋盘计时...")
+    random.seed(4)
+    board = Board(seed=4)
+    profiler = FrameProfiler()
+    profiler.instrument(board)
+    profiler.instrument(board)  # 重复包装无效
+    clone = board.clone()
+    assert 'update_all_status' in board.__dict__ and 'update_all_status' not in clone.__dict__
+    profiler.frame()
+    board.update_all_status()
+    thread = threading.Thread(target=board.update_all_status)
+    thread.start()
+    thread.join()
+    profiler.frame()
+    _, stages = profiler.frames[-1]
+    assert list(stages) == ['board.update_all_status']
+
+    path = os.path.join(tempfile.mkdtemp(), 'profile.csv')
+    assert profiler.dump_csv(path) == path
+    with open(path, encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['frame', 'total_ms', 'busy_ms', 'board.update_all_status']
+    assert len(rows) == 2
+    print("✓ 棋盘计时测试通过")
+
+
+def test_overlay_in_game():
+    """F3打开性能面板后每帧刷新面板区域，统计里有主循环各阶段"""
+    print("\n测试性能面板...")
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    from game import Game
+    random.seed(3)
+    game = Game(screen)
+    game.game_mode = 'pvp'
+    game.show_start_menu = False
+    game.init_game()
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_F3))
+    pygame.time.set_timer(pygame.QUIT, 1500, loops=1)
+    game.run()
+    assert game.profiler.visible
+    assert game.renderer.regions['profiler'][0] is not None
+    names = set(game.profiler.stages)
+    assert {'events', 'render', 'board_draw', 'draw_ui', 'highlights', WAIT_STAGE} <= names, names
+    print("\n".join("  " + line for line in game.profiler.lines()))
+    game.cancel_ai()
+    print("✓ 性能面板测试通过")
+
+
+def main():
+    test_nested_stages_are_exclusive()
+    test_board_instrument_and_threads()
+    test_overlay_in_game()
+
+
+if __name__ == "__main__":
+    main()
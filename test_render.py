@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面刷新测试：画面不变时跳过重画，局面变化只推送变化的格子，增量画面与整屏重画逐像素一致；
+空闲时主循环阻塞等待事件，网络线程投递的事件能及时唤醒；文字缓存命中与LRU淘汰；
+图集批量贴图与逐个调用pygame.draw画出的棋盘逐像素一致
+"""
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import random
+import threading
+import time
+import pygame
+from board import Board, BOARD_SIZE, MOUNTAIN
+from piece import Piece, PieceType, Player
+from game import Game, NET_EVENT, get_chinese_font
+from render import TextCache, draw_piece, sprite_atlas, PIECE_COLORS, TERRAIN_COLORS, MOUNTAIN_COLOR, INFLUENCE_COLORS
+
+
+def make_game():
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    random.seed(3)
+    game = Game(screen)
+    game.game_mode = 'pvp'
+    game.show_start_menu = False
+    game.init_game()
+    return game
+
+
+def full_redraw(game):
+    """在另一块画布上整屏重画，作为比较的基准"""
+    surface = pygame.Surface(game.screen.get_size())
+    surface.fill(game.renderer.background)
+    screen, game.screen = game.screen, surface
+    try:
+        game.draw_game(game.board_marks())
+    finally:
+        game.screen = screen
+    return surface
+
+
+def assert_matches_full(game, label):
+    assert pygame.image.tobytes(game.screen, 'RGB') == pygame.image.tobytes(full_redraw(game), 'RGB'), \
+        f"{label}: 增量画面与整屏重画不一致"
+
+
+def test_static_frames_skipped():
+    """第一帧整屏绘制，之后画面不变的帧既不重画也不推送"""
+    print("测试静止画面跳过重画...")
+    game = make_game()
+    game.render_frame()
+    assert game.renderer.frames == 1
+    for _ in range(10):
+        game.render_frame()
+    assert game.renderer.frames == 1 and game.renderer.skipped == 10
+    game.renderer.reset()
+    game.render_frame()
+    assert game.renderer.frames == 2, "整屏失效后应重画"
+    game.cancel_ai()
+    print("✓ 静止画面跳过重画测试通过")
+
+
+def test_incremental_matches_full():
+    """选中、行军、高亮、弹窗、胜负等变化后，只推送变化的区域且画面与整屏重画一致"""
+    print("\n测试增量重画...")
+    game = make_game()
+    game.render_frame()
+    offset_x, offset_y, tile_size, _ = game.board_layout()
+    cell_area = tile_size * tile_size
+
+    tower = next(p for p in game.board.pieces if p.player.value == 1 and p.type == PieceType.TOWER)
+    game.selected = (tower.x, tower.y)
+    game.render_frame()
+    assert [r.size for r in game.renderer.updated] == [(tile_size, tile_size)], "选中只应推送一个格子"
+    assert_matches_full(game, "选中")
+
+    game.selected = None
+    game.highlight_farmland = True
+    game.render_frame()
+    area = sum(r.width * r.height for r in game.renderer.updated)
+    assert 0 < area <= cell_area * BOARD_SIZE * BOARD_SIZE
+    assert_matches_full(game, "耕地区高亮")
+
+    x, y = next((x, y) for y in range(BOARD_SIZE) for x in range(BOARD_SIZE) if game.board.can_build(x, y, 1, 0))
+    game.board.build_piece(x, y, 1, 0)
+    game.render_frame()
+    assert_matches_full(game, "建造")
+
+    game.step = 1
+    game.build_popup = (x, y)
+    game.render_frame()
+    assert_matches_full(game, "打开弹窗")
+    game.build_popup = None
+    game.render_frame()
+    assert_matches_full(game, "关闭弹窗")
+
+    game.game_over, game.winner = True, 2
+    game.render_frame()
+    assert_matches_full(game, "胜负")
+    frames = game.renderer.frames
+    game.render_frame()
+    assert game.renderer.frames == frames
+    game.cancel_ai()
+    print(f"  共重画 {game.renderer.frames} 帧，跳过 {game.renderer.skipped} 帧")
+    print("✓ 增量重画测试通过")
+
+
+def test_idle_loop_blocks():
+    """空闲的客户端几乎不走帧；网络线程投递的事件在一帧内唤醒主循环"""
+    print("\n测试空闲时阻塞等待...")
+    game = make_game()
+    assert game.is_idle()
+    game.build_popup, game.build_preview, game.step = None, (0, 0, 0), 1
+    assert not game.is_idle(), "建造预览闪烁时需要逐帧刷新"
+    game.build_preview, game.step = None, 0
+    game.esc_down_time = time.time()
+    assert not game.is_idle(), "长按ESC计时时需要逐帧刷新"
+    game.esc_down_time = None
+
+    pygame.event.clear()
+    threading.Timer(0.2, game.wake).start()
+    start = time.perf_counter()
+    events = game.next_events()
+    waited = time.perf_counter() - start
+    assert [e.type for e in events] == [NET_EVENT]
+    assert 0.15 < waited < 0.2 + 1 / 30, f"唤醒延迟 {waited * 1000:.0f}ms"
+
+    pygame.time.set_timer(pygame.QUIT, 2000, loops=1)
+    cpu = time.process_time()
+    game.run()
+    cpu = time.process_time() - cpu
+    loops = game.renderer.frames + game.renderer.skipped
+    print(f"  唤醒延迟 {waited * 1000:.0f}ms，空闲2秒走了 {loops} 帧，CPU {cpu * 1000:.0f}ms")
+    assert loops <= 5, "空闲时不应按30帧/秒轮询"
+    print("✓ 空闲时阻塞等待测试通过")
+
+
+def test_text_cache():
+    """相同文字只渲染一次；超出容量时淘汰最久未用的；整帧重画时文字全部命中缓存"""
+    print("\n测试文字缓存...")
+    pygame.init()
+    font = get_chinese_font(18)
+    assert get_chinese_font(18) is font, "同一字号应复用字体对象"
+    cache = TextCache()
+    first = cache.render(font, "农田3", (0, 0, 0))
+    assert cache.render(font, "农田3", [0, 0, 0]) is first
+    assert cache.render(font, "农田3", (255, 0, 0)) is not first, "颜色不同不能命中"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    size = first.get_pitch() * first.get_height()
+    small = TextCache(max_bytes=size * 2)
+    a = small.render(font, "农田3", (0, 0, 0))
+    small.render(font, "工业3", (0, 0, 0))
+    small.render(font, "农田3", (0, 0, 0))  # a变成最近使用
+    small.render(font, "军队3", (0, 0, 0))
+    assert small.bytes <= small.max_bytes
+    assert small.render(font, "农田3", (0, 0, 0)) is a, "最近用过的应保留"
+    assert len(small.entries) == 2
+
+    game = make_game()
+    game.draw_game(game.board_marks())
+    misses = game.text_cache.misses
+    start = time.perf_counter()
+    for _ in range(20):
+        game.draw_game(game.board_marks())
+    cached = (time.perf_counter() - start) / 20
+    assert game.text_cache.misses == misses, "局面不变时文字应全部命中"
+    game.text_cache.max_bytes = 0
+    start = time.perf_counter()
+    for _ in range(20):
+        game.draw_game(game.board_marks())
+    uncached = (time.perf_counter() - start) / 20
+    print(f"  整帧绘制 缓存 {cached * 1000:.2f}ms, 不缓存 {uncached * 1000:.2f}ms")
+    game.cancel_ai()
+    print("✓ 文字缓存测试通过")
+
+
+def draw_direct(board, screen, offset_x, offset_y, tile_size, selected=None):
+    """逐格、逐个棋子调用pygame.draw的参考实现（图集之前的Board.draw）"""
+    for player in [1, 2]:
+        for (x, y) in board.influence[player]:
+            s = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
+            s.fill(INFLUENCE_COLORS[player])
+            screen.blit(s, (offset_x + x*tile_size, offset_y + y*tile_size))
+    for y in range(BOARD_SIZE):
+        for x in range(BOARD_SIZE):
+            rect = pygame.Rect(offset_x + x*tile_size, offset_y + y*tile_size, tile_size, tile_size)
+            pygame.draw.rect(screen, TERRAIN_COLORS.get(board.grid[y][x], MOUNTAIN_COLOR), rect)
+            pygame.draw.rect(screen, (80, 80, 80), rect, 1)
+            if selected and (x, y) == selected:
+                pygame.draw.rect(screen, (255, 180, 60), rect, 4)
+    for piece in board.pieces:
+        color = PIECE_COLORS[piece.type][0 if piece.player == Player.WHITE else 1]
+        draw_piece(screen, piece.type, color, offset_x + piece.x*tile_size + tile_size//2,
+                   offset_y + piece.y*tile_size + tile_size//2, tile_size)
+
+
+def crowded_board():
+    """除山脉外每个格子都摆上棋子的棋盘"""
+    random.seed(5)
+    board = Board(seed=5)
+    types = [PieceType.ARMY, PieceType.FARM, PieceType.INDUSTRY]
+    for y in range(BOARD_SIZE):
+        for x in range(BOARD_SIZE):
+            if board.grid[y][x] != MOUNTAIN and board.get_piece(x, y) is None:
+                board.pieces.append(Piece(types[(x + y) % 3], Player(1 + x % 2), x, y))
+    return board
+
+
+def test_atlas_matches_direct_draw():
+    """各种格子大小下图集绘制与直接绘制逐像素一致，满棋盘时更快"""
+    print("\n测试棋子图集...")
+    pygame.init()
+    board = crowded_board()
+    for tile_size in (17, 31, 44):
+        size = (tile_size * BOARD_SIZE + 20, tile_size * BOARD_SIZE + 20)
+        expected, actual = pygame.Surface(size), pygame.Surface(size)
+        expected.fill((220, 220, 220))
+        actual.fill((220, 220, 220))
+        draw_direct(board, expected, 10, 10, tile_size, selected=(3, 4))
+        board.draw(actual, 0, 0, (3, 4), offset_x=10, offset_y=10, board_pixel=tile_size * BOARD_SIZE)
+        assert pygame.image.tobytes(actual, 'RGB') == pygame.image.tobytes(expected, 'RGB'), f"格子{tile_size}像素不一致"
+    assert sprite_atlas(31) is sprite_atlas(31), "同一格子大小不应重新生成图集"
+
+    screen = pygame.Surface((700, 700))
+    start = time.perf_counter()
+    for _ in range(50):
+        draw_direct(board, screen, 10, 10, 44)
+    direct = (time.perf_counter() - start) / 50
+    start = time.perf_counter()
+    for _ in range(50):
+        board.draw(screen, 0, 0, offset_x=10, offset_y=10, board_pixel=44 * BOARD_SIZE)
+    batched = (time.perf_counter() - start) / 50
+    print(f"  {len(board.pieces)} 个棋子：图集 {batched * 1000:.2f}ms, 直接绘制 {direct * 1000:.2f}ms")
+    assert batched < direct
+    print("✓ 棋子图集测试通过")
+
+
+def main():
+    test_static_frames_skipped()
+    test_incremental_matches_full()
+    test_idle_loop_blocks()
+    test_text_cache()
+    test_atlas_matches_direct_draw()
+
+
+if __name__ == "__main__":
+    main()
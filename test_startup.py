@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+客户端启动测试：在新的解释器里测量导入、创建Game、画出主菜单第一帧的耗时，
+并检查网络/对话框相关模块、字体与棋盘都推迟到第一次使用时才加载
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 在子进程里执行，输出一行JSON
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import pygame
+pygame.init()
+screen = pygame.display.set_mode((800, 600))
+ready = time.perf_counter()
+import game
+imported = time.perf_counter()
+g = game.Game(screen)
+created = time.perf_counter()
+g.render_frame()
+drawn = time.perf_counter()
+print(json.dumps({
+    'pygame_ms': (ready - start) * 1000,
+    'import_ms': (imported - ready) * 1000,
+    'init_ms': (created - imported) * 1000,
+    'first_frame_ms': (drawn - created) * 1000,
+    'total_ms': (drawn - start) * 1000,
+    'modules': [m for m in ('tkinter', 'websocket', 'websockets', 'argparse', 'concurrent.futures') if m in sys.modules],
+    'fonts': len(getattr(game, '_fonts', {})),
+    'board': getattr(g, 'board', None) is not None,
+}))
+g.cancel_ai()
+"""
+
+
+def measure_startup(runs=3):
+    """启动多次取各项耗时的中位数"""
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=HERE, env=env,
+                             capture_output=True, text=True, timeout=120).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    merged = dict(results[0])
+    for key in merged:
+        if key.endswith('_ms'):
+            merged[key] = sorted(r[key] for r in results)[len(results) // 2]
+    return merged
+
+
+def test_startup_is_lazy():
+    """主菜单出来时还没有导入对话框、网络、离线工具模块，没有生成棋盘，只加载了菜单用到的字号
+    （subprocess、socket会被pygame自己导入，不在检查之列）"""
+    print("测试客户端启动...")
+    result = measure_startup()
+    print("  " + ", ".join(f"{k} {v:.1f}" for k, v in result.items() if k.endswith('_ms')))
+    assert result['modules'] == [], f"不应提前导入: {result['modules']}"
+    assert not result['board'], "进入对局前不应生成棋盘"
+    assert 0 < result['fonts'] <= 3, f"主菜单只用到少数字号，实际加载了{result['fonts']}个"
+    print("✓ 客户端启动测试通过")
+
+
+def test_font_path_cache():
+    """字体路径读磁盘缓存；缓存的文件不存在时重新解析并写回"""
+    print("\n测试字体路径缓存...")
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    import game
+    pygame.font.init()
+    saved = game.FONT_CACHE_FILE, game._font_path
+    try:
+        game.FONT_CACHE_FILE = os.path.join(tempfile.mkdtemp(), 'font_cache.json')
+        fake = os.path.abspath(__file__)  # 任意存在的文件，只检查不加载
+        with open(game.FONT_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'platform': sys.platform, 'path': fake}, f)
+        game._font_path = False
+        assert game.resolve_font_path() == fake, "应直接采用缓存的路径"
+
+        with open(game.FONT_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'platform': sys.platform, 'path': fake + '.missing'}, f)
+        game._font_path = False
+        resolved = game.resolve_font_path()
+        assert resolved != fake + '.missing'
+        with open(game.FONT_CACHE_FILE, encoding='utf-8') as f:
+            assert json.load(f)['path'] == resolved, "重新解析的结果应写回缓存"
+    finally:
+        game.FONT_CACHE_FILE, game._font_path = saved
+    print("✓ 字体路径缓存测试通过")
+
+
+def main():
+    test_startup_is_lazy()
+    test_font_path_cache()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量同步测试：自对弈中逐步生成的增量应用到另一块棋盘后局面一致，增量大小与变化量成正比；
+序号接不上的增量不被应用；服务器转发增量、对过期增量回发快照、按窗口补发或发送快照；
+客户端漏收增量时请求重新同步
+"""
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import asyncio
+import json
+import random
+import time
+import pygame
+from ai import AIPlayer
+from board import Board, BOARD_SIZE, LAND
+from bot_pool import BotPool, board_state
+from game import Game
+from server import GameServer
+from sync import SyncState, SYNC_WINDOW, board_cells, apply_delta, load_snapshot
+from test_bot_pool import FakeSocket
+
+
+def play_actions(board, turns, seed):
+    """自对弈，逐个产出(玩家, 动作)"""
+    ais = {1: AIPlayer('easy', search='greedy', seed=seed), 2: AIPlayer('easy', search='greedy', seed=seed + 1)}
+    for turn in range(turns):
+        player = 1 + turn % 2
+        trial = board.clone()
+        for action in ais[player].play_turn(trial, player):
+            yield player, action
+        if trial.winner:
+            return
+        yield player, ('end_turn', None)
+
+
+def apply_action(board, player, action):
+    kind, args = action
+    if kind == 'move':
+        board.move_piece(*args)
+    elif kind == 'build':
+        x, y, build_type = args
+        board.build_piece(x, y, player, build_type)
+    elif kind == 'remove':
+        board.remove_piece(*args)
+    elif kind == 'end_turn':
+        board.reset_move_count(3 - player)
+
+
+def test_deltas_replay_self_play():
+    """每个动作之后生成增量，经JSON传到另一块棋盘上应用，两边始终一致"""
+    print("测试自对弈增量同步...")
+    random.seed(11)
+    board = Board(seed=11)
+    state = json.loads(json.dumps(board_state(board)))
+    mirror = Board(seed=11)
+    sender = SyncState.from_board(board)
+    receiver = SyncState.from_init_state(state)
+    assert receiver.cells == sender.cells
+    delta_bytes, snapshot_bytes, parse_time, updates = 0, 0, 0.0, 0
+    for player, action in play_actions(board, 30, seed=11):
+        apply_action(board, player, action)
+        delta = sender.diff(board_cells(board), {"winner": board.winner})
+        if delta is None:
+            continue
+        text = json.dumps(delta)
+        start = time.perf_counter()
+        received = json.loads(text)
+        assert receiver.apply(received)
+        parse_time += time.perf_counter() - start
+        apply_delta(mirror, received)
+        assert board_cells(mirror) == board_cells(board), f"{action}之后局面不一致"
+        assert mirror.winner == board.winner
+        delta_bytes += len(text)
+        snapshot_bytes += len(json.dumps(sender.snapshot()))
+        updates += 1
+    assert updates > 20 and receiver.seq == sender.seq == updates
+    assert sender.diff(board_cells(board), {"winner": board.winner}) is None, "没有变化时不生成增量"
+    print(f"  {updates}条增量，平均 {delta_bytes / updates:.0f} 字节（完整快照平均 {snapshot_bytes / updates:.0f} 字节），"
+          f"解析并应用平均 {parse_time / updates * 1e6:.0f}us")
+    assert delta_bytes * 5 < snapshot_bytes
+    print("✓ 自对弈增量同步测试通过")
+
+
+def test_out_of_order_rejected():
+    print("\n测试序号检查...")
+    board = Board(seed=2)
+    sender = SyncState.from_board(board)
+    receiver = SyncState.from_board(board)
+    army = next(p for p in board.pieces if p.player.value == 1)
+    deltas = []
+    for moves in (1, 2):
+        army.move_count = moves
+        deltas.append(sender.diff(board_cells(board)))
+    before = dict(receiver.cells)
+    assert not receiver.apply(deltas[1]), "跳过的增量不能应用"
+    assert receiver.cells == before and receiver.seq == 0
+    assert receiver.apply(deltas[0]) and receiver.apply(deltas[1])
+    assert not receiver.apply(deltas[1]), "重复的增量不能应用"
+    assert receiver.cells == sender.cells
+
+    # 快照还原到另一块棋盘
+    other = Board(seed=3)
+    load_snapshot(other, json.loads(json.dumps(sender.snapshot())))
+    assert board_cells(other) == board_cells(board) and other.grid == board.grid
+    print("✓ 序号检查测试通过")
+
+
+def test_server_relays_and_resyncs():
+    """服务器转发增量、拒绝过期增量并回发快照、按窗口补发，落后太多时发送快照"""
+    print("\n测试服务器增量同步...")
+    board = Board(seed=5)
+    init_state = json.loads(json.dumps(board_state(board)))
+
+    async def run():
+        server = GameServer(BotPool(workers=1))
+        host, guest = FakeSocket(), FakeSocket()
+        try:
+            await server.handle_join(host, {"type": "join", "room": "r", "name": "host"})
+            await server.handle_join(guest, {"type": "join", "room": "r", "name": "guest"})
+            await server.handle_init_state_sync(host, {"init_state": init_state})
+            await server.handle_ready(host, {})
+            await server.handle_ready(guest, {})
+            room = server.rooms["r"]
+            assert room.game_started and room.sync.seq == 0
+
+            local = SyncState.from_board(board)
+            pieces = [p for p in board.pieces if p.player.value == 1]
+            deltas = []
+            for i in range(SYNC_WINDOW + 5):
+                pieces[i % len(pieces)].move_count = i + 1
+                delta = local.diff(board_cells(board))
+                deltas.append(delta)
+                await server.handle_state_delta(host, {"delta": delta})
+                await asyncio.sleep(0)  # 让广播任务执行
+            assert room.sync.seq == len(deltas) and room.sync.cells == local.cells
+            relayed = [m["delta"] for m in guest.of_type("state_delta")]
+            assert relayed == deltas and not host.of_type("state_delta"), "增量只转发给对方"
+
+            # 基于旧序号的增量：不应用，回给发送方快照
+            await server.handle_state_delta(guest, {"delta": dict(deltas[0], counters={"move_used": 9})})
+            snapshot = guest.of_type("state_snapshot")[-1]["snapshot"]
+            assert snapshot["seq"] == room.sync.seq and room.sync.counters["move_used"] == 0
+
+            # 漏收的还在窗口内：补发增量
+            guest.sent.clear()
+            await server.handle_resync_request(guest, {"since": len(deltas) - 3})
+            assert [m["delta"]["seq"] for m in guest.sent] == [len(deltas) - 2, len(deltas) - 1, len(deltas)]
+            # 超出窗口：发送快照；已是最新：不发送
+            guest.sent.clear()
+            await server.handle_resync_request(guest, {"since": 1})
+            assert [m["type"] for m in guest.sent] == ["state_snapshot"]
+            guest.sent.clear()
+            await server.handle_resync_request(guest, {"since": room.sync.seq})
+            assert guest.sent == []
+        finally:
+            server.bots.shutdown()
+
+    asyncio.run(run())
+    print("✓ 服务器增量同步测试通过")
+
+
+def test_client_requests_resync():
+    """客户端收到接不上的增量时请求补发（只请求一次），补上后继续应用；快照以服务器为准"""
+    print("\n测试客户端重新同步...")
+    pygame.init()
+    game = Game(pygame.display.set_mode((800, 600)))
+    game.game_mode = 'net'
+    game.show_start_menu = False
+    game.init_game()
+    sent = []
+    game.net_send = lambda message: sent.append(message) or True
+    game.player_side, game.net_is_my_turn = 2, False
+    game.net_sync = SyncState.from_board(game.board)
+
+    remote = SyncState.from_board(game.board)
+    board = game.board.clone()
+    deltas = []
+    empty = [(x, y) for y in range(BOARD_SIZE) for x in range(BOARD_SIZE)
+             if board.grid[y][x] == LAND and board.get_piece(x, y) is None]
+    for x, y in empty[:3]:
+        board.build_piece(x, y, 1, 0)  # 只为制造局面变化，不检查是否合法
+        deltas.append(remote.diff(board_cells(board), {"move_used": len(deltas) + 1}))
+
+    game.apply_state_delta(deltas[0])
+    game.apply_state_delta(deltas[2])
+    game.apply_state_delta(deltas[2])
+    assert sent == [{"type": "resync_request", "since": 1}], sent
+    game.apply_state_delta(deltas[1])
+    game.apply_state_delta(deltas[2])
+    assert board_cells(game.board) == board_cells(board) and game.move_used == 3
+
+    # 自己的回合才发布增量
+    game.publish_state()
+    assert len(sent) == 1
+    game.net_is_my_turn, game.current_player = True, 2
+    game.move_used = 4
+    game.publish_state()
+    assert sent[-1]["type"] == "state_delta" and sent[-1]["delta"] == {"seq": 4, "base": 3, "counters": {"move_used": 4}}
+
+    game.load_state_snapshot(remote.snapshot())
+    assert game.net_sync.seq == 3 and game.move_used == 3
+    print("✓ 客户端重新同步测试通过")
+
+
+def main():
+    test_deltas_replay_self_play()
+    test_out_of_order_rejected()
+    test_server_relays_and_resyncs()
+    test_client_requests_resync()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+攻破王塔战术求解测试
+"""
+
+import random
+import time
+from board import Board, MOUNTAIN
+from piece import PieceType
+from ai import AIPlayer
+from tactics import find_capture, find_forced_capture, solve
+from test_planner import make_board
+
+
+# 白方的王塔与资源（足够行军，不处于濒危），各测试局面在此基础上摆放
+WHITE_BASE = [
+    (PieceType.TOWER, 1, 0, 0),
+    (PieceType.FARM, 1, 3, 0),
+    (PieceType.FARM, 1, 0, 3),
+    (PieceType.INDUSTRY, 1, 3, 3),
+]
+
+
+def replay(board, player, moves, move_limit):
+    """按规则执行行军序列，返回是否吃掉王塔"""
+    board = board.clone()
+    for used, (sx, sy, tx, ty) in enumerate(moves):
+        assert board.can_move_army(sx, sy, tx, ty, player, used, move_limit), f"第{used + 1}步不合法: {moves}"
+        board.move_piece(sx, sy, tx, ty)
+    return board.winner == player
+
+
+def test_capture_this_turn():
+    """步数够时找到吃塔路线，步数不够时找不到"""
+    print("测试本回合吃塔...")
+    board = make_board([(PieceType.TOWER, 2, 10, 10), (PieceType.ARMY, 1, 7, 7)], base=WHITE_BASE)
+    line = find_capture(board, 1, 2)
+    assert line is not None and replay(board, 1, line, 2), f"应能吃塔: {line}"
+    assert find_capture(board, 1, 1) is None, "只有1步时不能吃塔"
+    print("✓ 本回合吃塔测试通过")
+
+
+def test_blockers_and_move_count():
+    """山脉与己方棋子挡路、单支军队步数用尽都要考虑"""
+    print("\n测试阻挡与步数限制...")
+    board = make_board([(PieceType.TOWER, 2, 10, 10), (PieceType.ARMY, 1, 8, 8)], base=WHITE_BASE)
+    for x, y in [(9, 8), (9, 9), (8, 9)]:
+        board.grid[y][x] = MOUNTAIN
+    line = find_capture(board, 1, 3)
+    assert line is not None and replay(board, 1, line, 3), "应绕开山脉吃塔"
+    assert len(line) == 4, f"绕路需要3步+吃塔: {line}"
+    assert find_capture(board, 1, 2) is None, "步数不够绕路"
+    army = board.get_piece(8, 8)
+    army.move_count = 1
+    assert find_capture(board, 1, 3) is None, "该军队本回合只剩2步"
+    print("✓ 阻挡与步数限制测试通过")
+
+
+def test_capture_chain_is_free():
+    """吃对方军队不受步数限制，可以连吃到王塔"""
+    print("\n测试连吃...")
+    board = make_board([
+        (PieceType.TOWER, 2, 10, 10),
+        (PieceType.ARMY, 1, 7, 7),
+        (PieceType.ARMY, 2, 8, 8),
+        (PieceType.ARMY, 2, 9, 9),
+    ], base=WHITE_BASE)
+    line = find_capture(board, 1, 0)
+    assert line is not None and replay(board, 1, line, 0), f"应能连吃到王塔: {line}"
+    print("✓ 连吃测试通过")
+
+
+def test_forced_capture_next_turn():
+    """本回合走近，下回合对方单步防守挡不住"""
+    print("\n测试两回合杀棋...")
+    board = make_board([(PieceType.TOWER, 2, 10, 10), (PieceType.ARMY, 1, 5, 5)], base=WHITE_BASE)
+    assert find_capture(board, 1, 3) is None
+    tactic = solve(board, 1, 3, depth=2, time_limit=1.0)
+    assert tactic is not None and tactic.depth == 2, f"应找到两回合杀棋: {tactic}"
+    trial = board.clone()
+    for used, (sx, sy, tx, ty) in enumerate(tactic.moves):
+        assert trial.can_move_army(sx, sy, tx, ty, 1, used, 3)
+        trial.move_piece(sx, sy, tx, ty)
+    trial.reset_move_count(1)
+    assert find_capture(trial, 1, trial.get_move_limit(1)) is not None, "对方不动时下回合应能吃塔"
+    print("✓ 两回合杀棋测试通过")
+
+
+def test_no_forced_capture_when_enemy_wins_first():
+    """对方能先手吃塔时不算必胜"""
+    print("\n测试对方先手...")
+    board = make_board([
+        (PieceType.TOWER, 2, 10, 10),
+        (PieceType.ARMY, 1, 5, 5),
+        (PieceType.ARMY, 2, 1, 1),
+        (PieceType.FARM, 2, 13, 13),
+        (PieceType.FARM, 2, 12, 13),
+        (PieceType.INDUSTRY, 2, 13, 12),
+    ], base=WHITE_BASE)
+    assert find_capture(board, 2, board.get_move_limit(2)) is not None, "黑方军队紧挨白方王塔"
+    assert find_forced_capture(board, 1, 3, time_limit=1.0) is None, "对方下回合先吃掉白方王塔"
+    print("✓ 对方先手测试通过")
+
+
+def test_ai_takes_tower_and_speed():
+    """自对弈局面中求解足够快；AI能吃塔时一定吃"""
+    print("\n测试求解速度...")
+    random.seed(3)
+    board = Board(seed=3)
+    ai = AIPlayer('normal')
+    elapsed = []
+    player = 1
+    for _ in range(60):
+        limit = board.get_move_limit(player)
+        board.reset_move_count(player)
+        start = time.perf_counter()
+        line = find_capture(board, player, limit)
+        elapsed.append(time.perf_counter() - start)
+        ai.play_turn(board, player)
+        if line is not None:
+            assert board.winner == player, "有吃塔路线时AI应直接吃塔"
+        if board.winner:
+            break
+        player = 3 - player
+    average = sum(elapsed) / len(elapsed)
+    print(f"  平均求解 {average * 1000:.2f}ms")
+    assert average < 0.01, "本回合吃塔求解应在毫秒级"
+    print("✓ 求解速度测试通过")
+
+
+def main():
+    test_capture_this_turn()
+    test_blockers_and_move_count()
+    test_capture_chain_is_free()
+    test_forced_capture_next_turn()
+    test_no_forced_capture_when_enemy_wins_first()
+    test_ai_takes_tower_and_speed()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+威胁图测试：增量结果与从头计算一致，攻击范围与行动点、濒危状态相符
+"""
+
+import random
+from board import Board, BOARD_SIZE
+from piece import Piece, PieceType, Player
+from ai import AIPlayer
+from distance import DistanceMaps
+from threats import ThreatMap, threats_for
+from test_planner import make_board
+
+
+def scan_attack(board, player):
+    """逐军队计算的参考实现"""
+    maps = DistanceMaps.for_grid(board.grid)
+    if board.danger[player]:
+        return [0] * (BOARD_SIZE * BOARD_SIZE)
+    radius = min(3, board.get_move_limit(player)) + 1
+    attack = [0] * (BOARD_SIZE * BOARD_SIZE)
+    for army in board.get_player_pieces(player, PieceType.ARMY):
+        field = maps.field(army.x, army.y)
+        for i, d in enumerate(field):
+            if 0 < d <= radius:
+                attack[i] += 1
+    return attack
+
+
+def test_incremental_matches_scan():
+    """自对弈若干回合，增量威胁图与逐军队计算一致"""
+    print("测试增量更新...")
+    random.seed(5)
+    board = Board(seed=5)
+    threats = threats_for(board)
+    ais = {1: AIPlayer('normal', search='greedy'), 2: AIPlayer('hard', time_limit=0.05)}
+    for turn in range(40):
+        player = 1 + turn % 2
+        ais[player].play_turn(board, player)
+        for pl in (1, 2):
+            assert threats.attack[pl] == scan_attack(board, pl), f"第{turn}回合玩家{pl}威胁图不一致"
+        copy = board.clone()
+        assert not any(isinstance(obs, ThreatMap) for obs in copy.observers), "推演用的复制不应维护威胁图"
+        assert threats_for(copy).attack == threats.attack
+        if board.winner:
+            break
+    print("✓ 增量更新测试通过")
+
+
+def test_radius_follows_move_limit():
+    """攻击半径为 min(3, 行动点) + 1，建造工业后半径变大"""
+    print("\n测试攻击半径...")
+    board = make_board([
+        (PieceType.TOWER, 1, 0, 0),
+        (PieceType.TOWER, 2, 13, 13),
+        (PieceType.FARM, 1, 3, 0),
+        (PieceType.FARM, 1, 0, 3),
+        (PieceType.FARM, 1, 3, 3),
+        (PieceType.FARM, 1, 4, 0),
+        (PieceType.INDUSTRY, 1, 4, 4),
+        (PieceType.ARMY, 1, 7, 7),
+    ])
+    threats = ThreatMap(board)
+    assert board.get_move_limit(1) == 1
+    assert threats.attackers(1, 9, 7) == 1, "行动点1：走1步再吃1步"
+    assert threats.attackers(1, 10, 7) == 0
+    board.pieces.append(Piece(PieceType.INDUSTRY, Player.WHITE, 1, 4))
+    board.notify('add', board.pieces[-1])
+    assert board.get_move_limit(1) == 2
+    assert threats.attackers(1, 10, 7) == 1, "行动点2：半径变为3"
+    print("✓ 攻击半径测试通过")
+
+
+def test_hanging_and_safe_square():
+    """受威胁且无人保护的军队算作悬空；走到敌军范围内需要己方保护"""
+    print("\n测试悬空棋子...")
+    board = make_board([
+        (PieceType.TOWER, 1, 0, 0),
+        (PieceType.TOWER, 2, 13, 13),
+        (PieceType.FARM, 1, 3, 0),
+        (PieceType.FARM, 1, 0, 3),
+        (PieceType.INDUSTRY, 1, 3, 3),
+        (PieceType.FARM, 2, 13, 10),
+        (PieceType.FARM, 2, 10, 13),
+        (PieceType.INDUSTRY, 2, 12, 10),
+        (PieceType.ARMY, 1, 6, 6),
+        (PieceType.ARMY, 2, 8, 8),
+    ])
+    threats = ThreatMap(board)
+    assert [(p.x, p.y) for p in threats.hanging(1)] == [(6, 6)], "白方军队受威胁且无人保护"
+    assert not threats.safe_square(1, 7, 7, mover=(6, 6)), "走到敌军旁边会被白吃"
+    assert threats.safe_square(1, 5, 5, mover=(6, 6)), "退到敌军范围外是安全的"
+    assert threats.tower_threat(1) == 0
+    print("✓ 悬空棋子测试通过")
+
+
+def main():
+    test_incremental_matches_scan()
+    test_radius_follows_move_limit()
+    test_hanging_and_safe_square()
+
+
+if __name__ == "__main__":
+    main()
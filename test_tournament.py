@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自对弈锦标赛测试
+"""
+
+import tournament
+from tournament import parse_ai_spec, play_game, fit_elo, run_tournament, summarize
+
+
+def test_parse_ai_spec():
+    """AI配置解析"""
+    print("测试配置解析...")
+    kwargs = parse_ai_spec("hard:search=beam,time_limit=0.2,beam_width=4")
+    assert kwargs == {'difficulty': 'hard', 'search': 'beam', 'time_limit': 0.2, 'beam_width': 4}
+    assert parse_ai_spec("easy") == {'difficulty': 'easy'}
+    print("✓ 配置解析测试通过")
+
+
+def test_seeded_game_is_reproducible():
+    """相同种子的对局结果相同"""
+    print("\n测试对局可复现...")
+    a = play_game(123, "normal", "hard", 40)
+    b = play_game(123, "normal", "hard", 40)
+    assert (a['winner'], a['turns']) == (b['winner'], b['turns'])
+    assert len(a['think'][1]) > 0
+    print(f"✓ 对局可复现测试通过 (胜者{a['winner']}, {a['turns']}回合)")
+
+
+def test_game_seeds_noise_per_side():
+    """两方的噪声种子由对局种子按执子方派生，配置显式给出的种子不被覆盖"""
+    print("\n测试噪声种子...")
+    seeds = []
+    original = tournament.AIPlayer
+
+    class Recording(original):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            seeds.append(self.seed)
+
+    tournament.AIPlayer = Recording
+    try:
+        play_game(5, "easy", "easy", 2)
+        play_game(6, "easy", "easy:seed=99", 2)
+    finally:
+        tournament.AIPlayer = original
+    assert seeds == [11, 12, 13, 99], seeds
+    print("✓ 噪声种子测试通过")
+
+
+def test_fit_elo():
+    """胜多的一方Elo更高，平均分为0"""
+    print("\n测试Elo估计...")
+    games = [("a", "b", 1.0)] * 8 + [("b", "a", 0.0)] * 8 + [("a", "b", 0.0)] * 4
+    ratings = fit_elo(games, ["a", "b"])
+    assert ratings["a"] > 100 > 0 > ratings["b"]
+    assert abs(ratings["a"] + ratings["b"]) < 1e-6
+    print(f"✓ Elo估计测试通过 ({ratings['a']:.0f} / {ratings['b']:.0f})")
+
+
+def test_run_tournament_summary():
+    """单进程跑一个小锦标赛并汇总"""
+    print("\n测试锦标赛汇总...")
+    specs = ["easy", "normal"]
+    results, elapsed = run_tournament(specs, 2, workers=1, max_turns=20)
+    summary = summarize(results, elapsed, specs)
+    assert summary['games'] == 2
+    assert set(summary['players']) == set(specs)
+    for stats in summary['players'].values():
+        lo, hi = stats['ci']
+        assert lo <= hi
+    print("✓ 锦标赛汇总测试通过")
+
+
+def main():
+    test_parse_ai_spec()
+    test_seeded_game_is_reproducible()
+    test_game_seeds_noise_per_side()
+    test_fit_elo()
+    test_run_tournament_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估权重训练测试：批量特征与增量特征一致、逻辑回归能还原权重
+"""
+
+import os
+import tempfile
+import numpy as np
+from board import Board
+from piece import Piece, PieceType, Player
+from evaluation import FeatureAccumulator, FEATURE_NAMES, load_weights, save_weights
+from tournament import play_game
+from train_eval import build_dataset, dataset_features, fit_weights, mirror
+
+
+def test_batch_features_match_accumulator():
+    """NumPy批量提取的特征与FeatureAccumulator.features完全一致"""
+    print("测试批量特征...")
+    result = play_game(5, 'normal', 'hard', max_turns=30, record=True)
+    dataset = build_dataset([result], skip_opening=0)
+    X = dataset_features(dataset, workers=1)
+    assert len(X) == len(result['positions'])
+    for row, pieces in zip(X, result['positions']):
+        board = Board(seed=5)
+        board.grid = result['grid']
+        board.pieces = []
+        for x, y, ptype, player in pieces:
+            board.pieces.append(Piece(PieceType(ptype), Player(player), x, y))
+        acc = FeatureAccumulator(board, attach=False)
+        acc.rebuild()
+        assert list(row) == acc.features(1), f"白方特征不一致: {list(row)} != {acc.features(1)}"
+        assert list(mirror(row[None])[0]) == acc.features(2), "黑方特征不一致"
+    print("✓ 批量特征测试通过")
+
+
+def test_fit_recovers_weights():
+    """在已知权重生成的结果上拟合，还原出相近的权重"""
+    print("\n测试逻辑回归...")
+    rng = np.random.default_rng(0)
+    true = np.array([10, 15, 20, 1, -60, 30, 1], dtype=np.float64)
+    X = rng.normal(0, [3, 2, 2, 20, 0.5, 0.5, 10], size=(20000, len(FEATURE_NAMES)))
+    y = (rng.random(len(X)) < 1 / (1 + np.exp(-X @ true / 100))).astype(np.float64)
+    weights = fit_weights(X, y, ridge=0.1)
+    assert np.all(np.sign(weights) == np.sign(true)), f"权重符号错误: {weights}"
+    assert np.allclose(weights, true, rtol=0.3, atol=3), f"权重偏差过大: {weights}"
+    print("✓ 逻辑回归测试通过")
+
+
+def test_weights_file_round_trip():
+    """权重文件写出后可读回，特征不匹配时忽略"""
+    print("\n测试权重文件...")
+    path = os.path.join(tempfile.mkdtemp(), 'weights.json')
+    save_weights([1, 2, 3, 4, 5, 6, 7], path)
+    assert load_weights(path) == [1, 2, 3, 4, 5, 6, 7]
+    save_weights([1, 2, 3, 4, 5, 6, 7], path, features=['farm'])
+    assert load_weights(path) is None
+    assert load_weights(path + '.missing') is None
+    print("✓ 权重文件测试通过")
+
+
+def main():
+    test_batch_features_match_accumulator()
+    test_fit_recovers_weights()
+    test_weights_file_round_trip()
+
+
+if __name__ == "__main__":
+    main()
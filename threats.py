@@ -0,0 +1,142 @@
+from piece import PieceType
+from board import BOARD_SIZE, ARMY_STEPS, is_endangered
+from distance import DistanceMaps
+
+CELLS = BOARD_SIZE * BOARD_SIZE
+
+
+def threats_for(board):
+    """取得棋盘上挂载的威胁图，没有则创建并挂载（复制出的棋盘在第一次查询时才重建）"""
+    for obs in board.observers:
+        if isinstance(obs, ThreatMap):
+            return obs
+    return ThreatMap(board)
+
+
+class ThreatMap:
+    """双方的攻击范围图
+
+    attack[player][i]为player有多少支军队在下个回合能吃到格子i上的棋子：
+    军队先走不超过 min(3, 行动点) 步，再吃一步（吃子不受步数限制），即攻击半径为 min(3, 行动点) + 1，
+    濒危时不能行军，半径为0。距离使用地形距离（王步、绕开山脉），不考虑其他棋子阻挡。
+    作为棋盘监听者随军队的移动、建造、被吃、易主增量更新；行动点或濒危状态变化导致半径变化时，
+    只重算该方军队的贡献。
+    不随Board.clone复制：束搜索、后台思考的推演节点不查询威胁图，复制过去只会在每个节点上白白维护。
+    """
+    def __init__(self, board, attach=True):
+        self.board = board
+        if attach:
+            self.rebuild()
+            board.add_observer(self)
+
+    def rebuild(self):
+        """按当前棋子从头计算"""
+        self.maps = DistanceMaps.for_grid(self.board.grid)
+        self.counts = {pl: {t: 0 for t in PieceType} for pl in (1, 2)}
+        self.armies = {1: {}, 2: {}}  # 军队id -> 格子下标
+        self.attack = {1: [0] * CELLS, 2: [0] * CELLS}
+        for p in self.board.pieces:
+            self.counts[p.player.value][p.type] += 1
+            if p.type == PieceType.ARMY:
+                self.armies[p.player.value][id(p)] = p.y * BOARD_SIZE + p.x
+        self.radius = {pl: self._radius(pl) for pl in (1, 2)}
+        for pl in (1, 2):
+            for i in self.armies[pl].values():
+                self._spread(pl, i, self.radius[pl], 1)
+
+    # ---- 增量更新 ----
+    def _radius(self, player):
+        """攻击半径：濒危时为0，否则为 min(3, 行动点) + 1（与get_move_limit、update_all_status一致）"""
+        c = self.counts[player]
+        farm, ind, army = c[PieceType.FARM], c[PieceType.INDUSTRY], c[PieceType.ARMY]
+        if is_endangered(farm, ind, army):
+            return 0
+        return min(ARMY_STEPS, max(0, ind - army + 1)) + 1
+
+    def _spread(self, player, i, radius, delta):
+        if radius <= 0:
+            return
+        attack = self.attack[player]
+        for j in self.maps.within(i % BOARD_SIZE, i // BOARD_SIZE, radius):
+            attack[j] += delta
+
+    def _refresh_radius(self):
+        """棋子数量变化后检查双方半径，变化的一方整体重算"""
+        for pl in (1, 2):
+            radius = self._radius(pl)
+            if radius != self.radius[pl]:
+                for i in self.armies[pl].values():
+                    self._spread(pl, i, self.radius[pl], -1)
+                    self._spread(pl, i, radius, 1)
+                self.radius[pl] = radius
+
+    def on_board_change(self, event, piece, old):
+        if event == 'reset':
+            self.rebuild()
+            return
+        player = piece.player.value
+        i = piece.y * BOARD_SIZE + piece.x
+        if event == 'add':
+            self.counts[player][piece.type] += 1
+            if piece.type == PieceType.ARMY:
+                self.armies[player][id(piece)] = i
+                self._spread(player, i, self.radius[player], 1)
+        elif event == 'remove':
+            self.counts[player][piece.type] -= 1
+            if piece.type == PieceType.ARMY:
+                del self.armies[player][id(piece)]
+                self._spread(player, i, self.radius[player], -1)
+        elif event == 'move':
+            if piece.type == PieceType.ARMY:
+                j = self.armies[player][id(piece)]
+                self.armies[player][id(piece)] = i
+                self._spread(player, j, self.radius[player], -1)
+                self._spread(player, i, self.radius[player], 1)
+            return
+        elif event == 'owner':
+            self.counts[old][piece.type] -= 1
+            self.counts[player][piece.type] += 1
+            if piece.type == PieceType.ARMY:
+                del self.armies[old][id(piece)]
+                self._spread(old, i, self.radius[old], -1)
+                self.armies[player][id(piece)] = i
+                self._spread(player, i, self.radius[player], 1)
+        self._refresh_radius()
+
+    # ---- O(1)查询 ----
+    def attackers(self, player, x, y):
+        """player有多少支军队在下回合能走到或吃到(x, y)"""
+        return self.attack[player][y * BOARD_SIZE + x]
+
+    def threatened(self, player, x, y):
+        """(x, y)上player的棋子受到多少支敌方军队威胁"""
+        return self.attack[3 - player][y * BOARD_SIZE + x]
+
+    def safe_square(self, player, x, y, mover=None):
+        """军队走到(x, y)后不会被白吃：没有敌军威胁，或有除mover以外的己方军队可以反吃"""
+        if self.threatened(player, x, y) == 0:
+            return True
+        defenders = self.attack[player][y * BOARD_SIZE + x]
+        if mover is not None and self.radius[player] > 0:
+            dist = self.maps.field(mover[0], mover[1])[y * BOARD_SIZE + x]
+            if 0 < dist <= self.radius[player]:
+                defenders -= 1
+        return defenders > 0
+
+    def tower_threat(self, player):
+        """有多少支敌方军队下回合能吃到player的王塔"""
+        for p in self.board.pieces:
+            if p.type == PieceType.TOWER and p.player.value == player:
+                return self.threatened(player, p.x, p.y)
+        return 0
+
+    def hanging(self, player):
+        """player受威胁且无人保护的军队与王塔"""
+        result = []
+        for p in self.board.pieces:
+            if p.player.value != player or p.type not in (PieceType.ARMY, PieceType.TOWER):
+                continue
+            i = p.y * BOARD_SIZE + p.x
+            if self.attack[3 - player][i] and (p.type == PieceType.TOWER or not self.attack[player][i]):
+                result.append(p)
+        return result
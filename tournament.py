@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无界面AI自对弈锦标赛
+
+在进程池中批量运行AI对局（不依赖pygame），统计胜负、对局长度、每步思考时间与吞吐量，
+并给出带置信区间的Elo估计。
+
+用法示例：
+    python tournament.py --ai easy --ai normal --ai normal:search=beam,time_limit=0.2 --games 40 --workers 4
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from board import Board
+from ai import AIPlayer
+
+DEFAULT_MAX_TURNS = 200
+
+
+def parse_ai_spec(spec):
+    """解析AI配置：'难度[:参数=值,...]'，如 'hard:search=beam,time_limit=0.2'"""
+    difficulty, _, rest = spec.partition(':')
+    kwargs = {'difficulty': difficulty or 'easy'}
+    for item in filter(None, rest.split(',')):
+        key, _, value = item.partition('=')
+        for cast in (int, float):
+            try:
+                value = cast(value)
+                break
+            except ValueError:
+                continue
+        kwargs[key.strip()] = value
+    return kwargs
+
+
+def play_game(seed, white_spec, black_spec, max_turns=DEFAULT_MAX_TURNS, record=False):
+    """运行一局无界面对局，流程与Game.ai_turn一致：行军 → 建造 → 拆除
+
+    record为True时记录每回合结束后的局面（棋子列表）与地图，供train_eval.py训练评估权重。
+    """
+    random.seed(seed)
+    board = Board(seed=seed)
+    ais = {}
+    for side, spec in ((1, white_spec), (2, black_spec)):
+        kwargs = parse_ai_spec(spec)
+        # 噪声种子按对局、执子方区分，两方互不相关且可由对局种子复现；配置里显式给出时以配置为准
+        kwargs.setdefault('seed', seed * 2 + side)
+        ais[side] = AIPlayer(**kwargs)
+    think = {1: [], 2: []}
+    positions = []
+    player = 1  # 白先
+    turns = 0
+    start = time.perf_counter()
+    while turns < max_turns and not board.winner:
+        for step in range(3):
+            t0 = time.perf_counter()
+            ais[player].play_phase(board, player, step)
+            think[player].append(time.perf_counter() - t0)
+            if board.winner:
+                break
+        turns += 1
+        player = 3 - player
+        if record and not board.winner:
+            positions.append([(p.x, p.y, p.type.value, p.player.value) for p in board.pieces])
+    result = {
+        'seed': seed,
+        'white': white_spec,
+        'black': black_spec,
+        'winner': board.winner,  # None表示达到回合上限判和
+        'turns': turns,
+        'think': think,
+        'duration': time.perf_counter() - start,
+    }
+    if record:
+        result['grid'] = [row[:] for row in board.grid]
+        result['positions'] = positions
+    return result
+
+
+def _play_job(job):
+    return play_game(*job)
+
+
+def schedule(specs, games, seed=0, max_turns=DEFAULT_MAX_TURNS):
+    """循环赛赛程：每对配置使用相同种子的地图各执黑白一次"""
+    jobs = []
+    pairs = list(itertools.combinations(specs, 2))
+    rng = random.Random(seed)
+    per_pair = max(1, games // max(1, len(pairs)))
+    for a, b in pairs:
+        for _ in range((per_pair + 1) // 2):
+            game_seed = rng.randrange(2 ** 31)
+            jobs.append((game_seed, a, b, max_turns))
+            jobs.append((game_seed, b, a, max_turns))
+    return jobs
+
+
+def run_tournament(specs, games, workers=None, seed=0, max_turns=DEFAULT_MAX_TURNS):
+    """在进程池中运行全部对局，返回(结果列表, 总耗时)"""
+    jobs = schedule(specs, games, seed, max_turns)
+    start = time.perf_counter()
+    if workers == 1:
+        results = [_play_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_play_job, jobs))
+    return results, time.perf_counter() - start
+
+
+def _game_scores(results):
+    """把结果展开为(白方配置, 黑方配置, 白方得分)"""
+    games = []
+    for r in results:
+        if r['winner'] == 1:
+            score = 1.0
+        elif r['winner'] == 2:
+            score = 0.0
+        else:
+            score = 0.5
+        games.append((r['white'], r['black'], score))
+    return games
+
+
+def fit_elo(games, names, iterations=200):
+    """Bradley-Terry极大似然估计Elo（MM算法），和棋记半分，以平均分为0"""
+    index = {n: i for i, n in enumerate(names)}
+    k = len(names)
+    wins = [0.0] * k
+    pair_games = [[0.0] * k for _ in range(k)]
+    for white, black, score in games:
+        i, j = index[white], index[black]
+        wins[i] += score
+        wins[j] += 1 - score
+        pair_games[i][j] += 1
+        pair_games[j][i] += 1
+    # 每对配置加一局虚拟和棋作为先验，避免全胜/全负时发散
+    for i in range(k):
+        for j in range(k):
+            if i != j:
+                wins[i] += 0.5 / (k - 1)
+                pair_games[i][j] += 1.0 / (k - 1)
+    gamma = [1.0] * k
+    for _ in range(iterations):
+        for i in range(k):
+            denom = sum(pair_games[i][j] / (gamma[i] + gamma[j]) for j in range(k) if j != i)
+            if denom > 0:
+                gamma[i] = wins[i] / denom
+        mean = sum(math.log(g) for g in gamma) / k
+        gamma = [g / math.exp(mean) for g in gamma]
+    return {n: 400 * math.log10(gamma[index[n]]) for n in names}
+
+
+def elo_intervals(games, names, samples=200, seed=0):
+    """自助法（重抽对局）估计Elo的95%置信区间"""
+    rng = random.Random(seed)
+    draws = {n: [] for n in names}
+    for _ in range(samples):
+        sample = [rng.choice(games) for _ in games]
+        for n, r in fit_elo(sample, names, iterations=50).items():
+            draws[n].append(r)
+    intervals = {}
+    for n, values in draws.items():
+        values.sort()
+        intervals[n] = (values[int(0.025 * len(values))], values[int(0.975 * len(values)) - 1])
+    return intervals
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(results, elapsed, specs):
+    """汇总对局结果：Elo、胜负、对局长度、思考时间与吞吐量"""
+    games = _game_scores(results)
+    ratings = fit_elo(games, specs)
+    intervals = elo_intervals(games, specs)
+    stats = {}
+    for spec in specs:
+        record = [0, 0, 0]  # 胜、负、和
+        think = []
+        for r in results:
+            for side in (1, 2):
+                if (r['white'] if side == 1 else r['black']) != spec:
+                    continue
+                think.extend(r['think'][side])
+                if r['winner'] is None:
+                    record[2] += 1
+                elif r['winner'] == side:
+                    record[0] += 1
+                else:
+                    record[1] += 1
+        stats[spec] = {
+            'elo': ratings[spec],
+            'ci': intervals[spec],
+            'record': record,
+            'think_mean_ms': 1000 * sum(think) / len(think) if think else 0.0,
+            'think_p95_ms': 1000 * _percentile(think, 0.95),
+        }
+    turns = [r['turns'] for r in results]
+    return {
+        'games': len(results),
+        'elapsed': elapsed,
+        'games_per_sec': len(results) / elapsed if elapsed > 0 else 0.0,
+        'avg_turns': sum(turns) / len(turns) if turns else 0.0,
+        'players': stats,
+    }
+
+
+def print_report(summary):
+    print(f"对局数: {summary['games']}  用时: {summary['elapsed']:.1f}s  "
+          f"吞吐: {summary['games_per_sec']:.2f} 局/秒  平均回合: {summary['avg_turns']:.1f}")
+    print("-" * 78)
+    print(f"{'配置':<36}{'Elo':>7}{'95%区间':>18}{'胜/负/和':>12}{'思考ms(均/p95)':>16}")
+    ranked = sorted(summary['players'].items(), key=lambda kv: kv[1]['elo'], reverse=True)
+    for spec, s in ranked:
+        lo, hi = s['ci']
+        record = '/'.join(str(n) for n in s['record'])
+        think = f"{s['think_mean_ms']:.1f}/{s['think_p95_ms']:.1f}"
+        print(f"{spec:<36}{s['elo']:>7.0f}{f'[{lo:.0f}, {hi:.0f}]':>18}{record:>12}{think:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI自对弈锦标赛")
+    parser.add_argument('--ai', action='append', required=True,
+                        help="AI配置，可重复：难度[:参数=值,...]，如 hard:search=beam,time_limit=0.2")
+    parser.add_argument('--games', type=int, default=20, help="每对配置的对局数")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="进程数")
+    parser.add_argument('--seed', type=int, default=0, help="赛程随机种子")
+    parser.add_argument('--max-turns', type=int, default=DEFAULT_MAX_TURNS, help="回合上限，超过判和")
+    parser.add_argument('--out', help="把逐局结果写入JSON Lines文件")
+    args = parser.parse_args()
+
+    specs = list(dict.fromkeys(args.ai))
+    if len(specs) < 2:
+        parser.error("至少需要两个不同的AI配置")
+    pairs = len(specs) * (len(specs) - 1) // 2
+    results, elapsed = run_tournament(specs, args.games * pairs, args.workers, args.seed, args.max_turns)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + '\n')
+    print_report(summarize(results, elapsed, specs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自对弈训练整盘评估权重（Texel式逻辑回归）
+
+1. 在进程池中运行AI自对弈，记录每回合结束后的局面与对局结果
+2. 用NumPy批量提取评估特征（与FeatureAccumulator.features一致），按对局分块并行
+3. 以对局结果为目标（胜1、和0.5、负0）做带岭惩罚的逻辑回归（IRLS），
+   胜率模型为 sigmoid(评估分 / SCALE)，双方视角的样本都参与拟合
+4. 写出eval_weights.json，AIPlayer启动时自动读取
+
+用法示例：
+    python train_eval.py --games 200 --workers 4 --ai normal --ai hard:search=beam,time_limit=0.05
+    python train_eval.py --load positions.npz --decisive --prior --ridge 1000
+"""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from board import BOARD_SIZE
+from distance import DistanceMaps
+from evaluation import DEFAULT_WEIGHTS, FEATURE_NAMES, WEIGHTS_FILE, save_weights
+from piece import PieceType
+from tournament import play_game
+
+# 评估分与胜率的换算：评估分SCALE约对应73%胜率
+SCALE = 100.0
+# 开局若干回合局面与结果关系很弱，默认不参与拟合
+DEFAULT_SKIP_OPENING = 2
+
+ARMY = PieceType.ARMY.value - 1
+FARM = PieceType.FARM.value - 1
+INDUSTRY = PieceType.INDUSTRY.value - 1
+TOWER = PieceType.TOWER.value - 1
+
+
+# ---- 自对弈数据 ----
+def _record_job(job):
+    seed, white, black, max_turns = job
+    return play_game(seed, white, black, max_turns, record=True)
+
+
+def self_play(specs, games, workers=None, seed=0, max_turns=200):
+    """并行运行自对弈，返回带局面记录的对局结果"""
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(games):
+        white = specs[i % len(specs)]
+        black = specs[(i // len(specs)) % len(specs)]
+        jobs.append((rng.randrange(2 ** 31), white, black, max_turns))
+    if workers == 1:
+        return [_record_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_record_job, jobs))
+
+
+def build_dataset(results, skip_opening=DEFAULT_SKIP_OPENING):
+    """把对局记录整理成数组数据集
+
+    grids:   (对局数, 14, 14) 地图
+    planes:  (局面数, 2, 4, 14, 14) 双方各类棋子的占位平面
+    game:    (局面数,) 局面所属对局
+    outcome: (局面数,) 白方得分（胜1、和0.5、负0）
+    """
+    grids = np.array([r['grid'] for r in results], dtype=np.int8)
+    count = sum(max(0, len(r['positions']) - skip_opening) for r in results)
+    planes = np.zeros((count, 2, 4, BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+    game = np.zeros(count, dtype=np.int32)
+    outcome = np.zeros(count, dtype=np.float64)
+    n = 0
+    for g, r in enumerate(results):
+        score = {1: 1.0, 2: 0.0}.get(r['winner'], 0.5)
+        for pieces in r['positions'][skip_opening:]:
+            for x, y, ptype, player in pieces:
+                planes[n, player - 1, ptype - 1, y, x] = 1
+            game[n] = g
+            outcome[n] = score
+            n += 1
+    return {'grids': grids, 'planes': planes, 'game': game, 'outcome': outcome}
+
+
+def save_dataset(dataset, path):
+    np.savez_compressed(path, **dataset)
+
+
+def load_dataset(path):
+    with np.load(path) as data:
+        return {k: data[k] for k in ('grids', 'planes', 'game', 'outcome')}
+
+
+# ---- 批量特征提取 ----
+def _tower_gain(maps, towers, has_tower):
+    """每个局面中，军队在各格子相对敌方王塔的推进分 max(0, 20 - 距离)，形状(n, 196)"""
+    gain = np.zeros((len(towers), BOARD_SIZE * BOARD_SIZE), dtype=np.int32)
+    for cell in np.unique(towers[has_tower]):
+        field = np.array(maps.field(int(cell) % BOARD_SIZE, int(cell) // BOARD_SIZE), dtype=np.int32)
+        gain[(towers == cell) & has_tower] = np.maximum(0, 20 - field)
+    return gain
+
+
+def _influence_size(armies):
+    """军队周围八格的并集大小（势力范围），armies形状(n, 14, 14)"""
+    padded = np.pad(armies, ((0, 0), (1, 1), (1, 1)))
+    cover = np.zeros(armies.shape, dtype=bool)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dx or dy:
+                cover |= padded[:, 1 + dy:1 + dy + BOARD_SIZE, 1 + dx:1 + dx + BOARD_SIZE] > 0
+    return cover.sum(axis=(1, 2))
+
+
+def extract_features(grid, planes):
+    """同一张地图上一批局面的白方视角特征，形状(n, len(FEATURE_NAMES))"""
+    n = len(planes)
+    maps = DistanceMaps.for_grid(np.asarray(grid).tolist())
+    flat = planes.reshape(n, 2, 4, BOARD_SIZE * BOARD_SIZE).astype(np.int32)
+    material = flat.sum(axis=3)  # (n, 2, 4)
+    farm, ind, army = material[:, :, FARM], material[:, :, INDUSTRY], material[:, :, ARMY]
+    # board.is_endangered的批量版本，规则改动时两处一起改
+    danger = (ind > farm // 2) | (army > farm // 2) | (army > ind) | (ind - army + 1 < 0)
+
+    towers = flat[:, :, TOWER].argmax(axis=2)  # (n, 2)
+    has_tower = flat[:, :, TOWER].any(axis=2)
+    advance = np.zeros((n, 2), dtype=np.int32)
+    for side in (0, 1):
+        gain = _tower_gain(maps, towers[:, 1 - side], has_tower[:, 1 - side])
+        advance[:, side] = (flat[:, side, ARMY] * gain).sum(axis=1)
+
+    influence = np.stack([_influence_size(planes[:, side, ARMY]) for side in (0, 1)], axis=1)
+
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float64)
+    X[:, 0] = farm[:, 0] - farm[:, 1]
+    X[:, 1] = ind[:, 0] - ind[:, 1]
+    X[:, 2] = army[:, 0] - army[:, 1]
+    X[:, 3] = advance[:, 0] - advance[:, 1]
+    X[:, 4] = danger[:, 0]
+    X[:, 5] = danger[:, 1]
+    X[:, 6] = influence[:, 0] - influence[:, 1]
+    return X
+
+
+def _extract_job(job):
+    return extract_features(*job)
+
+
+def dataset_features(dataset, workers=None):
+    """按对局分块并行提取整个数据集的特征（白方视角）"""
+    game = dataset['game']
+    bounds = np.flatnonzero(np.diff(game)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(game)]))
+    jobs = [(dataset['grids'][game[s]], dataset['planes'][s:e]) for s, e in zip(starts, ends) if e > s]
+    if not jobs:
+        return np.zeros((0, len(FEATURE_NAMES)))
+    if workers == 1:
+        parts = [_extract_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_extract_job, jobs))
+    return np.concatenate(parts)
+
+
+def mirror(X):
+    """白方视角特征转为黑方视角：差值取反，双方濒危互换"""
+    M = -X
+    M[:, 4] = X[:, 5]
+    M[:, 5] = X[:, 4]
+    return M
+
+
+def both_sides(X, outcome):
+    """双方视角的样本与目标"""
+    return np.concatenate((X, mirror(X))), np.concatenate((outcome, 1.0 - outcome))
+
+
+# ---- 拟合 ----
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -50, 50)))
+
+
+def log_loss(X, y, weights, scale=SCALE):
+    p = np.clip(_sigmoid(X @ np.asarray(weights, dtype=np.float64) / scale), 1e-9, 1 - 1e-9)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def fit_weights(X, y, ridge=1.0, scale=SCALE, prior=None, iterations=50, tol=1e-8):
+    """带岭惩罚的逻辑回归（IRLS/牛顿法），返回评估分单位的权重
+
+    prior为评估分单位的先验权重，惩罚的是与先验的偏离（默认向0收缩）。
+    """
+    # 按列标准化后拟合，惩罚对各特征一视同仁
+    std = X.std(axis=0)
+    std[std == 0] = 1.0
+    Z = X / std
+    center = np.zeros(X.shape[1]) if prior is None else np.asarray(prior, dtype=np.float64) * std / scale
+    beta = center.copy()
+    for _ in range(iterations):
+        p = _sigmoid(Z @ beta)
+        grad = Z.T @ (p - y) + ridge * (beta - center)
+        hessian = (Z * (p * (1 - p))[:, None]).T @ Z + ridge * np.eye(len(beta))
+        step = np.linalg.solve(hessian, grad)
+        beta -= step
+        if np.max(np.abs(step)) < tol:
+            break
+    return beta / std * scale
+
+
+def fit_scale(X, y, weights):
+    """固定权重比例、只拟合整体缩放（用于把手工权重换算到同一胜率尺度上比较）"""
+    z = X @ np.asarray(weights, dtype=np.float64)
+    k = 0.0
+    for _ in range(50):
+        p = _sigmoid(k * z)
+        hessian = np.sum(z * z * p * (1 - p)) + 1e-9
+        step = np.sum(z * (p - y)) / hessian
+        k -= step
+        if abs(step) < 1e-12:
+            break
+    return k
+
+
+def split_by_game(dataset, holdout=0.2, seed=0):
+    """按对局划分训练/验证集，同一对局的局面不跨集合"""
+    games = len(dataset['grids'])
+    rng = np.random.default_rng(seed)
+    valid_games = rng.random(games) < holdout
+    valid = valid_games[dataset['game']]
+    return ~valid, valid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自对弈训练整盘评估权重")
+    parser.add_argument('--ai', action='append',
+                        help="自对弈AI配置，可重复（格式同tournament.py），默认 normal:search=beam,time_limit=0.05")
+    parser.add_argument('--games', type=int, default=100, help="自对弈局数")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="进程数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--max-turns', type=int, default=200, help="回合上限，超过判和")
+    parser.add_argument('--skip-opening', type=int, default=DEFAULT_SKIP_OPENING, help="跳过每局开头的回合数")
+    parser.add_argument('--ridge', type=float, default=1.0, help="岭惩罚系数")
+    parser.add_argument('--prior', action='store_true', help="向手工权重收缩（而不是向0收缩），数据少时更稳")
+    parser.add_argument('--decisive', action='store_true', help="只用分出胜负的对局（和棋局面不参与拟合）")
+    parser.add_argument('--holdout', type=float, default=0.2, help="验证集对局比例")
+    parser.add_argument('--dataset', help="把局面数据集保存为.npz")
+    parser.add_argument('--load', help="从.npz读取局面数据集，不再自对弈")
+    parser.add_argument('--out', default=WEIGHTS_FILE, help="权重文件路径")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.load:
+        dataset = load_dataset(args.load)
+    else:
+        specs = args.ai or ['normal:search=beam,time_limit=0.05']
+        results = self_play(specs, args.games, args.workers, args.seed, args.max_turns)
+        dataset = build_dataset(results, args.skip_opening)
+        print(f"自对弈 {len(results)} 局，用时 {time.perf_counter() - start:.1f}s")
+        if args.dataset:
+            save_dataset(dataset, args.dataset)
+    print(f"局面数: {len(dataset['outcome'])}")
+
+    t0 = time.perf_counter()
+    X = dataset_features(dataset, args.workers)
+    print(f"特征提取用时 {time.perf_counter() - t0:.2f}s")
+
+    train, valid = split_by_game(dataset, args.holdout, args.seed)
+    if args.decisive:
+        decisive = dataset['outcome'] != 0.5
+        train &= decisive
+        valid &= decisive
+    X_train, y_train = both_sides(X[train], dataset['outcome'][train])
+    X_valid, y_valid = both_sides(X[valid], dataset['outcome'][valid])
+    default_scale = fit_scale(X_train, y_train, DEFAULT_WEIGHTS) * SCALE
+    default_scaled = [w * default_scale for w in DEFAULT_WEIGHTS]
+    weights = fit_weights(X_train, y_train, args.ridge, prior=default_scaled if args.prior else None)
+    print("-" * 40)
+    print(f"{'特征':<14}{'手工':>10}{'训练':>10}")
+    for name, old, new in zip(FEATURE_NAMES, default_scaled, weights):
+        print(f"{name:<14}{old:>10.2f}{new:>10.2f}")
+    if len(y_valid):
+        print(f"验证集对数损失: 手工 {log_loss(X_valid, y_valid, default_scaled):.4f}  "
+              f"训练 {log_loss(X_valid, y_valid, weights):.4f}")
+
+    save_weights(weights, args.out, scale=SCALE, positions=int(len(dataset['outcome'])), ridge=args.ridge)
+    print(f"权重已写入 {args.out}")
+
+
+if __name__ == '__main__':
+    main()